@@ -19,6 +19,7 @@ limitations under the License.
 '''
 import Queue
 
+import collections
 import logging
 import traceback
 import threading
@@ -38,8 +39,10 @@ logger = logging.getLogger()
 installScriptHash = -1
 
 class ActionQueue(threading.Thread):
-  """ Action Queue for the agent. We pick one command at a time from the queue
-  and execute it
+  """ Action Queue for the agent. By default we pick one command at a time from
+  the queue and execute it. If parallel execution is enabled, commands for
+  different components are executed concurrently in separate lanes, while
+  commands for the same component are still executed in the order received
   Note: Action and command terms in this and related classes are used interchangeably
   """
 
@@ -77,6 +80,19 @@ class ActionQueue(threading.Thread):
     self._stop = threading.Event()
     self.tmpdir = config.get('agent', 'prefix')
     self.customServiceOrchestrator = CustomServiceOrchestrator(config, controller)
+    # 0 or 1 - commands are executed one at a time, N - up to N commands
+    # for different components are executed in parallel
+    self.parallel_execution = 0
+    if config.has_option('agent', 'parallel_execution'):
+      self.parallel_execution = int(config.get('agent', 'parallel_execution'))
+    self.lanes = {} # component -> deque of commands waiting for execution
+    self.lanes_lock = threading.RLock()
+    self.lanes_semaphore = threading.BoundedSemaphore(max(self.parallel_execution, 1))
+    self.config_handler_lock = threading.RLock()
+    # Status commands for components of one service package are checked by
+    # a single script invocation
+    self.batch_status_commands = config.has_option('agent', 'batch_status_commands') and \
+      str(config.get('agent', 'batch_status_commands')).lower() == 'true'
 
 
   def stop(self):
@@ -121,6 +137,17 @@ class ActionQueue(threading.Thread):
       task_id = command['target_task_id']
       reason = command['reason']
 
+      # Remove from the execution lanes by task_id
+      with self.lanes_lock:
+        for pending in self.lanes.values():
+          for queued_command in list(pending):
+            if queued_command.get('taskId') == task_id:
+              pending.remove(queued_command)
+              logger.info("Canceling " + queued_command['commandType'] + \
+                          " for service " + queued_command['serviceName'] + \
+                          " of cluster " +  queued_command['clusterName'] + \
+                          " from the execution lane.")
+
       # Remove from the command queue by task_id
       queue = self.commandQueue
       self.commandQueue = Queue.Queue()
@@ -138,15 +165,71 @@ class ActionQueue(threading.Thread):
       # Kill if in progress
       self.customServiceOrchestrator.cancel_command(task_id, reason)
 
+  def is_parallel_execution_enabled(self):
+    return self.parallel_execution > 1
+
   def run(self):
+    if self.is_parallel_execution_enabled():
+      # Status commands get a lane of their own, so they are never
+      # starved by long-running execution commands
+      status_lane = threading.Thread(target=self.run_status_lane,
+                                     name="StatusCommandLane")
+      status_lane.daemon = True
+      status_lane.start()
+
     while not self.stopped():
       self.processBackgroundQueueSafeEmpty();
-      self.processStatusCommandQueueSafeEmpty();
+      if not self.is_parallel_execution_enabled():
+        self.processStatusCommandQueueSafeEmpty();
       try:
         command = self.commandQueue.get(True, self.EXECUTION_COMMAND_WAIT_TIME)
-        self.process_command(command)
+        if self.is_parallel_execution_enabled():
+          self.dispatch_to_lane(command)
+        else:
+          self.process_command(command)
       except (Queue.Empty):
         pass
+
+  def run_status_lane(self):
+    while not self.stopped():
+      try:
+        command = self.statusCommandQueue.get(True, self.EXECUTION_COMMAND_WAIT_TIME)
+        self.process_status_commands([command] + self.drain_status_command_queue())
+      except (Queue.Empty):
+        pass
+
+  def dispatch_to_lane(self, command):
+    """
+    Puts command to the execution lane of its component. A worker thread is
+    started for the lane if the lane is not active yet
+    """
+    lane_name = command.get('role', command['serviceName'])
+    with self.lanes_lock:
+      if lane_name in self.lanes:
+        self.lanes[lane_name].append(command)
+        return
+      self.lanes[lane_name] = collections.deque([command])
+    logger.debug("Starting execution lane for " + str(lane_name))
+    worker = threading.Thread(target=self.run_lane, args=(lane_name,),
+                              name="ExecutionLane-" + str(lane_name))
+    worker.daemon = True
+    worker.start()
+
+  def run_lane(self, lane_name):
+    """
+    Executes commands of the lane one by one, the number of commands executed
+    at the same time across all lanes is limited by parallel_execution
+    """
+    while True:
+      with self.lanes_lock:
+        pending = self.lanes[lane_name]
+        if not pending:
+          del self.lanes[lane_name]
+          return
+        command = pending.popleft()
+      with self.lanes_semaphore:
+        self.process_command(command)
+
   def processBackgroundQueueSafeEmpty(self):
     while not self.backgroundCommandQueue.empty():
       try:
@@ -157,12 +240,45 @@ class ActionQueue(threading.Thread):
         pass
 
   def processStatusCommandQueueSafeEmpty(self):
+    while not self.statusCommandQueue.empty():
+      self.process_status_commands(self.drain_status_command_queue())
+
+  def drain_status_command_queue(self):
+    commands = []
     while not self.statusCommandQueue.empty():
       try:
-        command = self.statusCommandQueue.get(False)
-        self.process_command(command)
+        commands.append(self.statusCommandQueue.get(False))
       except (Queue.Empty):
         pass
+    return commands
+
+  def process_status_commands(self, commands):
+    """
+    Executes status commands. If batching is enabled, commands for components
+    of the same service package are executed as a single batch
+    """
+    if not self.batch_status_commands:
+      for command in commands:
+        self.process_command(command)
+      return
+
+    batches = collections.OrderedDict()
+    for command in commands:
+      batches.setdefault(self.get_status_batch_key(command), []).append(command)
+    for key, batch in batches.iteritems():
+      if key is None or len(batch) == 1:
+        for command in batch:
+          self.process_command(command)
+      else:
+        self.execute_status_command_batch(batch)
+
+  def get_status_batch_key(self, command):
+    try:
+      command_params = command['commandParams']
+      return (command['clusterName'], command_params['service_package_folder'],
+              os.path.dirname(command_params['script']))
+    except (KeyError, TypeError):
+      return None # can not be batched
 
 
   def createCommandHandle(self, command):
@@ -247,39 +363,46 @@ class ActionQueue(threading.Thread):
 
     # let ambari know that configuration tags were applied
     if status == self.COMPLETED_STATUS:
-      configHandler = ActualConfigHandler(self.config, self.configTags)
-      #update
-      if command.has_key('forceRefreshConfigTags') and len(command['forceRefreshConfigTags']) > 0  :
-
-        forceRefreshConfigTags = command['forceRefreshConfigTags']
-        logger.info("Got refresh additional component tags command")
-
-        for configTag in forceRefreshConfigTags :
-          configHandler.update_component_tag(command['role'], configTag, command['configurationTags'][configTag])
-
-        roleResult['customCommand'] = self.CUSTOM_COMMAND_RESTART # force restart for component to evict stale_config on server side
-        command['configurationTags'] = configHandler.read_actual_component(command['role'])
-
-      if command.has_key('configurationTags'):
-        configHandler.write_actual(command['configurationTags'])
-        roleResult['configurationTags'] = command['configurationTags']
-      component = {'serviceName':command['serviceName'],'componentName':command['role']}
-      if command.has_key('roleCommand') and \
-        (command['roleCommand'] == self.ROLE_COMMAND_START or \
-        (command['roleCommand'] == self.ROLE_COMMAND_INSTALL \
-        and component in LiveStatus.CLIENT_COMPONENTS) or \
-        (command['roleCommand'] == self.ROLE_COMMAND_CUSTOM_COMMAND and \
-        command['hostLevelParams'].has_key('custom_command') and \
-        command['hostLevelParams']['custom_command'] == self.CUSTOM_COMMAND_RESTART)):
-        configHandler.write_actual_component(command['role'], command['configurationTags'])
-        if command['hostLevelParams'].has_key('clientsToUpdateConfigs') and \
-          command['hostLevelParams']['clientsToUpdateConfigs']:
-          configHandler.write_client_components(command['serviceName'], command['configurationTags'],
-                                                command['hostLevelParams']['clientsToUpdateConfigs'])
-        roleResult['configurationTags'] = configHandler.read_actual_component(command['role'])
+      with self.config_handler_lock:
+        self.update_actual_configs(command, roleResult)
 
     self.commandStatuses.put_command_status(command, roleResult)
 
+  def update_actual_configs(self, command, roleResult):
+    """
+    Stores configuration tags applied by successfully completed command
+    """
+    configHandler = ActualConfigHandler(self.config, self.configTags)
+    #update
+    if command.has_key('forceRefreshConfigTags') and len(command['forceRefreshConfigTags']) > 0  :
+
+      forceRefreshConfigTags = command['forceRefreshConfigTags']
+      logger.info("Got refresh additional component tags command")
+
+      for configTag in forceRefreshConfigTags :
+        configHandler.update_component_tag(command['role'], configTag, command['configurationTags'][configTag])
+
+      roleResult['customCommand'] = self.CUSTOM_COMMAND_RESTART # force restart for component to evict stale_config on server side
+      command['configurationTags'] = configHandler.read_actual_component(command['role'])
+
+    if command.has_key('configurationTags'):
+      configHandler.write_actual(command['configurationTags'])
+      roleResult['configurationTags'] = command['configurationTags']
+    component = {'serviceName':command['serviceName'],'componentName':command['role']}
+    if command.has_key('roleCommand') and \
+      (command['roleCommand'] == self.ROLE_COMMAND_START or \
+      (command['roleCommand'] == self.ROLE_COMMAND_INSTALL \
+      and component in LiveStatus.CLIENT_COMPONENTS) or \
+      (command['roleCommand'] == self.ROLE_COMMAND_CUSTOM_COMMAND and \
+      command['hostLevelParams'].has_key('custom_command') and \
+      command['hostLevelParams']['custom_command'] == self.CUSTOM_COMMAND_RESTART)):
+      configHandler.write_actual_component(command['role'], command['configurationTags'])
+      if command['hostLevelParams'].has_key('clientsToUpdateConfigs') and \
+        command['hostLevelParams']['clientsToUpdateConfigs']:
+        configHandler.write_client_components(command['serviceName'], command['configurationTags'],
+                                              command['hostLevelParams']['clientsToUpdateConfigs'])
+      roleResult['configurationTags'] = configHandler.read_actual_component(command['role'])
+
   def command_was_canceled(self):
     self.customServiceOrchestrator
   def on_background_command_complete_callback(self, process_condenced_result, handle):
@@ -307,9 +430,31 @@ class ActionQueue(threading.Thread):
 
     self.commandStatuses.put_command_status(handle.command, roleResult)
 
-  def execute_status_command(self, command):
+  def execute_status_command_batch(self, commands):
     '''
-    Executes commands of type STATUS_COMMAND
+    Executes several commands of type STATUS_COMMAND with a single script
+    invocation, falls back to one by one execution if the batch has failed
+    '''
+    try:
+      results = self.customServiceOrchestrator.requestComponentStatusBatch(commands)
+    except Exception, err:
+      traceback.print_exc()
+      logger.warn(err)
+      results = None
+
+    if results is None:
+      for command in commands:
+        self.process_command(command)
+      return
+
+    for command, batch_result in zip(commands, results):
+      self.execute_status_command(command, batch_result)
+
+  def execute_status_command(self, command, batch_result=None):
+    '''
+    Executes commands of type STATUS_COMMAND. If the command has already been
+    executed as a part of batch, batch_result contains a tuple
+    (status result, security state)
     '''
     try:
       cluster = command['clusterName']
@@ -328,8 +473,11 @@ class ActionQueue(threading.Thread):
 
       # For custom services, responsibility to determine service status is
       # delegated to python scripts
-      component_status_result = self.customServiceOrchestrator.requestComponentStatus(command)
-      component_security_status_result = self.customServiceOrchestrator.requestComponentSecurityState(command)
+      if batch_result is not None:
+        component_status_result, component_security_status_result = batch_result
+      else:
+        component_status_result = self.customServiceOrchestrator.requestComponentStatus(command)
+        component_security_status_result = self.customServiceOrchestrator.requestComponentSecurityState(command)
 
       if component_status_result['exitcode'] == 0:
         component_status = LiveStatus.LIVE_STATUS
@@ -380,3 +528,6 @@ class ActionQueue(threading.Thread):
     queue = self.commandQueue
     with queue.mutex:
       queue.queue.clear()
+    with self.lanes_lock:
+      for pending in self.lanes.values():
+        pending.clear()
@@ -21,15 +21,21 @@ limitations under the License.
 """
 http://apscheduler.readthedocs.org/en/v2.1.2
 """
+import hashlib
 import json
 import logging
 import os
+import random
 import sys
+import threading
 import time
+from datetime import datetime, timedelta
 from apscheduler.scheduler import Scheduler
+from apscheduler.threadpool import ThreadPool
 from alerts.collector import AlertCollector
 from alerts.metric_alert import MetricAlert
 from alerts.port_alert import PortAlert
+from alerts.port_prober import get_port_prober
 from alerts.script_alert import ScriptAlert
 from alerts.web_alert import WebAlert
 
@@ -49,6 +55,15 @@ class AlertSchedulerHandler():
     'standalone': False
   }
 
+  # Alerts of every type are collected by a thread pool of their own, so
+  # slow WEB or METRIC alerts do not delay each other. PORT alerts are
+  # checked concurrently by the port prober and need no threads.
+  ALERT_THREADS = {
+    TYPE_METRIC: 3,
+    TYPE_SCRIPT: 3,
+    TYPE_WEB: 3
+  }
+
 
   def __init__(self, cachedir, stacks_dir, common_services_dir, host_scripts_dir,
       cluster_configuration, config, in_minutes=True):
@@ -71,6 +86,14 @@ class AlertSchedulerHandler():
     self.__in_minutes = in_minutes
     self.config = config
 
+    # UUID -> hash of the scheduled definition
+    self.__definition_hashes = {}
+    # alert type -> thread pool collecting alerts of the type
+    self.__thread_pools = {}
+    # UUIDs of definitions being collected now
+    self.__in_flight = set()
+    self.__in_flight_lock = threading.Lock()
+
 
   def update_definitions(self, heartbeat):
     """
@@ -98,11 +121,56 @@ class AlertSchedulerHandler():
       json.dump(alert_definitions, f, indent=2)
 
     # reschedule only the jobs that have changed
-    self.reschedule()
+    self.reschedule(alert_definitions)
 
 
   def __make_function(self, alert_def):
-    return lambda: alert_def.collect()
+    return lambda: self.__submit(alert_def)
+
+
+  def __submit(self, alert_def):
+    """
+    Hands the alert over to the thread pool of its type. An alert which is
+    still being collected since the previous run is skipped
+    """
+    uuid = alert_def.get_uuid()
+    with self.__in_flight_lock:
+      if uuid in self.__in_flight:
+        logger.debug("[AlertScheduler] Skipping {0}, the previous run has not finished yet".format(
+          alert_def.get_name()))
+        return
+      self.__in_flight.add(uuid)
+
+    alert_type = alert_def.alert_source_meta.get('type', '')
+    try:
+      if alert_type == self.TYPE_PORT:
+        alert_def.collect_async(get_port_prober(), lambda: self.__finish(uuid))
+      else:
+        self.__get_thread_pool(alert_type).submit(self.__collect, alert_def)
+    except:
+      self.__finish(uuid)
+      raise
+
+
+  def __collect(self, alert_def):
+    try:
+      alert_def.collect()
+    finally:
+      self.__finish(alert_def.get_uuid())
+
+
+  def __finish(self, uuid):
+    with self.__in_flight_lock:
+      self.__in_flight.discard(uuid)
+
+
+  def __get_thread_pool(self, alert_type):
+    with self.__in_flight_lock:
+      if alert_type not in self.__thread_pools:
+        threads = self.ALERT_THREADS.get(alert_type, 1)
+        self.__thread_pools[alert_type] = ThreadPool(core_threads=threads,
+                                                     max_threads=threads)
+      return self.__thread_pools[alert_type]
 
 
   def start(self):
@@ -131,47 +199,53 @@ class AlertSchedulerHandler():
     if not self.__scheduler is None:
       self.__scheduler.shutdown(wait=False)
       self.__scheduler = Scheduler(AlertSchedulerHandler.APS_CONFIG)
+      self.__definition_hashes.clear()
 
+    # pools are created again by the alerts scheduled after a restart; the
+    # jobs queued in them are dropped, so they must not block the next runs
+    with self.__in_flight_lock:
+      thread_pools = self.__thread_pools.values()
+      self.__thread_pools = {}
+      self.__in_flight.clear()
+    for thread_pool in thread_pools:
+      thread_pool.shutdown(wait=False)
 
-  def reschedule(self):
+
+  def reschedule(self, all_commands=None):
     """
-    Removes jobs that are scheduled where their UUID no longer is valid. 
+    Removes jobs that are scheduled where their UUID no longer is valid
+    or the definition has changed.
     Schedules jobs where the definition UUID is not currently scheduled.
+    :param all_commands: alert definition commands, read from the file if
+    not specified
     """
     jobs_scheduled = 0
     jobs_removed = 0
     
-    definitions = self.__load_definitions()
+    definitions = {}
+    for definition in self.__load_definitions(all_commands):
+      definitions[definition.get_uuid()] = definition
     scheduled_jobs = self.__scheduler.get_jobs()
-    
+    scheduled_uuids = set()
+
     # for every scheduled job, see if its UUID is still valid
     for scheduled_job in scheduled_jobs:
-      uuid_valid = False
-      
-      for definition in definitions:
-        definition_uuid = definition.get_uuid()
-        if scheduled_job.name == definition_uuid:
-          uuid_valid = True
-          break
+      definition = definitions.get(scheduled_job.name)
+      if definition is not None and \
+          self.__definition_hashes.get(scheduled_job.name) == self.__definition_hash(definition):
+        scheduled_uuids.add(scheduled_job.name)
+        continue
 
       # jobs without valid UUIDs should be unscheduled
-      if uuid_valid == False:
-        jobs_removed += 1
-        logger.info("[AlertScheduler] Unscheduling {0}".format(scheduled_job.name))
-        self._collector.remove_by_uuid(scheduled_job.name)
-        self.__scheduler.unschedule_job(scheduled_job)
-      
-    # for every definition, determine if there is a scheduled job
-    for definition in definitions:
-      definition_scheduled = False
-      for scheduled_job in scheduled_jobs:
-        definition_uuid = definition.get_uuid()
-        if definition_uuid == scheduled_job.name:
-          definition_scheduled = True
-          break
+      jobs_removed += 1
+      logger.info("[AlertScheduler] Unscheduling {0}".format(scheduled_job.name))
+      self._collector.remove_by_uuid(scheduled_job.name)
+      self.__scheduler.unschedule_job(scheduled_job)
+      self.__definition_hashes.pop(scheduled_job.name, None)
       
-      # if no jobs are found with the definitions UUID, schedule it
-      if definition_scheduled == False:
+    # if no jobs are found with the definitions UUID, schedule it
+    for definition_uuid, definition in definitions.iteritems():
+      if definition_uuid not in scheduled_uuids:
         jobs_scheduled += 1
         self.schedule_definition(definition)
   
@@ -196,6 +270,7 @@ class AlertSchedulerHandler():
         logger.info("[AlertScheduler] Unscheduling {0}".format(scheduled_job.name))
         self._collector.remove_by_uuid(scheduled_job.name)
         self.__scheduler.unschedule_job(scheduled_job)
+        self.__definition_hashes.pop(scheduled_job.name, None)
 
     # for every definition, schedule a job
     for definition in definitions:
@@ -211,22 +286,23 @@ class AlertSchedulerHandler():
     return self._collector
   
 
-  def __load_definitions(self):
+  def __load_definitions(self, all_commands=None):
     """
     Loads all alert definitions from a file. All clusters are stored in
     a single file.
+    :param all_commands: alert definition commands to use instead of the file
     :return:
     """
     definitions = []
     
-    all_commands = None
     alerts_definitions_path = os.path.join(self.cachedir, self.FILENAME)
-    try:
-      with open(alerts_definitions_path) as fp:
-        all_commands = json.load(fp)
-    except:
-      logger.warning('[AlertScheduler] {0} not found or invalid. No alerts will be scheduled until registration occurs.'.format(alerts_definitions_path))
-      return definitions
+    if all_commands is None:
+      try:
+        with open(alerts_definitions_path) as fp:
+          all_commands = json.load(fp)
+      except:
+        logger.warning('[AlertScheduler] {0} not found or invalid. No alerts will be scheduled until registration occurs.'.format(alerts_definitions_path))
+        return definitions
     
     for command_json in all_commands:
       clusterName = '' if not 'clusterName' in command_json else command_json['clusterName']
@@ -292,22 +368,37 @@ class AlertSchedulerHandler():
     
     job = None
 
+    # jobs start at random points of their first interval, so that the
+    # alerts do not run all at once
+    interval_seconds = definition.interval() * 60 if self.__in_minutes else definition.interval()
+    start_date = datetime.now() + timedelta(seconds=random.uniform(0, interval_seconds))
+
     if self.__in_minutes:
       job = self.__scheduler.add_interval_job(self.__make_function(definition),
-        minutes=definition.interval())
+        minutes=definition.interval(), start_date=start_date)
     else:
       job = self.__scheduler.add_interval_job(self.__make_function(definition),
-        seconds=definition.interval())
+        seconds=definition.interval(), start_date=start_date)
     
     # although the documentation states that Job(kwargs) takes a name 
     # key/value pair, it does not actually set the name; do it manually
     if job is not None:
       job.name = definition.get_uuid()
+      self.__definition_hashes[job.name] = self.__definition_hash(definition)
       
     logger.info("[AlertScheduler] Scheduling {0} with UUID {1}".format(
       definition.get_name(), definition.get_uuid()))
   
 
+  def __definition_hash(self, definition):
+    """
+    Hash of everything the scheduled job depends on, definitions with the
+    same UUID but different hash are rescheduled
+    """
+    content = [definition.cluster_name, definition.host_name, definition.alert_meta]
+    return hashlib.md5(json.dumps(content, sort_keys=True)).hexdigest()
+
+
   def get_job_count(self):
     """
     Gets the number of jobs currently scheduled. This is mainly used for
@@ -319,6 +410,15 @@ class AlertSchedulerHandler():
     return len(self.__scheduler.get_jobs())
 
   
+  def is_alert_in_flight(self, definition):
+    """
+    Gets whether the alert is being collected now. This is mainly used for
+    test verification of scheduling.
+    """
+    with self.__in_flight_lock:
+      return definition.get_uuid() in self.__in_flight
+
+
   def execute_alert(self, execution_commands):
     """
     Executes an alert immediately, ignoring any scheduled jobs. The existing
@@ -38,6 +38,11 @@ data_cleanup_max_age=2592000
 data_cleanup_max_size_MB = 100
 ping_port=8670
 cache_dir={ps}var{ps}lib{ps}ambari-agent{ps}cache
+cache_prefetch_threads=4
+parallel_execution=0
+status_command_workers=0
+batch_status_commands=false
+http_compression=true
 
 [services]
 
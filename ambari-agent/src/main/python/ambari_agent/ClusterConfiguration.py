@@ -18,6 +18,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import hashlib
 import logging
 import json
 import os
@@ -51,6 +52,9 @@ class ClusterConfiguration():
     # keys are cluster names, values are configurations
     self.__configurations = {}
 
+    # keys are cluster names, values are md5 hashes of the cached configurations
+    self.__configuration_hashes = {}
+
     self.__file_lock = threading.RLock()
     self.__cache_lock = threading.RLock()
     self.__config_json_file = os.path.join(self.cluster_config_cache_dir, self.FILENAME)
@@ -97,7 +101,14 @@ class ClusterConfiguration():
         if 'clusterName' in command and 'configurations' in command:
           cluster_name = command['clusterName']
           configurations = command['configurations']
-          self._update_configurations(cluster_name, configurations)
+          # commands of a single request usually share the configurations,
+          # tags are not enough as overrides change the values but not the tags
+          configuration_hash = hashlib.md5(
+            json.dumps(configurations, sort_keys=True)).hexdigest()
+          if self.__configuration_hashes.get(cluster_name) == configuration_hash:
+            continue
+          self._update_configurations(cluster_name, configurations,
+                                      configuration_hash)
 
       return
 
@@ -112,12 +123,14 @@ class ClusterConfiguration():
       return
 
 
-  def _update_configurations(self, cluster_name, configuration):
+  def _update_configurations(self, cluster_name, configuration,
+                             configuration_hash=None):
     """
     Thread-safe method for writing out the specified cluster configuration
     and updating the in-memory representation.
     :param cluster_name:
     :param configuration:
+    :param configuration_hash: md5 hash of the configuration, if known
     :return:
     """
     logger.info("Updating cached configurations for cluster {0}".format(cluster_name))
@@ -125,6 +138,7 @@ class ClusterConfiguration():
     self.__cache_lock.acquire()
     try:
       self.__configurations[cluster_name] = configuration
+      self.__configuration_hashes[cluster_name] = configuration_hash
     except Exception, exception :
       logger.exception("Unable to update configurations for cluster {0}".format(cluster_name))
     finally:
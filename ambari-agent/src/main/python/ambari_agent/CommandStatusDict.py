@@ -22,6 +22,7 @@ import json
 import logging
 import threading
 import copy
+import os
 from Grep import Grep
 
 logger = logging.getLogger()
@@ -42,6 +43,8 @@ class CommandStatusDict():
     self.current_state = {} # Contains all statuses
     self.callback_action = callback_action
     self.lock = threading.RLock()
+    # task id -> (signature of output files, in progress report)
+    self.in_progress_reports = {}
 
 
   def put_command_status(self, command, new_report):
@@ -96,6 +99,7 @@ class CommandStatusDict():
             resultReports.append(report)
             # Removing complete/failed command status from dict
             del self.current_state[key]
+            self.in_progress_reports.pop(key, None)
           else:
             in_progress_report = self.generate_in_progress_report(command, report)
             resultReports.append(in_progress_report)
@@ -116,19 +120,25 @@ class CommandStatusDict():
     and populates other fields of report.
     """
     from ActionQueue import ActionQueue
+    # Output files are reread only when they have changed since the previous
+    # heartbeat
+    signature = self.get_output_files_signature(report)
+    cached = self.in_progress_reports.get(command['taskId'])
+    if signature is not None and cached is not None and cached[0] == signature:
+      return copy.copy(cached[1])
+
+    grep = Grep()
     try:
-      tmpout = open(report['tmpout'], 'r').read()
+      output = grep.tail_file(report['tmpout'], Grep.OUTPUT_LAST_LINES)
       tmperr = open(report['tmperr'], 'r').read()
     except Exception, err:
       logger.warn(err)
-      tmpout = '...'
+      output = '...'
       tmperr = '...'
     try:
       tmpstructuredout = open(report['structuredOut'], 'r').read()
     except Exception:
       tmpstructuredout = '{}'
-    grep = Grep()
-    output = grep.tail(tmpout, Grep.OUTPUT_LAST_LINES)
     inprogress = self.generate_report_template(command)
     inprogress.update({
       'stdout': output,
@@ -137,9 +147,29 @@ class CommandStatusDict():
       'exitCode': 777,
       'status': ActionQueue.IN_PROGRESS_STATUS,
     })
+    if signature is not None:
+      self.in_progress_reports[command['taskId']] = (signature, inprogress)
+      inprogress = copy.copy(inprogress)
     return inprogress
 
 
+  def get_output_files_signature(self, report):
+    """
+    Returns sizes and modification times of the command output files,
+    None if none of them exists yet
+    """
+    signature = []
+    for name in ['tmpout', 'tmperr', 'structuredOut']:
+      try:
+        stat = os.stat(report[name])
+        signature.append((stat.st_size, stat.st_mtime))
+      except Exception:
+        signature.append(None)
+    if not any(signature):
+      return None
+    return tuple(signature)
+
+
   def generate_report_template(self, command):
     """
     Generates stub dict for command.
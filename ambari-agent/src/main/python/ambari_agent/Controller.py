@@ -75,6 +75,8 @@ class Controller(threading.Thread):
     self.isRegistered = False
     self.cachedconnect = None
     self.range = range
+    # Number of failed attempts to reach the server in a row
+    self.failed_attempts = 0
     self.hasMappedComponents = True
     # Event is used for synchronizing heartbeat iterations (to make possible
     # manual wait() interruption between heartbeats )
@@ -148,6 +150,7 @@ class Controller(threading.Thread):
 
         self.responseId = int(ret['responseId'])
         self.isRegistered = True
+        self.failed_attempts = 0
         if 'statusCommands' in ret.keys():
           logger.info("Got status commands on registration " + pprint.pformat(ret['statusCommands']))
           self.addToStatusQueue(ret['statusCommands'])
@@ -166,7 +169,7 @@ class Controller(threading.Thread):
         return
       except Exception:
         # try a reconnect only after a certain amount of random time
-        delay = randint(0, self.range)
+        delay = self.get_reconnect_delay()
         logger.error("Unable to connect to: " + self.registerUrl, exc_info=True)
         """ Sleeping for {0} seconds and then retrying again """.format(delay)
         time.sleep(delay)
@@ -295,6 +298,7 @@ class Controller(threading.Thread):
 
         retry = False
         certVerifFailed = False
+        self.failed_attempts = 0
         self.DEBUG_SUCCESSFULL_HEARTBEATS += 1
         self.DEBUG_HEARTBEAT_RETRIES = 0
         self.heartbeat_stop_callback.reset_heartbeat()
@@ -322,11 +326,11 @@ class Controller(threading.Thread):
             logger.warn("Server certificate verify failed. Did you regenerate server certificate?")
             certVerifFailed = True
 
-        self.cachedconnect = None  # Previous connection is broken now
+        # The broken connection is reestablished by the next request
         retry = True
 
         #randomize the heartbeat
-        delay = randint(0, self.range)
+        delay = self.get_reconnect_delay()
         time.sleep(delay)
 
       # Sleep for some time
@@ -375,6 +379,18 @@ class Controller(threading.Thread):
       time.sleep(self.netutil.HEARTBEAT_IDDLE_INTERVAL_SEC)
       self.heartbeatWithServer()
 
+  def get_reconnect_delay(self):
+    """
+    Returns random delay before the next attempt to reach the server. The
+    upper bound grows exponentially with failed attempts, up to self.range.
+    It starts at a quarter of self.range, so agents reconnecting after a
+    server restart are still spread over several seconds
+    """
+    upper_bound = min(self.range, max(1, self.range / 4) * 2 ** self.failed_attempts)
+    if upper_bound < self.range:
+      self.failed_attempts += 1
+    return randint(0, upper_bound)
+
   def restartAgent(self):
     os._exit(AGENT_AUTO_RESTART_EXIT_CODE)
     pass
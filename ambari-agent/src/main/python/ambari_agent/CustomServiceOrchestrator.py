@@ -18,16 +18,19 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import hashlib
 import logging
 import os
 import json
 import sys
+import tempfile
 from ambari_commons import shell
 import threading
 
 from FileCache import FileCache
 from AgentException import AgentException
 from PythonExecutor import PythonExecutor
+from StatusWorkerPool import StatusWorkerPool
 import hostname
 
 
@@ -42,6 +45,7 @@ class CustomServiceOrchestrator():
   SCRIPT_TYPE_PYTHON = "PYTHON"
   COMMAND_NAME_STATUS = "STATUS"
   COMMAND_NAME_SECURITY_STATUS = "SECURITY_STATUS"
+  COMMAND_NAME_STATUS_BATCH = "STATUS_BATCH"
   CUSTOM_ACTION_COMMAND = 'ACTIONEXECUTE'
   CUSTOM_COMMAND_COMMAND = 'CUSTOM_COMMAND'
 
@@ -52,12 +56,26 @@ class CustomServiceOrchestrator():
   PING_PORTS_KEY = "all_ping_ports"
   AMBARI_SERVER_HOST = "ambari_server_host"
 
+  # Command json refers to the file with configurations by this key
+  CONFIGURATIONS_FILE_KEY = "configurationsFile"
+
   def __init__(self, config, controller):
     self.config = config
     self.tmp_dir = config.get('agent', 'prefix')
     self.exec_tmp_dir = config.get('agent', 'tmp_dir')
     self.file_cache = FileCache(config)
     self.python_executor = PythonExecutor(self.tmp_dir, config)
+    self.parallel_execution = 0
+    if config.has_option('agent', 'parallel_execution'):
+      self.parallel_execution = int(config.get('agent', 'parallel_execution'))
+    # 0 - every status command starts a new interpreter, N - status commands
+    # are executed by up to N long-lived worker processes
+    self.status_worker_pool = None
+    if config.has_option('agent', 'status_command_workers'):
+      max_workers = int(config.get('agent', 'status_command_workers'))
+      if max_workers > 0:
+        self.status_worker_pool = StatusWorkerPool(self.tmp_dir, config,
+                                                   self.file_cache, max_workers)
     self.status_commands_stdout = os.path.join(self.tmp_dir,
                                                'status_command_stdout.txt')
     self.status_commands_stderr = os.path.join(self.tmp_dir,
@@ -164,13 +182,14 @@ class CustomServiceOrchestrator():
 
       # Executing hooks and script
       ret = None
+      python_executor = self.get_py_executor(command_name)
       from ActionQueue import ActionQueue
       if command.has_key('commandType') and command['commandType'] == ActionQueue.BACKGROUND_EXECUTION_COMMAND and len(filtered_py_file_list) > 1:
         raise AgentException("Background commands are supported without hooks only")
 
       for py_file, current_base_dir in filtered_py_file_list:
         script_params = [command_name, json_path, current_base_dir]
-        ret = self.python_executor.run_file(py_file, script_params,
+        ret = python_executor.run_file(py_file, script_params,
                                self.exec_tmp_dir, tmpoutfile, tmperrfile, timeout,
                                tmpstrucoutfile, logger_level, self.map_task_to_process,
                                task_id, override_output_files, handle = handle)
@@ -207,6 +226,20 @@ class CustomServiceOrchestrator():
       }
     return ret
 
+  def get_py_executor(self, command_name):
+    """
+    Status commands go to the warm workers if they are enabled.
+    PythonExecutor maintains internal state, so when commands are executed in
+    parallel lanes every command gets an executor of its own
+    """
+    if self.status_worker_pool and command_name in [self.COMMAND_NAME_STATUS,
+                                                    self.COMMAND_NAME_SECURITY_STATUS,
+                                                    self.COMMAND_NAME_STATUS_BATCH]:
+      return self.status_worker_pool
+    if self.parallel_execution > 1:
+      return PythonExecutor(self.tmp_dir, self.config)
+    return self.python_executor
+
   def command_canceled_reason(self, task_id):
     with self.commands_in_progress_lock:
       if self.commands_in_progress.has_key(task_id):#Background command do not push in this collection (TODO)
@@ -260,6 +293,45 @@ class CustomServiceOrchestrator():
 
     return result
 
+  def requestComponentStatusBatch(self, commands):
+    """
+     Determines status and security state of several components of the same
+     service package with a single script invocation.
+     Returns a list of (status result, security state) tuples in the order of
+     commands, status result has the same format as for requestComponentStatus().
+     Returns None if batch execution has failed
+    """
+    override_output_files=True # by default, we override status command output
+    if logger.level == logging.DEBUG:
+      override_output_files = False
+    batch_command = dict(commands[0])
+    batch_command['configurations'] = {}
+    batch_command['statusCommands'] = commands
+    res = self.runCommand(batch_command, self.status_commands_stdout,
+                          self.status_commands_stderr, self.COMMAND_NAME_STATUS_BATCH,
+                          override_output_files=override_output_files)
+    if res['exitcode'] != 0 or not isinstance(res.get('structuredOut'), dict) \
+        or 'components' not in res['structuredOut']:
+      logger.warn("Batch status command has failed, exit code {0}".format(res['exitcode']))
+      return None
+
+    components = res['structuredOut']['components']
+    results = []
+    for command in commands:
+      component = command['componentName']
+      if component not in components:
+        logger.warn("No status for component {0} in batch status command result".format(component))
+        return None
+      component_result = components[component]
+      status_result = {
+        'exitcode': component_result['exitcode'],
+        'stdout': res['stdout'],
+        'stderr': res['stderr'],
+        'structuredOut': component_result['structuredOut'],
+      }
+      results.append((status_result, component_result['securityState']))
+    return results
+
   def resolve_script_path(self, base_dir, script):
     """
     Incapsulates logic of script location determination.
@@ -296,6 +368,9 @@ class CustomServiceOrchestrator():
     command['public_hostname'] = public_fqdn
     # Add cache dir to make it visible for commands
     command["hostLevelParams"]["agentCacheDir"] = self.config.get('agent', 'cache_dir')
+    for status_command in command.get('statusCommands', []):
+      status_command['public_hostname'] = public_fqdn
+      status_command["hostLevelParams"]["agentCacheDir"] = command["hostLevelParams"]["agentCacheDir"]
     # Now, dump the json file
     command_type = command['commandType']
     from ActionQueue import ActionQueue  # To avoid cyclic dependency
@@ -308,6 +383,11 @@ class CustomServiceOrchestrator():
       if 'clusterHostInfo' in command and command['clusterHostInfo']:
         command['clusterHostInfo'] = self.decompressClusterHostInfo(command['clusterHostInfo'])
       file_path = os.path.join(self.tmp_dir, "command-{0}.json".format(task_id))
+      if command.get('configurationTags') and command.get('configurations'):
+        # Configurations are written once per version instead of every command
+        command = dict(command)
+        command[self.CONFIGURATIONS_FILE_KEY] = self.dump_configurations_to_json(command)
+        del command['configurations']
     # Json may contain passwords, that's why we need proper permissions
     if os.path.isfile(file_path):
       os.unlink(file_path)
@@ -317,6 +397,31 @@ class CustomServiceOrchestrator():
       f.write(content)
     return file_path
 
+  def dump_configurations_to_json(self, command):
+    """
+    Converts configurations of the command to json file shared by all commands
+    with the same configurations and returns file path
+    """
+    # Commands with the same tags may still carry different values (overrides,
+    # host and command specific properties), so the content itself is the key
+    content = json.dumps(command['configurations'], sort_keys = True)
+    file_path = os.path.join(self.tmp_dir, "configurations-{0}.json"
+                             .format(hashlib.md5(content).hexdigest()))
+    if os.path.exists(file_path):
+      # Keep the file from being removed by DataCleaner while it is in use
+      os.utime(file_path, None)
+    else:
+      # Commands may be dumped in parallel, so the file appears atomically
+      fd, tmp_path = tempfile.mkstemp(dir = self.tmp_dir, prefix = "configurations-")
+      with os.fdopen(fd, 'w') as f:
+        f.write(content)
+      try:
+        os.rename(tmp_path, file_path)
+      except OSError:
+        # Another command has written the same configurations already (Windows)
+        os.unlink(tmp_path)
+    return file_path
+
   def decompressClusterHostInfo(self, clusterHostInfo):
     info = clusterHostInfo.copy()
     #Pop info not related to host roles
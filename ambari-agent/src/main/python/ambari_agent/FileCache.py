@@ -19,9 +19,12 @@ limitations under the License.
 '''
 import StringIO
 
+import collections
 import logging
 import os
 import shutil
+import tempfile
+import threading
 import zipfile
 import urllib2
 import urllib
@@ -44,6 +47,11 @@ class FileCache():
   HOST_SCRIPTS_CACHE_DIRECTORY="host_scripts"
   HASH_SUM_FILE=".hash"
   ARCHIVE_NAME="archive.zip"
+  # New content is unpacked next to the directory and then moved in its place
+  STAGING_SUFFIX=".staging"
+  OBSOLETE_SUFFIX=".obsolete"
+  # Default count of threads refreshing the cache after registration
+  PREFETCH_THREADS=4
 
   BLOCK_SIZE=1024*16
   SOCKET_TIMEOUT=10
@@ -56,11 +64,58 @@ class FileCache():
     # from the server is not possible or agent should rollback to local copy
     self.tolerate_download_failures = \
           config.get('agent','tolerate_download_failures').lower() == 'true'
-    self.reset()
+    self.prefetch_threads = self.PREFETCH_THREADS
+    if config.has_option('agent', 'cache_prefetch_threads'):
+      self.prefetch_threads = int(config.get('agent', 'cache_prefetch_threads'))
+    self.opener = urllib2.build_opener(urllib2.ProxyHandler({}))
+    # Commands may be executed in parallel lanes, updates of the same
+    # directory should not interleave
+    self.lock = threading.RLock()
+    self.directory_locks = {} # full path -> lock
+    # full path -> (cache path, subdirectory) of directories checked before
+    self.known_directories = {}
+    self.server_url_prefix = None
+    self.uptodate_paths = [] # Paths that already have been recently checked
 
 
   def reset(self):
-    self.uptodate_paths = [] # Paths that already have been recently checked
+    """
+    Makes all directories be checked for updates again. Directories known
+    from previous commands are refreshed in background, so commands do
+    not wait for the server
+    """
+    with self.lock:
+      self.uptodate_paths = [] # Paths that already have been recently checked
+      directories = self.known_directories.values()
+      server_url_prefix = self.server_url_prefix
+    if directories and server_url_prefix and self.prefetch_threads > 0:
+      self.prefetch(directories, server_url_prefix)
+
+
+  def prefetch(self, directories, server_url_prefix):
+    """
+    Starts checking directories for updates in several background threads
+    """
+    logger.info("Refreshing {0} cached directories".format(len(directories)))
+    pending = collections.deque(directories)
+
+    def refresh():
+      while True:
+        try:
+          cache_path, subdirectory = pending.popleft()
+        except IndexError:
+          return
+        try:
+          self.provide_directory(cache_path, subdirectory, server_url_prefix)
+        except Exception, err:
+          # The command that needs the directory will retry
+          logger.warn("Unable to refresh cached directory {0} : {1}".format(
+            subdirectory, str(err)))
+
+    for i in range(min(self.prefetch_threads, len(directories))):
+      thread = threading.Thread(target=refresh, name="FileCachePrefetch-{0}".format(i))
+      thread.daemon = True
+      thread.start()
 
 
   def get_service_base_dir(self, command, server_url_prefix):
@@ -115,35 +170,49 @@ class FileCache():
     """
     full_path = os.path.join(cache_path, subdirectory)
     logger.debug("Trying to provide directory {0}".format(subdirectory))
-    try:
-      if full_path not in self.uptodate_paths:
-        logger.debug("Checking if update is available for "
-                     "directory {0}".format(full_path))
-        # Need to check for updates at server
-        remote_url = self.build_download_url(server_url_prefix,
-                                             subdirectory, self.HASH_SUM_FILE)
-        memory_buffer = self.fetch_url(remote_url)
-        remote_hash = memory_buffer.getvalue().strip()
-        local_hash = self.read_hash_sum(full_path)
-        if not local_hash or local_hash != remote_hash:
-          logger.debug("Updating directory {0}".format(full_path))
-          download_url = self.build_download_url(server_url_prefix,
-                                                 subdirectory, self.ARCHIVE_NAME)
-          membuffer = self.fetch_url(download_url)
-          self.invalidate_directory(full_path)
-          self.unpack_archive(membuffer, full_path)
-          self.write_hash_sum(full_path, remote_hash)
-        # Finally consider cache directory up-to-date
-        self.uptodate_paths.append(full_path)
-    except CachingException, e:
-      if self.tolerate_download_failures:
-        # ignore
-        logger.warn("Error occured during cache update. "
-                    "Error tolerate setting is set to true, so"
-                    " ignoring this error and continuing with current cache. "
-                    "Error details: {0}".format(str(e)))
-      else:
-        raise # we are not tolerant to exceptions, command execution will fail
+    with self.lock:
+      self.server_url_prefix = server_url_prefix
+      directory_lock = self.directory_locks.setdefault(full_path,
+                                                       threading.RLock())
+    # Different directories are updated concurrently
+    with directory_lock:
+      try:
+        if full_path not in self.uptodate_paths:
+          logger.debug("Checking if update is available for "
+                       "directory {0}".format(full_path))
+          # Need to check for updates at server
+          remote_url = self.build_download_url(server_url_prefix,
+                                               subdirectory, self.HASH_SUM_FILE)
+          memory_buffer = self.fetch_url(remote_url)
+          remote_hash = memory_buffer.getvalue().strip()
+          local_hash = self.read_hash_sum(full_path)
+          if not local_hash or local_hash != remote_hash:
+            logger.debug("Updating directory {0}".format(full_path))
+            download_url = self.build_download_url(server_url_prefix,
+                                                   subdirectory, self.ARCHIVE_NAME)
+            # Commands keep using the current content until the new one is ready
+            staging_path = full_path + self.STAGING_SUFFIX
+            archive = self.fetch_url(download_url, tempfile.TemporaryFile())
+            try:
+              self.invalidate_directory(staging_path)
+              self.unpack_archive(archive, staging_path)
+            finally:
+              archive.close()
+            self.write_hash_sum(staging_path, remote_hash)
+            self.replace_directory(staging_path, full_path)
+          # Finally consider cache directory up-to-date
+          with self.lock:
+            self.uptodate_paths.append(full_path)
+            self.known_directories[full_path] = (cache_path, subdirectory)
+      except CachingException, e:
+        if self.tolerate_download_failures:
+          # ignore
+          logger.warn("Error occured during cache update. "
+                      "Error tolerate setting is set to true, so"
+                      " ignoring this error and continuing with current cache. "
+                      "Error details: {0}".format(str(e)))
+        else:
+          raise # we are not tolerant to exceptions, command execution will fail
     return full_path
 
 
@@ -159,17 +228,17 @@ class FileCache():
                                 urllib.pathname2url(directory), filename)
 
 
-  def fetch_url(self, url):
+  def fetch_url(self, url, memory_buffer=None):
     """
-    Fetches content on url to in-memory buffer and returns the resulting buffer.
-    May throw exceptions because of various reasons
+    Fetches content on url to in-memory buffer (or to the given file) and
+    returns the resulting buffer. May throw exceptions because of various
+    reasons
     """
     logger.debug("Trying to download {0}".format(url))
     try:
-      memory_buffer = StringIO.StringIO()
-      proxy_handler = urllib2.ProxyHandler({})
-      opener = urllib2.build_opener(proxy_handler)
-      u = opener.open(url, timeout=self.SOCKET_TIMEOUT)
+      if memory_buffer is None:
+        memory_buffer = StringIO.StringIO()
+      u = self.opener.open(url, timeout=self.SOCKET_TIMEOUT)
       logger.debug("Connected with {0} with code {1}".format(u.geturl(),
                                                              u.getcode()))
       buff = u.read(self.BLOCK_SIZE)
@@ -178,6 +247,7 @@ class FileCache():
         buff = u.read(self.BLOCK_SIZE)
         if not buff:
           break
+      memory_buffer.seek(0)
       return memory_buffer
     except Exception, err:
       raise CachingException("Can not download file from"
@@ -230,6 +300,28 @@ class FileCache():
                              directory, str(err))
 
 
+  def replace_directory(self, staging_directory, directory):
+    """
+    Moves the staging directory in place of the directory. The previous
+    content is moved away first, so the directory is missing only between
+    two renames
+    """
+    obsolete_directory = directory + self.OBSOLETE_SUFFIX
+    try:
+      if os.path.isdir(obsolete_directory):
+        shutil.rmtree(obsolete_directory)
+      if os.path.isfile(directory):
+        os.unlink(directory)
+      elif os.path.isdir(directory):
+        os.rename(directory, obsolete_directory)
+      os.rename(staging_directory, directory)
+    except Exception, err:
+      raise CachingException("Can not replace cache directory {0}: {1}".format(
+                             directory, str(err)))
+    # Files of the previous content may still be in use on Windows
+    shutil.rmtree(obsolete_directory, ignore_errors=True)
+
+
   def unpack_archive(self, mem_buffer, target_directory):
     """
     Unpacks contents of in-memory buffer to file system.
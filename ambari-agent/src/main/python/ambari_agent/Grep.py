@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+
 class Grep:
 
   # How many lines from command output send to server
@@ -74,3 +76,21 @@ class Grep:
       length = len(lines)
       tailed = lines[length - n:]
       return "".join(tailed)
+
+  def tail_file(self, path, n, block_size=8192):
+    """
+    Same as tail() for the contents of the file, reads only the end of it
+    """
+    with open(path, 'rb') as fp:
+      fp.seek(0, os.SEEK_END)
+      position = fp.tell()
+      data = ''
+      while position > 0:
+        # One more line separator is needed to make sure the first line is whole
+        if data.rstrip().count('\n') > n:
+          break
+        read_size = min(block_size, position)
+        position -= read_size
+        fp.seek(position)
+        data = fp.read(read_size) + data
+    return self.tail(data, n)
@@ -18,6 +18,8 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import copy
+import hashlib
 import json
 import logging
 import os
@@ -39,6 +41,8 @@ class Heartbeat:
     self.config = config
     self.reports = []
     self.collector = alert_collector
+    # section -> hash of the host environment content reported last time
+    self.reported_host_env = {}
 
   def build(self, id='-1', state_interval=-1, componentsMapped=False):
     global clusterId, clusterDefinitionRevision, firstContact
@@ -83,9 +87,16 @@ class Heartbeat:
       # for now, just do the same work as registration
       # this must be the last step before returning heartbeat
       hostInfo.register(nodeInfo, componentsMapped, commandsInProgress)
-      heartbeat['agentEnv'] = nodeInfo
       mounts = Hardware.osdisks()
-      heartbeat['mounts'] = mounts
+
+      # The first heartbeat after registration carries a full snapshot,
+      # afterwards sections are sent only when their content changes
+      if int(id) == 0:
+        self.reported_host_env.clear()
+      if self.host_env_changed('agentEnv', nodeInfo):
+        heartbeat['agentEnv'] = nodeInfo
+      if self.host_env_changed('mounts', mounts):
+        heartbeat['mounts'] = mounts
 
       if logger.isEnabledFor(logging.DEBUG):
         logger.debug("agentEnv: %s", str(nodeInfo))
@@ -96,6 +107,22 @@ class Heartbeat:
     
     return heartbeat
 
+  def host_env_changed(self, section, content):
+    """
+    Returns True if the content of the host environment section differs from
+    the content reported last time
+    """
+    if section == 'agentEnv' and 'hostHealth' in content:
+      # reporting timestamp changes every time
+      content = copy.copy(content)
+      content['hostHealth'] = dict(content['hostHealth'])
+      content['hostHealth'].pop('agentTimeStampAtReporting', None)
+    content_hash = hashlib.md5(json.dumps(content, sort_keys=True)).hexdigest()
+    if self.reported_host_env.get(section) == content_hash:
+      return False
+    self.reported_host_env[section] = content_hash
+    return True
+
 def main(argv=None):
   from ambari_agent.ActionQueue import ActionQueue
   from ambari_agent.AmbariConfig import AmbariConfig
@@ -43,12 +43,13 @@ class PythonExecutor:
   """
   NO_ERROR = "none"
   grep = Grep()
-  event = threading.Event()
   python_process_has_been_killed = False
 
   def __init__(self, tmpDir, config):
     self.tmpDir = tmpDir
     self.config = config
+    # wakes up the watchdog of this executor only, executors of the other commands are not affected
+    self.event = threading.Event()
     pass
 
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import collections
+import json
+import logging
+import os
+import subprocess
+import threading
+from threading import Thread
+
+from PythonExecutor import PythonExecutor
+from ambari_commons import shell
+
+logger = logging.getLogger()
+
+class StatusWorkerPool(PythonExecutor):
+  """
+  Executes status commands in long-lived python processes (see
+  status_worker.py) instead of starting a new interpreter for every check.
+  Every service scripts directory gets a worker of its own, so modules with
+  the same name from different services never meet in one interpreter.
+  """
+
+  WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "status_worker.py")
+
+  def __init__(self, tmpDir, config, file_cache, max_workers):
+    PythonExecutor.__init__(self, tmpDir, config)
+    self.file_cache = file_cache
+    self.max_workers = max_workers
+    self.workers = collections.OrderedDict() # script dir -> StatusWorkerProcess
+    self.lock = threading.RLock()
+
+  def run_file(self, script, script_params, tmp_dir, tmpoutfile, tmperrfile,
+               timeout, tmpstructedoutfile, logger_level, callback, task_id,
+               override_output_files = True, handle = None):
+    """
+    Has the same contract as PythonExecutor.run_file(), background
+    execution is not supported
+    """
+    script_params += [tmpstructedoutfile, logger_level, tmp_dir]
+    base_dir = script_params[2]
+    request = {
+      'script': script,
+      'params': script_params,
+      'out': tmpoutfile,
+      'err': tmperrfile,
+      'override_output_files': override_output_files,
+      # Service modules are reloaded when the directory is updated
+      'cache_key': self.file_cache.read_hash_sum(base_dir),
+    }
+    with self.lock:
+      worker = self.get_worker(os.path.dirname(os.path.abspath(script)))
+      callback(task_id, worker.process.pid)
+      returncode, self.python_process_has_been_killed = worker.execute(request, timeout)
+    return self.prepare_process_result(ProcessResult(returncode), tmpoutfile,
+                                       tmperrfile, tmpstructedoutfile, timeout=timeout)
+
+  def get_worker(self, script_dir):
+    """
+    Returns a running worker for the directory, least recently used workers
+    are stopped when there are too many of them
+    """
+    worker = self.workers.pop(script_dir, None)
+    if worker is None or not worker.is_alive():
+      while len(self.workers) >= self.max_workers:
+        _, evicted = self.workers.popitem(last=False)
+        evicted.stop()
+      logger.info("Starting status command worker for {0}".format(script_dir))
+      worker = StatusWorkerProcess(self.python_command(self.WORKER_SCRIPT, []))
+    self.workers[script_dir] = worker
+    return worker
+
+  def stop(self):
+    with self.lock:
+      for worker in self.workers.values():
+        worker.stop()
+      self.workers.clear()
+
+
+class StatusWorkerProcess():
+  """
+  Handle of a single worker process
+  """
+
+  def __init__(self, command):
+    self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, close_fds=True)
+
+  def is_alive(self):
+    return self.process.poll() is None
+
+  def execute(self, request, timeout):
+    """
+    Returns a tuple (exit code, whether the worker has been killed
+    due to timeout)
+    """
+    finished = threading.Event()
+    killed = []
+
+    def watchdog():
+      finished.wait(timeout)
+      if not finished.isSet():
+        logger.error("Status command timed out, worker will be killed")
+        shell.kill_process_with_children(self.process.pid)
+        killed.append(True)
+
+    thread = Thread(target = watchdog)
+    thread.start()
+    try:
+      self.process.stdin.write(json.dumps(request) + '\n')
+      self.process.stdin.flush()
+      response = self.process.stdout.readline()
+    except IOError, err:
+      logger.warn("Status command worker has failed: {0}".format(str(err)))
+      response = None
+    finished.set()
+    thread.join()
+
+    if not response:
+      self.stop()
+      return 1, bool(killed)
+    return json.loads(response)['exitcode'], False
+
+  def stop(self):
+    if self.is_alive():
+      try:
+        # No request is in flight here, so there are no children to care about
+        self.process.stdin.close()
+        self.process.terminate()
+      except Exception, err:
+        logger.warn("Unable to stop status command worker: {0}".format(str(err)))
+    self.process.wait()
+
+
+class ProcessResult():
+  """
+  Mimics a finished subprocess for PythonExecutor.prepare_process_result()
+  """
+  def __init__(self, returncode):
+    self.returncode = returncode
@@ -102,11 +102,26 @@ class BaseAlert(object):
   def collect(self):
     """ method used for collection.  defers to _collect() """
     
-    res = (BaseAlert.RESULT_UNKNOWN, [])
-    res_base_text = None
-    
     try:
       res = self._collect()
+    except Exception as exception:
+      self.put_result(None, exception)
+      return
+
+    self.put_result(res)
+
+
+  def put_result(self, res, exception=None):
+    """
+    Puts the result of _collect() to the collector; exception is the one
+    raised by _collect() instead of returning the result
+    """
+    res_base_text = None
+
+    try:
+      if exception is not None:
+        raise exception
+
       result_state = res[0]
       reporting_state = result_state.lower()
 
@@ -18,12 +18,12 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import imp
 import json
 import logging
 import re
+import threading
+import time
 import urllib2
-import uuid
 
 from alerts.base_alert import BaseAlert
 from ambari_commons.urllib_handlers import RefreshHeaderProcessor
@@ -32,6 +32,9 @@ from resource_management.libraries.functions.get_port_from_url import get_port_f
 logger = logging.getLogger()
 
 class MetricAlert(BaseAlert):
+
+  # JMX responses are shared between all METRIC alerts for this long
+  JMX_CACHE_TTL_SECONDS = 10
   
   def __init__(self, alert_meta, alert_source_meta):
     super(MetricAlert, self).__init__(alert_meta, alert_source_meta)
@@ -152,15 +155,7 @@ class MetricAlert(BaseAlert):
       url = "{0}://{1}:{2}/jmx?qry={3}".format(
         "https" if ssl else "http", host, str(port), jmx_property_key)
 
-      # use a customer header processor that will look for the non-standard
-      # "Refresh" header and attempt to follow the redirect
-      url_opener = urllib2.build_opener(RefreshHeaderProcessor())
-      response = url_opener.open(url)
-
-      content = response.read()
-
-      json_response = json.loads(content)
-      json_data = json_response['beans'][0]
+      json_data = JMX_CACHE.get(url, self._fetch_jmx_bean)
       
       for attr in jmx_property_value:
         if attr not in json_data:
@@ -170,6 +165,20 @@ class MetricAlert(BaseAlert):
         
     return value_list
 
+
+  def _fetch_jmx_bean(self, url):
+    """ requests the url and returns the first bean of the response """
+    # use a customer header processor that will look for the non-standard
+    # "Refresh" header and attempt to follow the redirect
+    url_opener = urllib2.build_opener(RefreshHeaderProcessor())
+    response = url_opener.open(url)
+
+    content = response.read()
+
+    json_response = json.loads(content)
+    return json_response['beans'][0]
+
+
   def _get_reporting_text(self, state):
     '''
     Always returns {0} since the result of the script alert is a rendered string.
@@ -183,17 +192,17 @@ class MetricAlert(BaseAlert):
 
     
 class JmxMetric:
+  # value expression -> compiled function, shared by all definitions
+  compiled_expressions = {}
+  compiled_expressions_lock = threading.Lock()
+
   def __init__(self, jmx_info):
-    self.custom_module = None
+    self.value_function = None
     self.property_list = jmx_info['property_list']
     self.property_map = {}
     
     if 'value' in jmx_info:
-      realcode = re.sub('(\{(\d+)\})', 'args[\g<2>]', jmx_info['value'])
-      
-      self.custom_module =  imp.new_module(str(uuid.uuid4()))
-      code = 'def f(args):\n  return ' + realcode
-      exec code in self.custom_module.__dict__
+      self.value_function = JmxMetric.compile_expression(jmx_info['value'])
     
     for p in self.property_list:
       parts = p.split('/')
@@ -203,6 +212,89 @@ class JmxMetric:
 
       
   def calculate(self, args):
-    if self.custom_module is not None:
-      return self.custom_module.f(args)
+    if self.value_function is not None:
+      return self.value_function(args)
     return None
+
+
+  @staticmethod
+  def compile_expression(expression):
+    """
+    Returns a function calculating the expression, where {N} stands for the
+    N-th metric value. Invalid expressions produce a function which raises
+    the compilation error, so only the alert using it fails.
+    """
+    with JmxMetric.compiled_expressions_lock:
+      if expression in JmxMetric.compiled_expressions:
+        return JmxMetric.compiled_expressions[expression]
+
+    realcode = re.sub('(\{(\d+)\})', 'args[\g<2>]', expression)
+    try:
+      value_function = eval(compile('lambda args: ' + realcode, '<jmx value>', 'eval'), {})
+    except SyntaxError, err:
+      logger.error("Invalid metric value expression '{0}': {1}".format(expression, str(err)))
+      def value_function(args):
+        raise Exception("Invalid metric value expression '{0}': {1}".format(expression, str(err)))
+
+    with JmxMetric.compiled_expressions_lock:
+      JmxMetric.compiled_expressions[expression] = value_function
+    return value_function
+
+
+class JmxResponseCache:
+  """
+  Keeps JMX responses for a short time, so alerts querying the same bean
+  share a single request. Concurrent requests for the same url wait for
+  the one already in progress.
+  """
+
+  def __init__(self, ttl):
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.entries = {} # url -> JmxResponseCacheEntry
+
+
+  def get(self, url, loader):
+    """
+    Returns the cached response for the url, calls loader(url) if there is
+    no fresh one
+    """
+    now = time.time()
+    with self.lock:
+      entry = self.entries.get(url)
+      if entry is None or entry.is_expired(now):
+        # forget responses nobody has asked for
+        for cached_url, cached_entry in self.entries.items():
+          if cached_entry.is_expired(now):
+            del self.entries[cached_url]
+        entry = JmxResponseCacheEntry(self.ttl)
+        self.entries[url] = entry
+
+    return entry.get(url, loader)
+
+
+class JmxResponseCacheEntry:
+  def __init__(self, ttl):
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.loaded = False
+    self.response = None
+    self.expires = None
+
+
+  def is_expired(self, now):
+    return self.expires is not None and now >= self.expires
+
+
+  def get(self, url, loader):
+    with self.lock:
+      if not self.loaded:
+        # failed requests are not cached, the next caller tries again
+        self.response = loader(url)
+        self.loaded = True
+        self.expires = time.time() + self.ttl
+      return self.response
+
+
+JMX_CACHE = JmxResponseCache(MetricAlert.JMX_CACHE_TTL_SECONDS)
+
@@ -19,9 +19,9 @@ limitations under the License.
 """
 
 import logging
-import socket
-import time
+import threading
 from alerts.base_alert import BaseAlert
+from alerts.port_prober import get_port_prober
 from resource_management.libraries.functions.get_port_from_url import get_port_from_url
 from ambari_commons import OSCheck
 from ambari_commons.inet_utils import resolve_address
@@ -40,6 +40,8 @@ class PortAlert(BaseAlert):
     self.default_port = None
     self.warning_timeout = DEFAULT_WARNING_TIMEOUT
     self.critical_timeout = DEFAULT_CRITICAL_TIMEOUT
+    # (configured URI, (URI, host, port)) of the last check
+    self.address = None
 
     if 'uri' in alert_source_meta:
       self.uri = alert_source_meta['uri']
@@ -79,10 +81,68 @@ class PortAlert(BaseAlert):
 
 
   def _collect(self):
+    """
+    Checks the port and waits for the result, scheduled checks are made by
+    collect_async() instead
+    """
+    uri_value, host, port = self._get_address()
+    if port is None:
+      return (self.RESULT_UNKNOWN, ['Unable to determine port from URI {0}'.format(uri_value)])
+
+    finished = threading.Event()
+    results = []
+    def callback(seconds, error):
+      results.append(self._get_result(host, port, seconds, error))
+      finished.set()
+
+    get_port_prober().probe(host, port, self.critical_timeout, callback)
+    finished.wait()
+    return results[0]
+
+
+  def collect_async(self, prober, callback):
+    """
+    Starts the check in the prober. The result is put to the collector and
+    callback() is called when the check has finished, the calling thread is
+    not blocked meanwhile
+    """
+    try:
+      uri_value, host, port = self._get_address()
+    except Exception as exception:
+      try:
+        self.put_result(None, exception)
+      finally:
+        callback()
+      return
+
+    if port is None:
+      try:
+        self.put_result((self.RESULT_UNKNOWN, ['Unable to determine port from URI {0}'.format(uri_value)]))
+      finally:
+        callback()
+      return
+
+    def put_result(seconds, error):
+      try:
+        self.put_result(self._get_result(host, port, seconds, error))
+      finally:
+        callback()
+
+    prober.probe(host, port, self.critical_timeout, put_result)
+
+
+  def _get_address(self):
+    """
+    Returns (URI, host, port); port is None if it can't be determined. The
+    address is parsed again only when the configured URI changes.
+    """
     # can be parameterized or static
     # if not parameterized, this will return the static value
     uri_value = self._get_configuration_value(self.uri)
+    if self.address is not None and self.address[0] == uri_value:
+      return self.address[1]
 
+    configured_uri = uri_value
     if uri_value is None:
       uri_value = self.host_name
       logger.debug("[Alert][{0}] Setting the URI to this host since it wasn't specified".format(
@@ -108,50 +168,33 @@ class PortAlert(BaseAlert):
     try:
       port = int(get_port_from_url(uri_value))
     except:
-      if self.default_port is None:
-        label = 'Unable to determine port from URI {0}'.format(uri_value)
-        return (self.RESULT_UNKNOWN, [label])
-
       port = self.default_port
 
+    if OSCheck.is_windows_family():
+      # on windows 0.0.0.0 is invalid address to connect but on linux it resolved to 127.0.0.1
+      host = resolve_address(host)
 
     if logger.isEnabledFor(logging.DEBUG):
       logger.debug("[Alert][{0}] Checking {1} on port {2}".format(
         self.get_name(), host, str(port)))
-    
-    try:
-      s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-      s.settimeout(self.critical_timeout)
-
-      if OSCheck.is_windows_family():
-        # on windows 0.0.0.0 is invalid address to connect but on linux it resolved to 127.0.0.1
-        host = resolve_address(host)
-
-      start_time = time.time()
-      s.connect((host, port))
-      end_time = time.time()
-      milliseconds = end_time - start_time
-      seconds = milliseconds / 1000.0
-
-      # not sure why this happens sometimes, but we don't always get a
-      # socket exception if the connect() is > than the critical threshold
-      if seconds >= self.critical_timeout:
-        return (self.RESULT_CRITICAL, ['Socket Timeout', host, port])
-
-      result = self.RESULT_OK
-      if seconds >= self.warning_timeout:
-        result = self.RESULT_WARNING
-
-      return (result, [seconds, port])
-    except Exception as e:
-      return (self.RESULT_CRITICAL, [str(e), host, port])
-    finally:
-      if s is not None:
-        try:
-          s.close()
-        except:
-          # no need to log a close failure
-          pass
+
+    self.address = (configured_uri, (uri_value, host, port))
+    return self.address[1]
+
+
+  def _get_result(self, host, port, seconds, error):
+    if error is not None:
+      return (self.RESULT_CRITICAL, [str(error), host, port])
+
+    # the connection might have been made just after the critical threshold
+    if seconds >= self.critical_timeout:
+      return (self.RESULT_CRITICAL, ['Socket Timeout', host, port])
+
+    result = self.RESULT_OK
+    if seconds >= self.warning_timeout:
+      result = self.RESULT_WARNING
+
+    return (result, [seconds, port])
 
   def _get_reporting_text(self, state):
     '''
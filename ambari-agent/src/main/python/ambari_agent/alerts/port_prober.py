@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import errno
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+logger = logging.getLogger()
+
+# resolved addresses are reused by the checks made during this time
+DNS_CACHE_TTL = 60
+# connect() of a non-blocking socket is in progress
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035) # WSAEWOULDBLOCK
+
+
+class PortProber(object):
+  """
+  Checks TCP ports concurrently. Connections are opened with non-blocking
+  connect() and a single thread waits for all of them with select(), so
+  ports which do not respond do not hold a thread each.
+  """
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    # socket -> (start time, deadline, callback)
+    self.pending = {}
+    # host -> (address, expiration time)
+    self.addresses = {}
+    self.thread = None
+    self.wakeup_receiver = None
+    self.wakeup_sender = None
+
+  def probe(self, host, port, timeout, callback):
+    """
+    Starts connecting to the port. callback(seconds, error) is called with
+    the connect latency, or with the error when the connection failed or did
+    not finish in timeout seconds. It is called by the thread of the prober
+    unless the result is known immediately.
+    """
+    sock = None
+    try:
+      address = self.resolve(host)
+      sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+      sock.setblocking(0)
+      start_time = time.time()
+      code = sock.connect_ex((address, port))
+    except Exception as exception:
+      self._close(sock)
+      self._call(callback, None, exception)
+      return
+
+    if code == 0:
+      seconds = time.time() - start_time
+      self._close(sock)
+      self._call(callback, seconds, None)
+    elif code in CONNECT_IN_PROGRESS:
+      with self.lock:
+        self._start()
+        self.pending[sock] = (start_time, start_time + timeout, callback)
+      self._wakeup()
+    else:
+      self._close(sock)
+      self._call(callback, None, socket.error(code, os.strerror(code)))
+
+  def resolve(self, host):
+    """
+    Returns IPv4 address of the host, the address is cached for DNS_CACHE_TTL
+    seconds
+    """
+    now = time.time()
+    with self.lock:
+      address, expiration_time = self.addresses.get(host, (None, 0))
+    if now < expiration_time:
+      return address
+
+    address = socket.gethostbyname(host)
+    with self.lock:
+      self.addresses[host] = (address, now + DNS_CACHE_TTL)
+    return address
+
+  def _start(self):
+    if self.thread is not None:
+      return
+    self.wakeup_receiver, self.wakeup_sender = _create_socket_pair()
+    self.thread = threading.Thread(target=self._run, name="PortProber")
+    self.thread.daemon = True
+    self.thread.start()
+
+  def _wakeup(self):
+    try:
+      self.wakeup_sender.send('x')
+    except socket.error:
+      pass # the prober is being woken up already
+
+  def _run(self):
+    while True:
+      with self.lock:
+        sockets = self.pending.keys()
+        deadlines = [deadline for _, deadline, _ in self.pending.values()]
+
+      timeout = max(0, min(deadlines) - time.time()) if deadlines else None
+      try:
+        readable, writable, failed = select.select([self.wakeup_receiver], sockets, sockets, timeout)
+      except select.error as err:
+        if err.args[0] == errno.EINTR:
+          continue
+        raise
+      now = time.time()
+
+      if readable:
+        try:
+          self.wakeup_receiver.recv(1024)
+        except socket.error:
+          pass
+
+      finished = []
+      with self.lock:
+        for sock in set(writable + failed):
+          start_time, _, callback = self.pending.pop(sock)
+          code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+          error = socket.error(code, os.strerror(code)) if code else None
+          finished.append((sock, callback, now - start_time, error))
+
+        for sock, (start_time, deadline, callback) in self.pending.items():
+          if deadline <= now:
+            del self.pending[sock]
+            finished.append((sock, callback, now - start_time, socket.timeout('timed out')))
+
+      for sock, callback, seconds, error in finished:
+        self._close(sock)
+        if error is None:
+          self._call(callback, seconds, None)
+        else:
+          self._call(callback, None, error)
+
+  @staticmethod
+  def _call(callback, seconds, error):
+    try:
+      callback(seconds, error)
+    except:
+      logger.exception("[PortProber] Unable to handle the result of a port check")
+
+  @staticmethod
+  def _close(sock):
+    if sock is not None:
+      try:
+        sock.close()
+      except:
+        # no need to log a close failure
+        pass
+
+
+def _create_socket_pair():
+  """
+  socket.socketpair() is not available on windows
+  """
+  if hasattr(socket, 'socketpair'):
+    receiver, sender = socket.socketpair()
+  else:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+      listener.bind(('127.0.0.1', 0))
+      listener.listen(1)
+      sender = socket.create_connection(listener.getsockname())
+      receiver, _ = listener.accept()
+    finally:
+      listener.close()
+  sender.setblocking(0)
+  return receiver, sender
+
+
+_port_prober = None
+_port_prober_lock = threading.Lock()
+
+def get_port_prober():
+  """
+  The prober shared by all PORT alerts of the agent
+  """
+  global _port_prober
+  with _port_prober_lock:
+    if _port_prober is None:
+      _port_prober = PortProber()
+    return _port_prober
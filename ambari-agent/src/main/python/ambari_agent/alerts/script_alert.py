@@ -22,12 +22,18 @@ import imp
 import logging
 import os
 import re
+import threading
 from alerts.base_alert import BaseAlert
+from FileCache import FileCache
 from resource_management.core.environment import Environment
 
 logger = logging.getLogger()
 
 class ScriptAlert(BaseAlert):
+  # path to script -> (mtime, hash of the cached directory, module)
+  loaded_modules = {}
+  loaded_modules_lock = threading.Lock()
+
   def __init__(self, alert_meta, alert_source_meta, config):
     """ ScriptAlert reporting structure is output from the script itself """
     
@@ -46,6 +52,10 @@ class ScriptAlert(BaseAlert):
     self.common_services_dir = None
     self.host_scripts_dir = None
     self.path_to_script = None
+    # directory the script was downloaded to by FileCache
+    self.cache_dir = None
+    # resource_management environment of the script, created once
+    self.environment = None
     
     if 'path' in alert_source_meta:
       self.path = alert_source_meta['path']
@@ -84,7 +94,13 @@ class ScriptAlert(BaseAlert):
       matchObj = re.match( r'((.*)services\/(.*)\/package\/)', self.path_to_script)
       if matchObj:
         basedir = matchObj.group(1)
-        with Environment(basedir, tmp_dir=self.config.get('agent', 'tmp_dir')) as env:
+        tmp_dir = self.config.get('agent', 'tmp_dir')
+        if self.environment is None or self.environment.config.basedir != basedir:
+          self.environment = Environment(basedir, tmp_dir=tmp_dir)
+        else:
+          # nothing of the previous run is kept
+          self.environment.reset(basedir, False, tmp_dir)
+        with self.environment as env:
           return cmd_module.execute(parameters, self.host_name)
       else:
         return cmd_module.execute(parameters, self.host_name)
@@ -93,9 +109,53 @@ class ScriptAlert(BaseAlert):
     
 
   def _load_source(self):
+    """
+    Returns the module of the script. Modules are loaded once and shared by
+    all the alerts of the script, they are loaded again only when the script
+    or its cached directory has been updated.
+    """
     if self.path is None and self.stack_path is None and self.host_scripts_dir is None:
       raise Exception("The attribute 'path' must be specified")
 
+    # the path is resolved once, unless the script has been removed
+    try:
+      if self.path_to_script is None:
+        raise OSError()
+      mtime = os.stat(self.path_to_script).st_mtime
+    except OSError:
+      self._resolve_path()
+      mtime = os.stat(self.path_to_script).st_mtime
+
+    if logger.isEnabledFor(logging.DEBUG):
+      logger.debug("[Alert][{0}] Executing script check {1}".format(
+        self.get_name(), self.path_to_script))
+
+          
+    if (not self.path_to_script.endswith('.py')):
+      logger.error("[Alert][{0}] Unable to execute script {1}".format(
+        self.get_name(), self.path_to_script))
+
+      return None
+
+    cache_hash = None
+    if self.cache_dir is not None:
+      try:
+        with open(os.path.join(self.cache_dir, FileCache.HASH_SUM_FILE)) as fp:
+          cache_hash = fp.readline().strip()
+      except IOError:
+        pass
+
+    with ScriptAlert.loaded_modules_lock:
+      loaded = ScriptAlert.loaded_modules.get(self.path_to_script)
+      if loaded is not None and loaded[:2] == (mtime, cache_hash):
+        return loaded[2]
+
+      module = imp.load_source(self._get_alert_meta_value_safely('name'), self.path_to_script)
+      ScriptAlert.loaded_modules[self.path_to_script] = (mtime, cache_hash, module)
+      return module
+
+
+  def _resolve_path(self):
     paths = self.path.split('/')
     self.path_to_script = self.path
     
@@ -113,22 +173,21 @@ class ScriptAlert(BaseAlert):
 
     # if the path can't be evaluated, throw exception      
     if not os.path.exists(self.path_to_script) or not os.path.isfile(self.path_to_script):
+      self.path_to_script = None
       raise Exception(
         "Unable to find '{0}' as an absolute path or part of {1} or {2}".format(self.path,
           self.stacks_dir, self.host_scripts_dir))
 
-    if logger.isEnabledFor(logging.DEBUG):
-      logger.debug("[Alert][{0}] Executing script check {1}".format(
-        self.get_name(), self.path_to_script))
-
-          
-    if (not self.path_to_script.endswith('.py')):
-      logger.error("[Alert][{0}] Unable to execute script {1}".format(
-        self.get_name(), self.path_to_script))
-
-      return None
-
-    return imp.load_source(self._get_alert_meta_value_safely('name'), self.path_to_script)
+    # FileCache keeps the hash of the downloaded content in the package
+    # directory of a service or in the host scripts directory
+    matchObj = re.match( r'((.*)services\/(.*)\/package\/)', self.path_to_script)
+    if matchObj:
+      self.cache_dir = matchObj.group(1)
+    elif self.host_scripts_dir is not None and \
+        self.path_to_script.startswith(os.path.join(self.host_scripts_dir, '')):
+      self.cache_dir = self.host_scripts_dir
+    else:
+      self.cache_dir = None
 
 
   def _get_reporting_text(self, state):
@@ -20,14 +20,12 @@ limitations under the License.
 
 import logging
 import time
-import subprocess
 import os
 from  tempfile import gettempdir
 from alerts.base_alert import BaseAlert
 from collections import namedtuple
 from resource_management.libraries.functions.get_port_from_url import get_port_from_url
-from resource_management.libraries.functions import get_kinit_path
-from resource_management.libraries.functions import get_klist_path
+from resource_management.libraries.functions.web_request import make_web_request, ticket_manager
 from ambari_commons import OSCheck
 from ambari_commons.inet_utils import resolve_address
 
@@ -44,7 +42,7 @@ except ImportError:
 
 logger = logging.getLogger()
 
-CURL_CONNECTION_TIMEOUT = '20'
+CONNECTION_TIMEOUT = 20
 
 class WebAlert(BaseAlert):
   
@@ -146,45 +144,28 @@ class WebAlert(BaseAlert):
         kerberos_keytab = self._get_configuration_value(self.uri_property_keys.kerberos_keytab)
 
       if kerberos_principal is not None and kerberos_keytab is not None:
-        # Create the kerberos credentials cache (ccache) file and set it in the environment to use
-        # when executing curl. Use the md5 hash of the combination of the principal and keytab file
-        # to generate a (relatively) unique cache filename so that we can use it as needed.
+        # Create the kerberos credentials cache (ccache) file to use for SPNEGO. Use the md5 hash
+        # of the combination of the principal and keytab file to generate a (relatively) unique
+        # cache filename so that we can use it as needed.
         tmp_dir = self.config.get('agent', 'tmp_dir')
         if tmp_dir is None:
           tmp_dir = gettempdir()
 
         ccache_file_name = _md5("{0}|{1}".format(kerberos_principal, kerberos_keytab)).hexdigest()
         ccache_file_path = "{0}{1}web_alert_cc_{2}".format(tmp_dir, os.sep, ccache_file_name)
-        kerberos_env = {'KRB5CCNAME': ccache_file_path}
-
-        # If there are no tickets in the cache or they are expired, perform a kinit, else use what
-        # is in the cache
-        klist_path_local = get_klist_path()
-
-        if os.system("{0} -s {1}".format(klist_path_local, ccache_file_path)) != 0:
-          kinit_path_local = get_kinit_path()
-          logger.debug("[Alert][{0}] Enabling Kerberos authentication via GSSAPI using ccache at {1}."
-                       .format(self.get_name(), ccache_file_path))
-          os.system("{0} -l 5m -c {1} -kt {2} {3} > /dev/null".format(kinit_path_local, ccache_file_path, kerberos_keytab, kerberos_principal))
-        else:
-          logger.debug("[Alert][{0}] Kerberos authentication via GSSAPI already enabled using ccache at {1}."
-                       .format(self.get_name(), ccache_file_path))
+
+        # the ticket manager keeps track of ticket expiration, kinit is executed only when
+        # there is no valid ticket in the cache
+        logger.debug("[Alert][{0}] Enabling Kerberos authentication via GSSAPI using ccache at {1}."
+                     .format(self.get_name(), ccache_file_path))
+        ticket_manager.kinit(ccache_file_path, kerberos_principal, kerberos_keytab)
       else:
-        kerberos_env = None
+        ccache_file_path = None
 
       # substitute 0.0.0.0 in url with actual fqdn
       url = url.replace('0.0.0.0', self.host_name)
       start_time = time.time()
-      curl = subprocess.Popen(['curl', '--negotiate', '-u', ':', '-sL', '-w',
-        '%{http_code}', url, '--connect-timeout', CURL_CONNECTION_TIMEOUT,
-        '-o', '/dev/null'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=kerberos_env)
-
-      out, err = curl.communicate()
-
-      if err != '':
-        raise Exception(err)
-
-      response_code = int(out)
+      response_code, _ = make_web_request(url, ccache_file_path, CONNECTION_TIMEOUT)
       time_millis = time.time() - start_time
     except Exception, exc:
       if logger.isEnabledFor(logging.DEBUG):
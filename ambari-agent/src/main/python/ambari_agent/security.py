@@ -28,9 +28,13 @@ import pprint
 import traceback
 import hostname
 import platform
+import zlib
 
 logger = logging.getLogger()
 
+# zlib window bits for data in gzip format
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
 GEN_AGENT_KEY = 'openssl req -new -newkey rsa:1024 -nodes -keyout "%(keysdir)s'+os.sep+'%(hostname)s.key" '\
 	'-subj /OU=%(hostname)s/ -out "%(keysdir)s'+os.sep+'%(hostname)s.csr"'
 
@@ -103,11 +107,22 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
 class CachedHTTPSConnection:
   """ Caches a ssl socket and uses a single https connection to the server. """
 
+  # Errors of a kept-alive connection that has been closed by the server
+  STALE_CONNECTION_ERRORS = (httplib.BadStatusLine, httplib.CannotSendRequest,
+                             httplib.ResponseNotReady, socket.error)
+
   def __init__(self, config):
     self.connected = False
     self.config = config
     self.server = config.get('server', 'hostname')
     self.port = config.get('server', 'secured_url_port')
+    self.compression = config.has_option('agent', 'http_compression') and \
+      str(config.get('agent', 'http_compression')).lower() == 'true'
+    # Request bodies are compressed only after the server has sent a
+    # compressed response over the current connection
+    self.compress_requests = False
+    # Whether the current connection has been used for some request already
+    self.reused = False
     self.connect()
 
   def connect(self):
@@ -115,6 +130,8 @@ class CachedHTTPSConnection:
       self.httpsconn = VerifiedHTTPSConnection(self.server, self.port, self.config)
       self.httpsconn.connect()
       self.connected = True
+      self.compress_requests = False
+      self.reused = False
     # possible exceptions are caught and processed in Controller
 
   def forceClear(self):
@@ -124,10 +141,18 @@ class CachedHTTPSConnection:
   def request(self, req):
     self.connect()
     try:
-      self.httpsconn.request(req.get_method(), req.get_full_url(),
-                             req.get_data(), req.headers)
-      response = self.httpsconn.getresponse()
-      readResponse = response.read()
+      try:
+        readResponse = self.send(req)
+      except self.STALE_CONNECTION_ERRORS:
+        if not self.reused:
+          raise
+        # The server has closed the kept-alive connection, send once again
+        # over a new one
+        logger.debug("Connection to the server has been closed, reconnecting")
+        self.httpsconn.close()
+        self.connected = False
+        self.connect()
+        readResponse = self.send(req)
     except Exception as ex:
       # This exception is caught later in Controller
       logger.debug("Error in sending/receving data from the server " +
@@ -137,6 +162,34 @@ class CachedHTTPSConnection:
       raise IOError("Error occured during connecting to the server: " + str(ex))
     return readResponse
 
+  def send(self, req):
+    """
+    Sends the request over the current connection, returns the response body
+    """
+    data = req.get_data()
+    headers = req.headers
+    if self.compression:
+      headers = dict(headers)
+      headers['Accept-Encoding'] = 'gzip'
+      if self.compress_requests and data:
+        data = gzip_compress(data)
+        headers['Content-Encoding'] = 'gzip'
+    self.httpsconn.request(req.get_method(), req.get_full_url(), data, headers)
+    response = self.httpsconn.getresponse()
+    readResponse = response.read()
+    # the request has reached the server, so a failure of the next one over
+    # this connection means it has been closed
+    self.reused = True
+    if self.compression and response.getheader('Content-Encoding') == 'gzip':
+      readResponse = zlib.decompress(readResponse, GZIP_WBITS)
+      self.compress_requests = True
+    return readResponse
+
+
+def gzip_compress(data):
+  compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, GZIP_WBITS)
+  return compressor.compress(data) + compressor.flush()
+
 
 class CertificateManager():
   def __init__(self, config):
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+"""
+Long-lived interpreter that executes status commands of service scripts on
+behalf of the agent (see StatusWorkerPool). resource_management and other
+shared modules stay imported between requests. Modules of the service
+scripts are kept as long as the FileCache hash of the service directory
+stays the same, except for the params modules which read the command json
+at import time.
+
+Requests and responses are json documents, one per line:
+  stdin:  {"script": ..., "params": [...], "out": ..., "err": ...,
+           "override_output_files": ..., "cache_key": ...}
+  stdout: {"exitcode": ...}
+Output of the script goes to the "out" and "err" files.
+"""
+
+import json
+import logging
+import os
+import runpy
+import sys
+import traceback
+
+
+# modules of the service scripts which read the command json at import time
+PARAMS_MODULES = ('params', 'status_params')
+
+
+class StatusWorker():
+
+  def __init__(self):
+    self.cache_keys = {} # script dir -> FileCache hash of the loaded modules
+
+  def get_modules(self, script_dir):
+    """
+    Returns modules loaded from the script dir, by name
+    """
+    prefix = script_dir + os.sep
+    modules = {}
+    for name, module in sys.modules.items():
+      module_file = getattr(module, '__file__', None)
+      if module_file and os.path.abspath(module_file).startswith(prefix):
+        modules[name] = module
+    return modules
+
+  def purge_modules(self, script_dir):
+    """
+    Removes modules loaded from the script dir, they will be imported again
+    by the next execution
+    """
+    for name in self.get_modules(script_dir):
+      del sys.modules[name]
+
+  def purge_params_modules(self, script_dir):
+    """
+    Removes params modules and the modules which have imported them at
+    module level, so the next execution reads its own command json
+    """
+    modules = self.get_modules(script_dir)
+    # params_linux.py, params_windows.py etc. are imported by params.py
+    prefixes = tuple(name + '_' for name in PARAMS_MODULES)
+    params_modules = set(id(module) for name, module in modules.items()
+                         if name.split('.')[-1] in PARAMS_MODULES
+                         or name.split('.')[-1].startswith(prefixes))
+    for name, module in modules.items():
+      if id(module) in params_modules or \
+          any(id(value) in params_modules for value in vars(module).values()):
+        del sys.modules[name]
+
+  def execute(self, request):
+    script = os.path.abspath(request['script'])
+    script_dir = os.path.dirname(script)
+    params = request['params']
+
+    cache_key = request['cache_key']
+    if self.cache_keys.get(script_dir) != cache_key:
+      self.purge_modules(script_dir)
+      self.cache_keys[script_dir] = cache_key
+    else:
+      # command json is different for every request
+      self.purge_params_modules(script_dir)
+
+    mode = 'w' if request['override_output_files'] else 'a'
+    with open(request['out'], mode) as out:
+      with open(request['err'], mode) as err:
+        return self.run_script(script, script_dir, params, out, err)
+
+  def run_script(self, script, script_dir, params, out, err):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_stdout = os.dup(1)
+    saved_stderr = os.dup(2)
+    # Child processes of the script should write to the same files
+    os.dup2(out.fileno(), 1)
+    os.dup2(err.fileno(), 2)
+
+    # Script.execute() adds new handlers on every invocation
+    logging.getLogger('resource_management').handlers = []
+    sys.argv = [script] + params
+    sys.path.insert(0, script_dir)
+    exitcode = 0
+    try:
+      runpy.run_path(script, run_name='__main__')
+    except SystemExit, e:
+      if e.code is None:
+        exitcode = 0
+      elif isinstance(e.code, int):
+        exitcode = e.code
+      else:
+        sys.stderr.write(str(e.code) + '\n')
+        exitcode = 1
+    except:
+      traceback.print_exc()
+      exitcode = 1
+    finally:
+      sys.path.remove(script_dir)
+      sys.stdout.flush()
+      sys.stderr.flush()
+      os.dup2(saved_stdout, 1)
+      os.dup2(saved_stderr, 2)
+      os.close(saved_stdout)
+      os.close(saved_stderr)
+    return exitcode
+
+
+def main():
+  # stdin and stdout are used for communication with the agent
+  requests = os.fdopen(os.dup(0), 'r')
+  responses = os.fdopen(os.dup(1), 'w')
+  devnull = os.open(os.devnull, os.O_RDWR)
+  os.dup2(devnull, 0)
+  os.dup2(devnull, 1)
+  os.close(devnull)
+
+  try:
+    # Warm up the interpreter, these modules are used by all service scripts
+    from resource_management.libraries.script.script import Script
+  except ImportError:
+    pass
+
+  worker = StatusWorker()
+  while True:
+    line = requests.readline()
+    if not line:
+      break # agent has gone
+    try:
+      exitcode = worker.execute(json.loads(line))
+    except Exception:
+      traceback.print_exc()
+      exitcode = 1
+    responses.write(json.dumps({'exitcode': exitcode}) + '\n')
+    responses.flush()
+
+
+if __name__ == '__main__':
+  main()
@@ -25,9 +25,11 @@ from ambari_agent.ActionQueue import ActionQueue
 from ambari_agent.AmbariConfig import AmbariConfig
 import os, errno, time, pprint, tempfile, threading, json
 import StringIO
+import io
 import sys
 from threading import Thread
 import copy
+import collections
 
 from mock.mock import patch, MagicMock, call
 from ambari_agent.StackVersionsFileHandler import StackVersionsFileHandler
@@ -292,6 +294,9 @@ class TestActionQueue(TestCase):
         file_mock = MagicMock()
         file_mock.read.return_value = "Read from " + str(file)
         return file_mock
+      elif mode == 'rb':
+        # command output is tailed
+        return io.BytesIO("Read from " + str(file))
       else:
         return self.original_open(file, mode)
     open_mock.side_effect = open_side_effect
@@ -594,6 +599,69 @@ class TestActionQueue(TestCase):
     self.assertEqual(len(report['componentStatus']), 1)
     self.assertTrue(report['componentStatus'][0].has_key('alerts'))
 
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch.object(ActionQueue, "status_update_callback")
+  @patch.object(StackVersionsFileHandler, "read_stack_version")
+  @patch.object(CustomServiceOrchestrator, "requestComponentStatusBatch")
+  @patch.object(CustomServiceOrchestrator, "requestComponentSecurityState")
+  @patch.object(CustomServiceOrchestrator, "requestComponentStatus")
+  @patch.object(ActualConfigHandler, "read_actual_component")
+  def test_batch_status_commands(self, read_actual_component_mock,
+                                 requestComponentStatus_mock,
+                                 requestComponentSecurityState_mock,
+                                 requestComponentStatusBatch_mock,
+                                 read_stack_version_mock,
+                                 status_update_callback_mock):
+    dummy_controller = MagicMock()
+    config = AmbariConfig().getConfig()
+    config.set('agent', 'tolerate_download_failures', 'true')
+    config.set('agent', 'batch_status_commands', 'true')
+    actionQueue = ActionQueue(config, dummy_controller)
+
+    def status_command(component, script, service="HDFS"):
+      return {
+        "serviceName" : service,
+        "commandType" : "STATUS_COMMAND",
+        "clusterName" : "c1",
+        "componentName" : component,
+        "configurations" : {},
+        "commandParams" : {
+          "service_package_folder" : "common-services/{0}/package".format(service),
+          "script" : script,
+        }
+      }
+    datanode = status_command("DATANODE", "scripts/datanode.py")
+    namenode = status_command("NAMENODE", "scripts/namenode.py")
+    zookeeper = status_command("ZOOKEEPER_SERVER", "scripts/zookeeper_server.py", "ZOOKEEPER")
+
+    requestComponentStatusBatch_mock.return_value = [
+      ({'exitcode' : 0, 'structuredOut' : {}}, 'UNSECURED'),
+      ({'exitcode' : 1, 'structuredOut' : {}}, 'UNKNOWN'),
+    ]
+    requestComponentStatus_mock.return_value = {'exitcode' : 0}
+    requestComponentSecurityState_mock.return_value = 'UNSECURED'
+
+    actionQueue.put_status([datanode, zookeeper, namenode])
+    actionQueue.processStatusCommandQueueSafeEmpty()
+
+    # HDFS components are checked by a single batch, ZOOKEEPER on its own
+    requestComponentStatusBatch_mock.assert_called_once_with([datanode, namenode])
+    requestComponentStatus_mock.assert_called_once_with(zookeeper)
+    statuses = dict((status['componentName'], status)
+                    for status in actionQueue.result()['componentStatus'])
+    self.assertEqual(LiveStatus.LIVE_STATUS, statuses['DATANODE']['status'])
+    self.assertEqual('UNSECURED', statuses['DATANODE']['securityState'])
+    self.assertEqual(LiveStatus.DEAD_STATUS, statuses['NAMENODE']['status'])
+    self.assertEqual(LiveStatus.LIVE_STATUS, statuses['ZOOKEEPER_SERVER']['status'])
+
+    # Falls back to one by one checks if the batch has failed
+    requestComponentStatus_mock.reset_mock()
+    requestComponentStatusBatch_mock.return_value = None
+    actionQueue.put_status([datanode, namenode])
+    actionQueue.processStatusCommandQueueSafeEmpty()
+    self.assertEqual(2, requestComponentStatus_mock.call_count)
+    self.assertEqual(2, len(actionQueue.result()['componentStatus']))
+
   @patch.object(ActionQueue, "process_command")
   @patch.object(Queue, "get")
   @patch.object(CustomServiceOrchestrator, "__init__")
@@ -632,6 +700,66 @@ class TestActionQueue(TestCase):
     actionQueue.join()
     self.assertEqual(actionQueue.stopped(), True, 'Action queue is not stopped.')
 
+  @patch.object(CustomServiceOrchestrator, "__init__")
+  def test_parallel_execution_lanes(self, CustomServiceOrchestrator_mock):
+    CustomServiceOrchestrator_mock.return_value = None
+    dummy_controller = MagicMock()
+    config = AmbariConfig().getConfig()
+    config.set('agent', 'parallel_execution', '2')
+    actionQueue = ActionQueue(config, dummy_controller)
+    self.assertTrue(actionQueue.is_parallel_execution_enabled())
+
+    executed = []
+    lock = threading.Lock()
+    datanode_started = threading.Event()
+    hbase_done = threading.Event()
+    release_datanode = threading.Event()
+
+    def process_command(command):
+      with lock:
+        executed.append(command['taskId'])
+      if command['role'] == u'DATANODE' and command['taskId'] == 3:
+        datanode_started.set()
+        release_datanode.wait(5)
+      if command['role'] == u'HBASE':
+        hbase_done.set()
+    actionQueue.process_command = process_command
+
+    datanode_start_command = copy.deepcopy(self.datanode_install_command)
+    datanode_start_command['taskId'] = 30
+    actionQueue.dispatch_to_lane(self.datanode_install_command)
+    datanode_started.wait(5)
+    actionQueue.dispatch_to_lane(datanode_start_command)
+    actionQueue.dispatch_to_lane(self.hbase_install_command)
+
+    # HBASE lane is not blocked by the long running DATANODE command
+    self.assertTrue(hbase_done.wait(5))
+    self.assertEqual([3, 7], executed)
+
+    release_datanode.set()
+    for i in range(50):
+      with actionQueue.lanes_lock:
+        if not actionQueue.lanes:
+          break
+      time.sleep(0.1)
+    # Commands for the same component keep their order
+    self.assertEqual([3, 7, 30], executed)
+    self.assertEqual({}, actionQueue.lanes)
+
+  @patch.object(CustomServiceOrchestrator, "__init__")
+  def test_cancel_removes_command_from_lane(self, CustomServiceOrchestrator_mock):
+    CustomServiceOrchestrator_mock.return_value = None
+    dummy_controller = MagicMock()
+    config = AmbariConfig().getConfig()
+    config.set('agent', 'parallel_execution', '2')
+    actionQueue = ActionQueue(config, dummy_controller)
+    actionQueue.customServiceOrchestrator = MagicMock()
+    actionQueue.lanes[u'DATANODE'] = collections.deque([self.datanode_install_command])
+
+    actionQueue.cancel([{'target_task_id' : 3, 'reason' : 'reason'}])
+    self.assertEqual(0, len(actionQueue.lanes[u'DATANODE']))
+    actionQueue.customServiceOrchestrator.cancel_command.assert_called_with(3, 'reason')
+
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
   @patch.object(StackVersionsFileHandler, "read_stack_version")
   @patch.object(CustomServiceOrchestrator, "runCommand")
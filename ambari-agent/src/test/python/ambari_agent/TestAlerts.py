@@ -18,16 +18,23 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import imp
 import os
+import shutil
 import socket
 import sys
+import tempfile
+import threading
+import time
 import urllib2
 
 from ambari_agent.AlertSchedulerHandler import AlertSchedulerHandler
 from ambari_agent.alerts.collector import AlertCollector
 from ambari_agent.alerts.base_alert import BaseAlert
-from ambari_agent.alerts.metric_alert import MetricAlert
+from ambari_agent.alerts.metric_alert import MetricAlert, JmxMetric, JmxResponseCache
+from ambari_agent.alerts import port_alert
 from ambari_agent.alerts.port_alert import PortAlert
+from ambari_agent.alerts.port_prober import PortProber
 from ambari_agent.alerts.script_alert import ScriptAlert
 from ambari_agent.alerts.web_alert import WebAlert
 from ambari_agent.apscheduler.scheduler import Scheduler
@@ -68,8 +75,10 @@ class TestAlerts(TestCase):
     self.assertTrue(aps_start_mock.called)
 
   @patch('time.time')
-  @patch.object(socket.socket,"connect")
-  def test_port_alert(self, socket_connect_mock, time_mock):
+  @patch.object(port_alert, "get_port_prober")
+  @patch.object(socket.socket,"connect_ex", new = MagicMock(return_value=0))
+  def test_port_alert(self, get_port_prober_mock, time_mock):
+    get_port_prober_mock.return_value = self.__get_port_prober()
     definition_json = self._get_port_alert_definition()
 
     configuration = { 'hdfs-site' : { 'my-key': 'value1' } }
@@ -82,8 +91,8 @@ class TestAlerts(TestCase):
     # - 900ms and then a time.time() for the date from base_alert
     # - 2000ms and then a time.time() for the date from base_alert
     # - socket.timeout to simulate a timeout and then a time.time() for the date from base_alert
-    time_mock.side_effect = [0,900,336283000000,
-      0,2000,336283100000,
+    time_mock.side_effect = [0,0.9,336283000000,
+      0,2.0,336283100000,
       socket.timeout,336283200000]
 
     alert = PortAlert(definition_json, definition_json['source'])
@@ -110,8 +119,10 @@ class TestAlerts(TestCase):
     self.assertEquals('CRITICAL', alerts[0]['state'])
 
 
-  @patch.object(socket.socket,"connect")
-  def test_port_alert_complex_uri(self, socket_connect_mock):
+  @patch.object(port_alert, "get_port_prober")
+  @patch.object(socket.socket,"connect_ex", new = MagicMock(return_value=0))
+  def test_port_alert_complex_uri(self, get_port_prober_mock):
+    get_port_prober_mock.return_value = self.__get_port_prober()
     definition_json = self._get_port_alert_definition()
 
     configuration = {'hdfs-site' :
@@ -210,6 +221,66 @@ class TestAlerts(TestCase):
     self.assertEquals('bar is rendered-bar, baz is rendered-baz', alerts[0]['text'])
 
 
+  @patch("imp.load_source", wraps=imp.load_source)
+  def test_script_alert_module_cache(self, load_source_mock):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      package_dir = os.path.join(tmp_dir, 'common-services', 'FOO', '1.0', 'package')
+      os.makedirs(os.path.join(package_dir, 'alerts'))
+      script = os.path.join(package_dir, 'alerts', 'alert_foo.py')
+      shutil.copy(os.path.join('ambari_agent', 'dummy_files', 'test_script.py'), script)
+      with open(os.path.join(package_dir, '.hash'), 'w') as fp:
+        fp.write('hash1')
+
+      definition_json = self._get_script_alert_definition()
+      definition_json['source']['path'] = os.path.join('FOO', '1.0', 'package', 'alerts', 'alert_foo.py')
+      definition_json['source']['common_services_directory'] = os.path.join(tmp_dir, 'common-services')
+
+      collector = AlertCollector()
+      cluster_configuration = self.__get_cluster_configuration()
+      self.__update_cluster_configuration(cluster_configuration,
+        {'foo-site' : { 'bar': 'rendered-bar', 'baz' : 'rendered-baz' }})
+
+      alerts = []
+      for i in range(2):
+        alert = ScriptAlert(definition_json, definition_json['source'], MagicMock())
+        alert.set_helpers(collector, cluster_configuration)
+        alert.set_cluster("c1", "c6401.ambari.apache.org")
+        alerts.append(alert)
+
+      alerts[0].collect()
+      alerts[0].collect()
+      environment = alerts[0].environment
+      alerts[1].collect()
+      self.assertEquals(1, load_source_mock.call_count)
+      self.assertTrue(environment is alerts[0].environment)
+      self.assertEquals('bar is rendered-bar, baz is rendered-baz', collector.alerts()[0]['text'])
+
+      # the reused environment does not keep the state of the previous run
+      environment.resource_list.append(MagicMock())
+      environment.config.params = {'stale': True}
+      alerts[0].collect()
+      self.assertTrue(environment is alerts[0].environment)
+      self.assertEquals([], environment.resource_list)
+      self.assertFalse('stale' in environment.config.params)
+
+      # FileCache has downloaded a new version of the package
+      with open(os.path.join(package_dir, '.hash'), 'w') as fp:
+        fp.write('hash2')
+      alerts[0].collect()
+      self.assertEquals(2, load_source_mock.call_count)
+
+      # script has been modified
+      mtime = os.stat(script).st_mtime
+      os.utime(script, (mtime + 10, mtime + 10))
+      alerts[1].collect()
+      alerts[0].collect()
+      self.assertEquals(3, load_source_mock.call_count)
+    finally:
+      shutil.rmtree(tmp_dir)
+      ScriptAlert.loaded_modules.clear()
+
+
   @patch.object(MetricAlert, "_load_jmx")
   def test_metric_alert(self, ma_load_jmx_mock):
     definition_json = self._get_metric_alert_definition()
@@ -269,6 +340,63 @@ class TestAlerts(TestCase):
     self.assertEquals('(Unit Tests) OK: 1 25 None', alerts[0]['text'])
 
 
+  def test_jmx_metric_value_expressions(self):
+    metric = JmxMetric({'property_list': ['a/b', 'a/c'], 'value': '{0} + {1} * 2'})
+    self.assertEquals(5, metric.calculate([1, 2]))
+    # expressions are compiled once
+    other_metric = JmxMetric({'property_list': ['d/e', 'd/f'], 'value': '{0} + {1} * 2'})
+    self.assertTrue(metric.value_function is other_metric.value_function)
+
+    # invalid expression fails only the alert that uses it
+    invalid_metric = JmxMetric({'property_list': ['a/b'], 'value': '{0} +'})
+    self.assertRaises(Exception, invalid_metric.calculate, [1])
+
+    self.assertEquals(None, JmxMetric({'property_list': ['a/b']}).calculate([1]))
+
+
+  @patch("time.time")
+  def test_jmx_response_cache(self, time_mock):
+    time_mock.return_value = 100
+    cache = JmxResponseCache(10)
+    started = threading.Event()
+    release = threading.Event()
+    def loader(url):
+      started.set()
+      release.wait(10)
+      return {"url": url}
+    loader_mock = MagicMock(side_effect=loader)
+
+    # concurrent requests for the same url are made once
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("http://nn/jmx", loader_mock)))
+               for i in range(3)]
+    threads[0].start()
+    self.assertTrue(started.wait(10))
+    for thread in threads[1:]:
+      thread.start()
+    release.set()
+    for thread in threads:
+      thread.join()
+    self.assertEquals([{"url": "http://nn/jmx"}] * 3, results)
+    self.assertEquals(1, loader_mock.call_count)
+
+    cache.get("http://rm/jmx", loader_mock)
+    self.assertEquals(2, loader_mock.call_count)
+
+    # responses expire
+    time_mock.return_value = 111
+    cache.get("http://nn/jmx", loader_mock)
+    self.assertEquals(3, loader_mock.call_count)
+    self.assertEquals(["http://nn/jmx"], cache.entries.keys())
+
+    # failed requests are not cached
+    time_mock.return_value = 200
+    loader_mock.side_effect = Exception("Connection refused")
+    self.assertRaises(Exception, cache.get, "http://nn/jmx", loader_mock)
+    loader_mock.side_effect = loader
+    self.assertEquals({"url": "http://nn/jmx"}, cache.get("http://nn/jmx", loader_mock))
+
+
   @patch.object(MetricAlert, "_load_jmx")
   def test_alert_uri_structure(self, ma_load_jmx_mock):
     definition_json = self._get_metric_alert_definition()
@@ -452,6 +580,152 @@ class TestAlerts(TestCase):
     self.assertEquals(1, ash.get_job_count())
 
 
+  def test_reschedule_changed_definitions(self):
+    test_file_path = os.path.join('ambari_agent', 'dummy_files')
+    cluster_configuration = self.__get_cluster_configuration()
+    ash = AlertSchedulerHandler(test_file_path, test_file_path, test_file_path,
+      test_file_path, cluster_configuration, None)
+    ash.start()
+
+    commands = [{"clusterName": "c1", "hostName": "c6401.ambari.apache.org",
+                 "alertDefinitions": [self._get_port_alert_definition()]}]
+    # definitions from the heartbeat replace the ones from the file
+    ash.reschedule(commands)
+    self.assertEquals(1, ash.get_job_count())
+
+    # hashes of removed definitions are dropped
+    ash.reschedule([{"clusterName": "c1", "hostName": "c6401.ambari.apache.org",
+                     "alertDefinitions": []}])
+    self.assertEquals(0, ash.get_job_count())
+    self.assertEquals({}, ash._AlertSchedulerHandler__definition_hashes)
+    ash.reschedule(commands)
+    self.assertEquals(1, len(ash._AlertSchedulerHandler__definition_hashes))
+
+    # unchanged definitions are left alone
+    with patch.object(AlertSchedulerHandler, "schedule_definition") as schedule_mock:
+      ash.reschedule(commands)
+      self.assertFalse(schedule_mock.called)
+      self.assertEquals(1, ash.get_job_count())
+
+      # definition with the same UUID has changed
+      commands[0]["alertDefinitions"][0]["interval"] = 2
+      ash.reschedule(commands)
+      self.assertEquals(1, schedule_mock.call_count)
+      self.assertEquals(0, ash.get_job_count())
+    ash.stop()
+
+
+  @patch.object(Scheduler, "add_interval_job")
+  def test_alert_runs_do_not_overlap(self, add_interval_job_mock):
+    test_file_path = os.path.join('ambari_agent', 'dummy_files')
+    cluster_configuration = self.__get_cluster_configuration()
+    ash = AlertSchedulerHandler(test_file_path, test_file_path, test_file_path,
+      test_file_path, cluster_configuration, None)
+
+    definition_json = self._get_metric_alert_definition()
+    alert = MetricAlert(definition_json, definition_json['source'])
+    started = threading.Event()
+    release = threading.Event()
+    def collect():
+      started.set()
+      release.wait(10)
+    alert.collect = MagicMock(side_effect=collect)
+    ash.schedule_definition(alert)
+    job_function = add_interval_job_mock.call_args[0][0]
+
+    job_function()
+    self.assertTrue(started.wait(10))
+    # the previous run is still in progress
+    job_function()
+    release.set()
+    for i in range(100):
+      if alert.collect.call_count == 1 and not ash.is_alert_in_flight(alert):
+        break
+      time.sleep(0.1)
+    self.assertEquals(1, alert.collect.call_count)
+    self.assertFalse(ash.is_alert_in_flight(alert))
+
+    # worker threads of the alert types do not outlive the scheduler
+    thread_pools = ash._AlertSchedulerHandler__thread_pools.values()
+    self.assertEquals(1, len(thread_pools))
+    ash.stop()
+    self.assertEquals({}, ash._AlertSchedulerHandler__thread_pools)
+    self.assertTrue(thread_pools[0]._shutdown)
+
+
+  @patch.dict(AlertSchedulerHandler.ALERT_THREADS, {AlertSchedulerHandler.TYPE_METRIC: 1})
+  @patch.object(Scheduler, "add_interval_job")
+  def test_alerts_queued_before_stop_run_after_start(self, add_interval_job_mock):
+    test_file_path = os.path.join('ambari_agent', 'dummy_files')
+    cluster_configuration = self.__get_cluster_configuration()
+    ash = AlertSchedulerHandler(test_file_path, test_file_path, test_file_path,
+      test_file_path, cluster_configuration, None)
+
+    definition_json = self._get_metric_alert_definition()
+    busy_alert = MetricAlert(definition_json, definition_json['source'])
+    started = threading.Event()
+    release = threading.Event()
+    def collect():
+      started.set()
+      release.wait(10)
+    busy_alert.collect = MagicMock(side_effect=collect)
+
+    definition_json = self._get_metric_alert_definition()
+    definition_json['uuid'] = 'a0000000-0000-0000-0000-000000000001'
+    queued_alert = MetricAlert(definition_json, definition_json['source'])
+    queued_alert.collect = MagicMock()
+
+    ash.schedule_definition(busy_alert)
+    ash.schedule_definition(queued_alert)
+    busy_job, queued_job = [call[0][0] for call in add_interval_job_mock.call_args_list]
+
+    # the only worker is busy, so the second alert waits in the queue
+    busy_job()
+    self.assertTrue(started.wait(10))
+    queued_job()
+    self.assertTrue(ash.is_alert_in_flight(queued_alert))
+
+    # the queued job is dropped with the pool
+    ash.stop()
+    release.set()
+    self.assertFalse(ash.is_alert_in_flight(queued_alert))
+
+    ash.start()
+    ash.schedule_definition(queued_alert)
+    add_interval_job_mock.call_args[0][0]()
+    for i in range(100):
+      if queued_alert.collect.call_count == 1:
+        break
+      time.sleep(0.1)
+    self.assertEquals(1, queued_alert.collect.call_count)
+    ash.stop()
+
+
+  @patch.object(Scheduler, "add_interval_job")
+  def test_port_alerts_collected_async(self, add_interval_job_mock):
+    test_file_path = os.path.join('ambari_agent', 'dummy_files')
+    cluster_configuration = self.__get_cluster_configuration()
+    ash = AlertSchedulerHandler(test_file_path, test_file_path, test_file_path,
+      test_file_path, cluster_configuration, None)
+
+    definition_json = self._get_port_alert_definition()
+    alert = PortAlert(definition_json, definition_json['source'])
+    alert.collect_async = MagicMock()
+    ash.schedule_definition(alert)
+    job_function = add_interval_job_mock.call_args[0][0]
+
+    # the check is handed over to the port prober, no thread waits for it
+    job_function()
+    self.assertTrue(ash.is_alert_in_flight(alert))
+    prober, callback = alert.collect_async.call_args[0]
+    self.assertEquals("PortProber", prober.__class__.__name__)
+
+    job_function()
+    self.assertEquals(1, alert.collect_async.call_count)
+    callback()
+    self.assertFalse(ash.is_alert_in_flight(alert))
+
+
   def test_alert_collector_purge(self):
     definition_json = self._get_port_alert_definition()
 
@@ -936,6 +1210,15 @@ class TestAlerts(TestCase):
       return cluster_configuration
 
 
+  def __get_port_prober(self):
+    """
+    Port prober with DNS resolution disabled
+    """
+    prober = PortProber()
+    prober.resolve = MagicMock(return_value="192.168.64.101")
+    return prober
+
+
   def __update_cluster_configuration(self, cluster_configuration, configuration):
     """
     Updates the configuration cache, using as mock file as the disk based
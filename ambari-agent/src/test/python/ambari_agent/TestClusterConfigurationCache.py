@@ -67,6 +67,38 @@ class TestClusterConfigurationCache(TestCase):
 
     json_dump_mock.assert_called_with({'c1': {'foo-site': {'baz': 'rendered-baz', 'bar': 'rendered-bar'}}}, ANY, indent=2)
 
+  @patch("json.dump")
+  def test_cluster_configuration_update_from_heartbeat(self, json_dump_mock):
+    cluster_configuration = self.__get_cluster_configuration()
+
+    command = {'clusterName': 'c1',
+               'configurations': {'foo-site': {'bar': 'rendered-bar'}},
+               'configurationTags': {'foo-site': {'tag': 'version1'}}}
+    heartbeat = {'executionCommands': [command, dict(command)]}
+
+    with patch("__builtin__.open") as open_mock:
+      open_mock.side_effect = self.open_side_effect
+      cluster_configuration.update_configurations_from_heartbeat(heartbeat)
+      # the same configurations are written once
+      self.assertEqual(json_dump_mock.call_count, 1)
+      cluster_configuration.update_configurations_from_heartbeat(heartbeat)
+      self.assertEqual(json_dump_mock.call_count, 1)
+
+      # an override changes the values but not the tags
+      command['configurations'] = {'foo-site': {'bar': 'override-bar'}}
+      cluster_configuration.update_configurations_from_heartbeat(
+        {'executionCommands': [command]})
+      self.assertEqual(json_dump_mock.call_count, 2)
+      self.assertEqual('override-bar', cluster_configuration.get_configuration_value('c1', 'foo-site/bar'))
+
+      command['configurations'] = {'foo-site': {'bar': 'new-bar'}}
+      command['configurationTags'] = {'foo-site': {'tag': 'version2'}}
+      cluster_configuration.update_configurations_from_heartbeat(
+        {'executionCommands': [command]})
+      self.assertEqual(json_dump_mock.call_count, 3)
+
+    self.assertEqual('new-bar', cluster_configuration.get_configuration_value('c1', 'foo-site/bar'))
+
   def __get_cluster_configuration(self):
     """
     Gets an instance of the cluster cache where the file read and write
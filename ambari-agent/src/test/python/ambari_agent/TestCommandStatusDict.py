@@ -18,6 +18,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 import tempfile
+import shutil
 from unittest import TestCase
 from ambari_agent.CommandStatusDict import CommandStatusDict
 import os
@@ -185,3 +186,49 @@ class TestCommandStatusDict(TestCase):
                     'actionId': '1-1', 'taskId': 5, 'exitCode': 777}]
       }
     self.assertEquals(report, expected)
+
+  @patch("ambari_agent.CommandStatusDict.Grep.tail_file")
+  def test_in_progress_report_cache(self, tail_file_mock):
+    tail_file_mock.return_value = 'output'
+    tmp_dir = tempfile.mkdtemp()
+    commandStatuses = CommandStatusDict(callback_action = MagicMock())
+    command = {
+      'commandType': 'EXECUTION_COMMAND',
+      'commandId': '1-1',
+      'clusterName': u'cc',
+      'role': u'DATANODE',
+      'roleCommand': u'INSTALL',
+      'serviceName': u'HDFS',
+      'taskId': 5
+    }
+    report = {
+      'status': 'IN_PROGRESS',
+      'taskId': 5,
+      'tmpout': os.path.join(tmp_dir, 'output-5.txt'),
+      'tmperr': os.path.join(tmp_dir, 'errors-5.txt'),
+      'structuredOut': os.path.join(tmp_dir, 'structured-out-5.json'),
+    }
+    with open(report['tmpout'], 'w') as fp:
+      fp.write('output')
+    with open(report['tmperr'], 'w') as fp:
+      fp.write('error')
+    commandStatuses.put_command_status(command, report)
+
+    first = commandStatuses.generate_report()['reports'][0]
+    self.assertEquals(first['stderr'], 'error')
+    self.assertEquals(first['structuredOut'], '{}')
+    # files have not changed
+    self.assertEquals(commandStatuses.generate_report()['reports'][0], first)
+    self.assertEquals(tail_file_mock.call_count, 1)
+
+    with open(report['tmperr'], 'a') as fp:
+      fp.write(' and more')
+    self.assertEquals(commandStatuses.generate_report()['reports'][0]['stderr'],
+                      'error and more')
+    self.assertEquals(tail_file_mock.call_count, 2)
+
+    commandStatuses.put_command_status(command, {'status': 'COMPLETED', 'taskId': 5})
+    commandStatuses.generate_report()
+    self.assertEquals(commandStatuses.in_progress_reports, {})
+    shutil.rmtree(tmp_dir)
+
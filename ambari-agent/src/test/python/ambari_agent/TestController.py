@@ -347,6 +347,21 @@ class TestController(unittest.TestCase):
     self.assertTrue(os_exit_mock.call_args[0][0] == AGENT_AUTO_RESTART_EXIT_CODE)
 
 
+  @patch.object(Controller, "randint")
+  def test_get_reconnect_delay(self, randint_mock):
+    randint_mock.side_effect = lambda low, high: high
+    self.controller.range = 30
+    delays = [self.controller.get_reconnect_delay() for i in range(5)]
+    self.assertEqual(delays, [7, 14, 28, 30, 30])
+
+    self.controller.failed_attempts = 0
+    self.assertEqual(self.controller.get_reconnect_delay(), 7)
+
+    self.controller.range = 2
+    self.controller.failed_attempts = 0
+    self.assertEqual(self.controller.get_reconnect_delay(), 1)
+
+
   @patch("urllib2.Request")
   @patch.object(Controller, "security")
   def test_sendRequest(self, security_mock, requestMock):
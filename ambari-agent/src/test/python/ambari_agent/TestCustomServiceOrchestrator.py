@@ -27,6 +27,8 @@ from ambari_commons import shell
 from unittest import TestCase
 import threading
 import tempfile
+import json
+import shutil
 import time
 from threading import Thread
 
@@ -143,6 +145,51 @@ class TestCustomServiceOrchestrator(TestCase):
     self.assertTrue(unlink_mock.called)
 
 
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch("hostname.public_hostname", new = MagicMock(return_value = "test.hst"))
+  @patch.object(FileCache, "__init__")
+  def test_dump_command_configurations(self, FileCache_mock):
+    FileCache_mock.return_value = None
+    command = {
+      'commandType': 'EXECUTION_COMMAND',
+      'taskId': 3,
+      'configurations': {'global': {'a': 'b'}},
+      'configurationTags': {'global': {'tag': 'v1'}},
+      'hostLevelParams': {}
+    }
+    config = AmbariConfig().getConfig()
+    tempdir = tempfile.mkdtemp()
+    config.set('agent', 'prefix', tempdir)
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file) as f:
+      dumped = json.load(f)
+    self.assertFalse('configurations' in dumped)
+    configurations_file = dumped['configurationsFile']
+    with open(configurations_file) as f:
+      self.assertEqual(json.load(f), {'global': {'a': 'b'}})
+    # in-memory command is left untouched
+    self.assertEqual(command['configurations'], {'global': {'a': 'b'}})
+
+    # another command with the same configurations
+    command['taskId'] = 4
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file) as f:
+      self.assertEqual(json.load(f)['configurationsFile'], configurations_file)
+    self.assertEqual(3, len(os.listdir(tempdir)))
+
+    # same tags and sizes, but the values differ (e.g. an override)
+    command['configurations'] = {'global': {'a': 'c'}}
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file) as f:
+      other_configurations_file = json.load(f)['configurationsFile']
+    self.assertNotEqual(other_configurations_file, configurations_file)
+    with open(other_configurations_file) as f:
+      self.assertEqual(json.load(f), {'global': {'a': 'c'}})
+    shutil.rmtree(tempdir)
+
+
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
   @patch("os.path.exists")
   @patch.object(FileCache, "__init__")
@@ -491,6 +538,48 @@ class TestCustomServiceOrchestrator(TestCase):
     status = orchestrator.requestComponentStatus(status_command)
     self.assertEqual(runCommand_mock.return_value, status)
 
+  @patch.object(CustomServiceOrchestrator, "runCommand")
+  @patch.object(FileCache, "__init__")
+  def test_requestComponentStatusBatch(self, FileCache_mock, runCommand_mock):
+    FileCache_mock.return_value = None
+    status_commands = [{
+      "serviceName" : 'HDFS',
+      "commandType" : "STATUS_COMMAND",
+      "clusterName" : "",
+      "componentName" : component,
+      'configurations':{'hdfs-site' : {}}
+    } for component in ["DATANODE", "NAMENODE"]]
+    dummy_controller = MagicMock()
+    orchestrator = CustomServiceOrchestrator(self.config, dummy_controller)
+    runCommand_mock.return_value = {
+      "exitcode" : 0,
+      "stdout" : "out",
+      "stderr" : "err",
+      "structuredOut" : {"components" : {
+        "DATANODE" : {"exitcode" : 0, "securityState" : "UNSECURED", "structuredOut" : {}},
+        "NAMENODE" : {"exitcode" : 1, "securityState" : "UNKNOWN", "structuredOut" : {"alerts" : []}},
+      }}
+    }
+
+    results = orchestrator.requestComponentStatusBatch(status_commands)
+    self.assertEqual([
+      ({"exitcode" : 0, "stdout" : "out", "stderr" : "err", "structuredOut" : {}}, "UNSECURED"),
+      ({"exitcode" : 1, "stdout" : "out", "stderr" : "err", "structuredOut" : {"alerts" : []}}, "UNKNOWN"),
+    ], results)
+    batch_command = runCommand_mock.call_args[0][0]
+    self.assertEqual(status_commands, batch_command['statusCommands'])
+    self.assertEqual({}, batch_command['configurations'])
+    self.assertEqual("STATUS_BATCH", runCommand_mock.call_args[0][3])
+
+    # Component is missing in the result
+    del runCommand_mock.return_value["structuredOut"]["components"]["NAMENODE"]
+    self.assertEqual(None, orchestrator.requestComponentStatusBatch(status_commands))
+
+    # Batch has failed
+    runCommand_mock.return_value = {"exitcode" : 1, "stdout" : "", "stderr" : "",
+                                    "structuredOut" : {}}
+    self.assertEqual(None, orchestrator.requestComponentStatusBatch(status_commands))
+
   @patch.object(CustomServiceOrchestrator, "runCommand")
   @patch.object(FileCache, "__init__")
   def test_requestComponentSecurityState(self, FileCache_mock, runCommand_mock):
@@ -30,7 +30,7 @@ from threading import Thread
 
 from FileCache import FileCache, CachingException
 from AmbariConfig import AmbariConfig
-from mock.mock import MagicMock, patch
+from mock.mock import MagicMock, patch, call
 import StringIO
 import sys
 import shutil
@@ -122,8 +122,9 @@ class TestFileCache(TestCase):
   @patch.object(FileCache, "invalidate_directory")
   @patch.object(FileCache, "unpack_archive")
   @patch.object(FileCache, "write_hash_sum")
-  def test_provide_directory(self, write_hash_sum_mock, unpack_archive_mock,
-                             invalidate_directory_mock,
+  @patch.object(FileCache, "replace_directory")
+  def test_provide_directory(self, replace_directory_mock, write_hash_sum_mock,
+                             unpack_archive_mock, invalidate_directory_mock,
                              read_hash_sum_mock, fetch_url_mock,
                              build_download_url_mock):
     build_download_url_mock.return_value = "http://dummy-url/"
@@ -140,8 +141,11 @@ class TestFileCache(TestCase):
     read_hash_sum_mock.return_value = "hash2"
     res = fileCache.provide_directory("cache_path", "subdirectory",
                                       "server_url_prefix")
-    self.assertTrue(invalidate_directory_mock.called)
-    self.assertTrue(write_hash_sum_mock.called)
+    # new content is unpacked aside and then moved in place
+    staging_path = path + FileCache.STAGING_SUFFIX
+    invalidate_directory_mock.assert_called_with(staging_path)
+    write_hash_sum_mock.assert_called_with(staging_path, HASH1)
+    replace_directory_mock.assert_called_with(staging_path, path)
     self.assertEquals(fetch_url_mock.call_count, 2)
     self.assertEquals(pprint.pformat(fileCache.uptodate_paths),
                       pprint.pformat([path]))
@@ -217,6 +221,47 @@ class TestFileCache(TestCase):
     self.assertEquals(res, path)
 
 
+  @patch.object(FileCache, "provide_directory")
+  def test_reset_prefetch(self, provide_directory_mock):
+    fileCache = FileCache(self.config)
+    # nothing is known about the server yet
+    fileCache.reset()
+    self.assertFalse(provide_directory_mock.called)
+
+    fileCache.server_url_prefix = "server_url_prefix"
+    fileCache.known_directories = {
+      os.path.join("cache_path", "dir1"): ("cache_path", "dir1"),
+      os.path.join("cache_path", "dir2"): ("cache_path", "dir2"),
+    }
+    fileCache.uptodate_paths = fileCache.known_directories.keys()
+    fileCache.reset()
+    self.assertEquals(fileCache.uptodate_paths, [])
+    for thread in threading.enumerate():
+      if thread.name.startswith("FileCachePrefetch"):
+        thread.join()
+    self.assertEquals(sorted(provide_directory_mock.call_args_list),
+                      [call("cache_path", "dir1", "server_url_prefix"),
+                       call("cache_path", "dir2", "server_url_prefix")])
+
+
+  def test_replace_directory(self):
+    tmpdir = tempfile.mkdtemp()
+    directory = os.path.join(tmpdir, "package")
+    staging_directory = directory + FileCache.STAGING_SUFFIX
+    os.makedirs(os.path.join(directory, "old"))
+    os.makedirs(os.path.join(staging_directory, "new"))
+    fileCache = FileCache(self.config)
+    fileCache.replace_directory(staging_directory, directory)
+    self.assertEquals(os.listdir(directory), ["new"])
+    self.assertEquals(os.listdir(tmpdir), ["package"])
+    # directory has not existed before
+    os.makedirs(os.path.join(staging_directory, "newer"))
+    shutil.rmtree(directory)
+    fileCache.replace_directory(staging_directory, directory)
+    self.assertEquals(os.listdir(directory), ["newer"])
+    shutil.rmtree(tmpdir)
+
+
   def test_build_download_url(self):
     fileCache = FileCache(self.config)
     url = fileCache.build_download_url('http://localhost:8080/resources/',
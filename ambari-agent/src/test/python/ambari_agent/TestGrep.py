@@ -23,6 +23,7 @@ from ambari_agent.Grep import Grep
 import socket
 import os, sys
 import logging
+import tempfile
 
 class TestGrep(TestCase):
 
@@ -107,4 +108,17 @@ notice: Finished catalog run in 0.23 seconds
 """.replace("\n", os.linesep).strip()
     self.assertEquals(fragment, desired, 'Grep cleanByTemplate function should return string without debug lines.')
 
+  def test_tail_file(self):
+    fd, path = tempfile.mkstemp()
+    try:
+      os.write(fd, self.string_good)
+      os.close(fd)
+      for n in [0, 1, 5, 1000]:
+        self.assertEquals(self.grep.tail_file(path, n),
+                          self.grep.tail(self.string_good, n))
+        # reading with small blocks starts in the middle of lines
+        self.assertEquals(self.grep.tail_file(path, n, block_size=7),
+                          self.grep.tail(self.string_good, n))
+    finally:
+      os.remove(path)
 
@@ -241,5 +241,40 @@ class TestHeartbeat(TestCase):
     self.assertFalse(args[2])
 
 
+  @patch.object(Hardware, "osdisks")
+  @patch.object(HostInfoLinux, 'register')
+  def test_heartbeat_host_env_changes_only(self, register_mock, osdisks_mock):
+    config = AmbariConfig.AmbariConfig().getConfig()
+    config.set('agent', 'prefix', 'tmp')
+    config.set('agent', 'cache_dir', "/var/lib/ambari-agent/cache")
+    config.set('agent', 'tolerate_download_failures', "true")
+    actionQueue = ActionQueue(config, MagicMock())
+    host_env = {'umask': '18', 'hostHealth': {'agentTimeStampAtReporting': 1}}
+    def register(node_info, components_mapped, commands_in_progress):
+      host_env['hostHealth']['agentTimeStampAtReporting'] += 1
+      node_info.update(host_env)
+    register_mock.side_effect = register
+    osdisks_mock.return_value = [{'mountpoint': '/'}]
+
+    heartbeat = Heartbeat(actionQueue)
+    hb = heartbeat.build(0, 1)
+    self.assertEquals(hb['agentEnv']['umask'], '18')
+    self.assertEquals(hb['mounts'], [{'mountpoint': '/'}])
+
+    # only the reporting time has changed
+    hb = heartbeat.build(1, 1)
+    self.assertFalse('agentEnv' in hb)
+    self.assertFalse('mounts' in hb)
+
+    host_env['umask'] = '22'
+    hb = heartbeat.build(2, 1)
+    self.assertEquals(hb['agentEnv']['umask'], '22')
+    self.assertFalse('mounts' in hb)
+
+    # full snapshot after registration
+    hb = heartbeat.build(0, 1)
+    self.assertTrue('agentEnv' in hb)
+    self.assertTrue('mounts' in hb)
+
 if __name__ == "__main__":
   unittest.main(verbosity=2)
@@ -31,6 +31,8 @@ from mock.mock import create_autospec
 import ambari_commons
 from ambari_commons import OSCheck
 import os
+import shutil
+import tempfile
 from only_for_platform import not_for_platform, get_platform, PLATFORM_WINDOWS, PLATFORM_LINUX
 
 if get_platform() != PLATFORM_WINDOWS:
@@ -185,6 +187,44 @@ class TestHostInfo(TestCase):
                                               "koji-override-0/$releasever"])
       self.assertFalse(package['repoName'] in ["AMBARI.dev-1.x"])
 
+  @not_for_platform(PLATFORM_WINDOWS)
+  @patch.object(OSCheck, 'get_os_family')
+  @patch('resource_management.libraries.functions.packages_analyzer.subprocessWithTimeout')
+  def test_analyze_apt_output(self, subprocessWithTimeout_mock, get_os_family_mock):
+    get_os_family_mock.return_value = OSConst.UBUNTU_FAMILY
+    lists_dir = tempfile.mkdtemp()
+    hdp_list = os.path.join(lists_dir, "public-repo_HDP_dists_Ambari_main_binary-amd64_Packages")
+    ubuntu_list = os.path.join(lists_dir, "archive.ubuntu.com_ubuntu_dists_precise_main_binary-amd64_Packages")
+    with open(hdp_list, "w") as fp:
+      fp.write("Package: hadoop\nPriority: extra\nVersion: 2.2.0.0-2041\n\n"
+               "Package: zookeeper\nVersion: 3.4.6.2.2.0.0-2041\n\n")
+    with open(ubuntu_list, "w") as fp:
+      fp.write("Package: curl\nVersion: 7.22.0-3ubuntu4\n")
+    subprocessWithTimeout_mock.return_value = {
+      'out': "hadoop\t2.2.0.0-2041\tinstall ok installed\n"
+             "curl\t7.22.0-3ubuntu4\tinstall ok installed\n"
+             "local-package\t1.0\tinstall ok installed\n"
+             "removed-package\t1.0\tdeinstall ok config-files\n",
+      'err': "",
+      'retCode': 0
+    }
+
+    try:
+      with patch.object(packages_analyzer, "APT_LISTS_DIR", new = lists_dir):
+        installedPackages = []
+        packages_analyzer.allInstalledPackages(installedPackages)
+        availablePackages = []
+        packages_analyzer.allAvailablePackages(availablePackages)
+    finally:
+      shutil.rmtree(lists_dir)
+
+    self.assertEqual([["hadoop", "2.2.0.0-2041", hdp_list],
+                      ["curl", "7.22.0-3ubuntu4", ubuntu_list],
+                      ["local-package", "1.0", packages_analyzer.DPKG_STATUS_FILE]], installedPackages)
+    # packages of ubuntu repositories are not reported
+    self.assertEqual([["hadoop", "2.2.0.0-2041", hdp_list],
+                      ["zookeeper", "3.4.6.2.2.0.0-2041", hdp_list]], availablePackages)
+
   @not_for_platform(PLATFORM_WINDOWS)
   @patch.object(OSCheck, 'get_os_family')
   @patch('resource_management.libraries.functions.packages_analyzer.subprocessWithTimeout')
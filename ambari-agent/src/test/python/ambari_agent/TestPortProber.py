@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import socket
+import threading
+import time
+from unittest import TestCase
+
+from ambari_agent.alerts.port_prober import PortProber
+from mock.mock import patch
+from only_for_platform import only_for_platform, PLATFORM_LINUX
+
+
+class TestPortProber(TestCase):
+
+  def setUp(self):
+    self.prober = PortProber()
+    self.sockets = []
+
+  def tearDown(self):
+    for sock in self.sockets:
+      sock.close()
+
+  def listen(self, backlog=5):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(backlog)
+    self.sockets.append(listener)
+    return listener.getsockname()[1]
+
+  def probe_all(self, checks):
+    """
+    Starts all the checks at once and waits for their results
+    """
+    results = {}
+    finished = threading.Event()
+    def callback(name):
+      def put_result(seconds, error):
+        results[name] = (seconds, error)
+        if len(results) == len(checks):
+          finished.set()
+      return put_result
+
+    for name, (host, port, timeout) in checks.items():
+      self.prober.probe(host, port, timeout, callback(name))
+    self.assertTrue(finished.wait(10))
+    return results
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_probe(self):
+    open_port = self.listen()
+    closed_port = self.listen()
+    self.sockets.pop().close()
+
+    # the listener doesn't accept connections any more once its backlog is full
+    full_port = self.listen(backlog=0)
+    filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.sockets.append(filler)
+    filler.connect(('127.0.0.1', full_port))
+
+    start_time = time.time()
+    results = self.probe_all({
+      'open': ('localhost', open_port, 5),
+      'closed': ('127.0.0.1', closed_port, 5),
+      'full_1': ('127.0.0.1', full_port, 0.5),
+      'full_2': ('127.0.0.1', full_port, 0.5),
+      'unknown': ('unknown.host.invalid', 80, 5),
+    })
+    # the checks which timed out were waiting at the same time
+    self.assertTrue(time.time() - start_time < 1)
+
+    seconds, error = results['open']
+    self.assertEquals(None, error)
+    self.assertTrue(0 <= seconds < 1)
+    self.assertTrue(isinstance(results['closed'][1], socket.error))
+    for name in ['full_1', 'full_2']:
+      self.assertEquals((None, 'timed out'), (results[name][0], str(results[name][1])))
+    self.assertTrue(isinstance(results['unknown'][1], socket.gaierror))
+
+    self.assertEquals(0, len(self.prober.pending))
+
+  @patch("socket.gethostbyname")
+  @patch("time.time")
+  def test_dns_cache(self, time_mock, gethostbyname_mock):
+    gethostbyname_mock.return_value = "192.168.64.101"
+    time_mock.return_value = 1000
+    self.assertEquals("192.168.64.101", self.prober.resolve("c6401.ambari.apache.org"))
+    time_mock.return_value = 1030
+    self.assertEquals("192.168.64.101", self.prober.resolve("c6401.ambari.apache.org"))
+    self.assertEquals(1, gethostbyname_mock.call_count)
+
+    time_mock.return_value = 1061
+    self.prober.resolve("c6401.ambari.apache.org")
+    self.assertEquals(2, gethostbyname_mock.call_count)
@@ -107,6 +107,26 @@ class TestPythonExecutor(TestCase):
     self.assertEquals(subproc_mock.returncode, 0, "Subprocess should not be terminated before timeout")
     self.assertTrue(callback_method.called)
 
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch("ambari_commons.shell.kill_process_with_children")
+  def test_watchdog_of_other_executor(self, kill_process_with_children_mock):
+    """
+    Commands executed in parallel by different executors do not wake up each other's watchdog
+    """
+    slow_executor = PythonExecutor("/tmp", AmbariConfig().getConfig())
+    fast_executor = PythonExecutor("/tmp", AmbariConfig().getConfig())
+    slow_process = MagicMock(returncode = None)
+    thread = Thread(target = slow_executor.python_watchdog_func, args = (slow_process, 5))
+    thread.start()
+    # fast command has finished
+    fast_executor.event.set()
+    time.sleep(0.1)
+    slow_process.returncode = 0
+    slow_executor.event.set()
+    thread.join()
+    self.assertFalse(kill_process_with_children_mock.called)
+    self.assertFalse(slow_executor.python_process_has_been_killed)
+
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
   def test_execution_results(self):
     subproc_mock = self.Subprocess_mockup()
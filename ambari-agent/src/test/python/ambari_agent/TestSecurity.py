@@ -28,6 +28,8 @@ import ConfigParser
 import ssl
 import os
 import tempfile
+import httplib
+import zlib
 
 from ambari_commons import OSCheck
 from only_for_platform import only_for_platform, get_platform, PLATFORM_LINUX, PLATFORM_WINDOWS
@@ -142,6 +144,7 @@ class TestSecurity(unittest.TestCase):
   def test_request(self, connect_mock):
     httpsconn_mock = MagicMock(create = True)
     self.cachedHTTPSConnection.httpsconn = httpsconn_mock
+    self.cachedHTTPSConnection.compression = False
 
     dummy_request = MagicMock(create = True)
     dummy_request.get_method.return_value = "dummy_get_method"
@@ -175,6 +178,49 @@ class TestSecurity(unittest.TestCase):
       pass
 
 
+  @patch.object(security, "VerifiedHTTPSConnection")
+  def test_request_compression(self, vhc_mock):
+    httpsconn_mock = vhc_mock.return_value
+    self.cachedHTTPSConnection.connected = False
+    dummy_request = MagicMock(create = True)
+    dummy_request.get_method.return_value = "POST"
+    dummy_request.get_full_url.return_value = "dummy_full_url"
+    dummy_request.get_data.return_value = "request data"
+    dummy_request.headers = {'Content-Type': 'application/json'}
+
+    # Server does not support compression
+    response_mock = httpsconn_mock.getresponse.return_value
+    response_mock.read.return_value = "plain response"
+    response_mock.getheader.return_value = None
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), "plain response")
+    self.assertEqual(httpsconn_mock.request.call_args[0][2], "request data")
+    self.assertEqual(httpsconn_mock.request.call_args[0][3],
+                     {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+
+    # Compressed response enables compression of requests
+    response_mock.read.return_value = security.gzip_compress("compressed response")
+    response_mock.getheader.return_value = 'gzip'
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), "compressed response")
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), "compressed response")
+    data = httpsconn_mock.request.call_args[0][2]
+    self.assertEqual(zlib.decompress(data, security.GZIP_WBITS), "request data")
+    self.assertEqual(httpsconn_mock.request.call_args[0][3]['Content-Encoding'], 'gzip')
+
+    # Kept-alive connection has been closed by the server
+    httpsconn_mock.getresponse.side_effect = [httplib.BadStatusLine(''), response_mock]
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), "compressed response")
+    self.assertEqual(vhc_mock.call_count, 2)
+    # negotiation starts over for the new connection
+    self.assertEqual(httpsconn_mock.request.call_args[0][2], "request data")
+
+    # Request over a new connection is not sent twice
+    self.cachedHTTPSConnection.connected = False
+    httpsconn_mock.request.reset_mock()
+    httpsconn_mock.getresponse.side_effect = [httplib.BadStatusLine(''), response_mock]
+    self.assertRaises(IOError, self.cachedHTTPSConnection.request, dummy_request)
+    self.assertEqual(httpsconn_mock.request.call_count, 1)
+
+
   ### CertificateManager ###
 
 
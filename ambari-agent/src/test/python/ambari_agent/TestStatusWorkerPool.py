@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from StatusWorkerPool import StatusWorkerPool
+from AmbariConfig import AmbariConfig
+from mock.mock import MagicMock
+from only_for_platform import only_for_platform, PLATFORM_LINUX
+
+DUMMY_SCRIPT = """
+import sys
+import dummy_helper
+dummy_helper.calls += 1
+print "calls: %d" % dummy_helper.calls
+sys.stderr.write("command: " + sys.argv[1])
+sys.exit(int(sys.argv[1] == "FAIL"))
+"""
+
+PARAMS_SCRIPT = """
+import dummy_helper
+import params
+print "calls: %d, config: %s" % (dummy_helper.calls, params.config)
+"""
+
+class TestStatusWorkerPool(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.script = os.path.join(self.tmp_dir, "dummy_script.py")
+    with open(self.script, "w") as fp:
+      fp.write(DUMMY_SCRIPT)
+    with open(os.path.join(self.tmp_dir, "dummy_helper.py"), "w") as fp:
+      fp.write("calls = 0\n")
+    self.json_path = os.path.join(self.tmp_dir, "status_command.json")
+    with open(self.json_path, "w") as fp:
+      fp.write("{}")
+    self.out = os.path.join(self.tmp_dir, "out.txt")
+    self.err = os.path.join(self.tmp_dir, "err.txt")
+    self.strout = os.path.join(self.tmp_dir, "structured-out.json")
+    self.file_cache = MagicMock()
+    self.file_cache.read_hash_sum.return_value = "hash1"
+    self.pool = StatusWorkerPool(self.tmp_dir, AmbariConfig().getConfig(),
+                                 self.file_cache, 1)
+
+  def tearDown(self):
+    self.pool.stop()
+    shutil.rmtree(self.tmp_dir)
+
+  def run_status(self, command_name="STATUS", script=None):
+    return self.pool.run_file(script or self.script,
+                              [command_name, self.json_path, self.tmp_dir],
+                              self.tmp_dir, self.out, self.err, 10, self.strout,
+                              "INFO", MagicMock(), "status")
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_run_file(self):
+    result = self.run_status()
+    self.assertEqual(0, result['exitcode'])
+    self.assertEqual("calls: 1", result['stdout'])
+    self.assertEqual("command: STATUS", result['stderr'])
+    self.assertEqual({}, result['structuredOut'])
+
+    result = self.run_status("FAIL")
+    self.assertEqual(1, result['exitcode'])
+    # service modules are reused by the same worker
+    self.assertEqual("calls: 2", result['stdout'])
+    self.assertEqual(1, len(self.pool.workers))
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_modules_invalidation(self):
+    self.assertEqual("calls: 1", self.run_status()['stdout'])
+    self.assertEqual("calls: 2", self.run_status()['stdout'])
+
+    # service directory has been updated
+    self.file_cache.read_hash_sum.return_value = "hash2"
+    self.assertEqual("calls: 1", self.run_status()['stdout'])
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_params_invalidation(self):
+    script = os.path.join(self.tmp_dir, "params_script.py")
+    with open(script, "w") as fp:
+      fp.write(PARAMS_SCRIPT)
+    with open(os.path.join(self.tmp_dir, "params.py"), "w") as fp:
+      fp.write("import json, sys\nconfig = json.load(open(sys.argv[2]))\n")
+    self.assertEqual("calls: 0, config: {}", self.run_status(script=script)['stdout'])
+
+    # command json has changed, only params are imported again
+    with open(self.json_path, "w") as fp:
+      fp.write('{"hostname": "c6401"}')
+    self.assertEqual("calls: 1", self.run_status()['stdout'])
+    self.assertEqual("calls: 1, config: {u'hostname': u'c6401'}", self.run_status(script=script)['stdout'])
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_worker_eviction(self):
+    self.run_status()
+    worker = self.pool.workers.values()[0]
+
+    other_dir = os.path.join(self.tmp_dir, "other")
+    os.mkdir(other_dir)
+    other_script = os.path.join(other_dir, "dummy_script.py")
+    shutil.copy(self.script, other_script)
+    shutil.copy(os.path.join(self.tmp_dir, "dummy_helper.py"), other_dir)
+
+    result = self.run_status(script=other_script)
+    self.assertEqual(0, result['exitcode'])
+    self.assertEqual([other_dir], self.pool.workers.keys())
+    self.assertFalse(worker.is_alive())
@@ -0,0 +1,84 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from unittest import TestCase
+
+from resource_management.core.exceptions import Fail
+from resource_management.libraries.script.config_dictionary import ConfigDictionary, UnknownConfiguration
+
+
+class TestConfigDictionary(TestCase):
+
+  def setUp(self):
+    self.command = {
+      "configurations": {
+        "hdfs-site": {
+          "dfs.replication": "3",
+          "dfs.heartbeat.recheck.ratio": "0.5",
+          "dfs.webhdfs.enabled": "true",
+          "dfs.namenode.name.dir": "/hadoop/hdfs/namenode",
+        }
+      },
+      "hostLevelParams": {"jdk_location": "http://c6401:8080/resources/"},
+    }
+
+  def test_types(self):
+    config = ConfigDictionary(self.command)
+    hdfs_site = config['configurations']['hdfs-site']
+    self.assertTrue(isinstance(hdfs_site, ConfigDictionary))
+    self.assertEqual(3, hdfs_site['dfs.replication'])
+    self.assertEqual(0.5, hdfs_site['dfs.heartbeat.recheck.ratio'])
+    self.assertEqual(True, hdfs_site['dfs.webhdfs.enabled'])
+    self.assertEqual("/hadoop/hdfs/namenode", hdfs_site['dfs.namenode.name.dir'])
+    self.assertTrue(isinstance(hdfs_site['dfs.missing'], UnknownConfiguration))
+
+    # get() and iteration return stored values
+    self.assertEqual("3", hdfs_site.get('dfs.replication'))
+    self.assertEqual(None, hdfs_site.get('dfs.missing'))
+    self.assertTrue(isinstance(dict(config.items())['hostLevelParams'], ConfigDictionary))
+
+    # sub-dictionaries are converted once and the command is not modified
+    self.assertTrue(hdfs_site is config['configurations']['hdfs-site'])
+    self.assertTrue(config.get('configurations') is config['configurations'])
+    self.assertFalse(isinstance(self.command['configurations'], ConfigDictionary))
+
+  def test_immutable(self):
+    config = ConfigDictionary(self.command)
+    try:
+      config['configurations']['hdfs-site']['dfs.replication'] = "1"
+      self.fail("Should throw exception")
+    except Fail:
+      pass
+
+    config = ConfigDictionary(self.command, allow_overwrite=True)
+    hdfs_site = config['configurations']['hdfs-site']
+    self.assertEqual(3, hdfs_site['dfs.replication'])
+    hdfs_site['dfs.replication'] = "1"
+    self.assertEqual(1, hdfs_site['dfs.replication'])
+
+  def test_access_counts(self):
+    config = ConfigDictionary(self.command)
+    for i in range(3):
+      config['configurations']['hdfs-site']['dfs.replication']
+    config['configurations']['hdfs-site'].get('dfs.webhdfs.enabled')
+    config['configurations']['hdfs-site']['dfs.missing']
+
+    self.assertEqual({"configurations": 5,
+                      "configurations/hdfs-site": 5,
+                      "configurations/hdfs-site/dfs.replication": 3,
+                      "configurations/hdfs-site/dfs.webhdfs.enabled": 1}, config.get_access_counts())
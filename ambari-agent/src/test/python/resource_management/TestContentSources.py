@@ -26,15 +26,22 @@ from resource_management.core.source import DownloadSource
 from resource_management.core.source import Template
 from resource_management.core.source import InlineTemplate
 from resource_management.core import sudo
+from resource_management.core import source
 
 from ambari_jinja2 import UndefinedError, TemplateNotFound
 import urllib2
 import os
+import shutil
+import tempfile
 
 
 @patch.object(System, "os_family", new = 'redhat')
 class TestContentSources(TestCase):
 
+  def setUp(self):
+    # templates are cached for the whole process
+    source.template_environments.clear()
+
   @patch.object(os.path, "isfile")
   @patch.object(os.path, "join")
   def test_static_file_absolute_path(self, join_mock, is_file_mock):
@@ -251,3 +258,29 @@ class TestContentSources(TestCase):
       template = InlineTemplate("{{test_arg1}} template content {{os.path.join(path[0],path[1])}}", [os], test_arg1 = "test", path = ["/one","two"])
       content = template.get_content()
     self.assertEqual(u'test template content /one/two\n', content)
+
+  def test_template_cache(self):
+    """
+    Testing that templates are compiled once and the bytecode is reused by other processes
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      os.mkdir(os.path.join(tmp_dir, "templates"))
+      with open(os.path.join(tmp_dir, "templates", "test.j2"), "w") as fp:
+        fp.write("{{test_arg1}} template content")
+
+      with Environment(tmp_dir, tmp_dir=tmp_dir) as env:
+        template = Template("test.j2", [], test_arg1 = "test")
+        self.assertEqual(u'test template content\n', template.get_content())
+        self.assertTrue(template.template is Template("test.j2").template)
+      self.assertEqual(1, len(os.listdir(os.path.join(tmp_dir, source.BYTECODE_CACHE_DIR))))
+
+      # another process
+      source.template_environments.clear()
+      with patch.object(source.JinjaEnvironment, "compile") as compile_mock:
+        with Environment(tmp_dir, tmp_dir=tmp_dir) as env:
+          content = Template("test.j2", [], test_arg1 = "other").get_content()
+      self.assertEqual(u'other template content\n', content)
+      self.assertFalse(compile_mock.called)
+    finally:
+      shutil.rmtree(tmp_dir)
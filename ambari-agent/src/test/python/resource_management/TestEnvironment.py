@@ -0,0 +1,124 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+import threading
+import time
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from resource_management.core import Environment, Fail
+from resource_management.core.logger import Logger
+from resource_management.core.resources.system import File, Directory, Execute
+from resource_management.core.system import System
+
+
+@patch.object(System, "os_family", new = 'redhat')
+class TestEnvironment(TestCase):
+
+  def setUp(self):
+    self.lock = threading.Lock()
+    self.events = [] # (event, resource name)
+
+  def run_action(self, resource, action):
+    with self.lock:
+      self.events.append(('start', resource.name))
+    Logger.info("Executing " + resource.name)
+    time.sleep(0.1)
+    with self.lock:
+      self.events.append(('end', resource.name))
+    if resource.name == "/fail":
+      raise Fail("Failed")
+
+  def get_started(self):
+    return [name for event, name in self.events if event == 'start']
+
+  def overlap(self, name1, name2):
+    start1, end1 = self.events.index(('start', name1)), self.events.index(('end', name1))
+    start2, end2 = self.events.index(('start', name2)), self.events.index(('end', name2))
+    return start1 < end2 and start2 < end1
+
+  @patch.object(Logger, "logger")
+  def test_parallel(self, logger_mock):
+    logger_mock.level = logging.INFO
+    with Environment('/') as env:
+      with patch.object(env, "run_action", new = self.run_action):
+        with env.parallel():
+          File("/etc/a/file1")
+          File("/etc/a/file2")
+          Directory("/etc/a")
+          File("/etc/a/file3")
+          File("/etc/b/file4")
+          Execute("command")
+          File("/etc/a/file5")
+          # resources are not executed inside of the block
+          self.assertEqual([], self.events)
+
+    # independent files are created concurrently
+    self.assertTrue(self.overlap("/etc/a/file1", "/etc/a/file2"))
+    self.assertTrue(self.overlap("/etc/a/file1", "/etc/b/file4"))
+    # resources wait for their parent directories and the other way round
+    for name in ["/etc/a/file1", "/etc/a/file2", "/etc/a/file3"]:
+      self.assertFalse(self.overlap("/etc/a", name))
+    self.assertTrue(self.events.index(('end', "/etc/a")) < self.events.index(('start', "/etc/a/file3")))
+    # other resources run alone, in the order of declaration
+    for name in ["/etc/a/file1", "/etc/a/file2", "/etc/a", "/etc/a/file3", "/etc/b/file4", "/etc/a/file5"]:
+      self.assertFalse(self.overlap("command", name))
+    self.assertEqual("command", self.get_started()[-2])
+    self.assertEqual("/etc/a/file5", self.get_started()[-1])
+
+    # messages are logged in the order of the resources
+    messages = [args[0][0] for args in logger_mock.info.call_args_list if args[0][0].startswith("Executing")]
+    self.assertEqual(["Executing /etc/a/file1", "Executing /etc/a/file2", "Executing /etc/a",
+                      "Executing /etc/a/file3", "Executing /etc/b/file4", "Executing command",
+                      "Executing /etc/a/file5"], messages)
+
+  @patch.object(Logger, "logger")
+  def test_parallel_failure(self, logger_mock):
+    logger_mock.level = logging.INFO
+    with Environment('/') as env:
+      with patch.object(env, "run_action", new = self.run_action):
+        try:
+          with env.parallel():
+            File("/fail")
+            File("/etc/file1")
+            Execute("command")
+          self.fail("Should throw exception")
+        except Fail:
+          pass
+
+    # resources after the failed one are not started
+    self.assertEqual(["/fail", "/etc/file1"], self.get_started())
+
+  def test_parallel_test_mode(self):
+    with Environment('/', test_mode=True) as env:
+      File("/etc/file1")
+      with env.parallel():
+        File("/etc/file2")
+      self.assertEqual(["/etc/file1", "/etc/file2"], [resource.name for resource in env.resource_list])
+
+  def test_resource_paths(self):
+    with Environment('/', test_mode=True) as env:
+      self.assertEqual(["/etc/file"], Environment._get_resource_paths(File("/etc/../etc/file")))
+      self.assertEqual(None, Environment._get_resource_paths(File("/etc/file", not_if="test -f /etc/file")))
+      self.assertEqual(None, Environment._get_resource_paths(Execute("command")))
+
+    self.assertTrue(Environment._paths_related(["/etc/a"], ["/etc/a/b"]))
+    self.assertTrue(Environment._paths_related(["/etc/a"], ["/x", "/etc/a"]))
+    self.assertFalse(Environment._paths_related(["/etc/a"], ["/etc/ab"]))
+    self.assertFalse(Environment._paths_related(["/etc/a/b"], ["/etc/a/c"]))
@@ -23,6 +23,7 @@ from resource_management.core.system import System
 from resource_management.core.resources.system import Execute
 from resource_management.core.environment import Environment
 from resource_management.core import sudo
+from resource_management.core import shell
 
 import subprocess
 import logging
@@ -235,12 +236,18 @@ class TestExecuteResource(TestCase):
       Execute(('arg1', 'arg2', "`ls /root`"),
       )
 
-    self.assertEqual(popen_mock.call_args_list[0][0][0][4], expected_command0)
-    self.assertEqual(popen_mock.call_args_list[1][0][0][4], expected_command1)
-    self.assertEqual(popen_mock.call_args_list[2][0][0][4], expected_command2)
-    self.assertEqual(popen_mock.call_args_list[3][0][0][4], expected_command3)
-    self.assertEqual(popen_mock.call_args_list[4][0][0][4], expected_command4)
-    self.assertEqual(popen_mock.call_args_list[5][0][0][4], expected_command5)
+    # arguments lists are executed without a shell
+    self.assertEqual(popen_mock.call_args_list[0][0][0], ['arg1', 'arg2', 'quoted arg'])
+    self.assertEqual(popen_mock.call_args_list[3][0][0], ['arg1', 'arg2', "echo `ls /root`"])
+    self.assertEqual(popen_mock.call_args_list[4][0][0], ['arg1', 'arg2', "$ROOT"])
+
+    # and quoted when a shell is required
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', 'quoted arg')), expected_command0)
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', 'command "arg"')), expected_command1)
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', "command 'arg'")), expected_command2)
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', "echo `ls /root`")), expected_command3)
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', "$ROOT")), expected_command4)
+    self.assertEqual(shell.string_cmd_from_args_list(('arg1', 'arg2', "`ls /root`")), expected_command5)
 
   @patch.object(subprocess, "Popen")
   def test_attribute_command_one_line(self, popen_mock):
@@ -0,0 +1,77 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from unittest import TestCase
+from mock.mock import patch
+
+from resource_management.core.environment import Environment
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from resource_management.libraries.functions.format import format, parsed_formats
+
+
+class TestFormat(TestCase):
+
+  def setUp(self):
+    self.sensitive_strings = Logger.sensitive_strings
+    Logger.sensitive_strings = {}
+    Logger.sensitive_pattern = (0, None)
+
+  def tearDown(self):
+    Logger.sensitive_strings = self.sensitive_strings
+    Logger.sensitive_pattern = (0, None)
+
+  def test_format(self):
+    user = "hdfs"
+    password = "secret pass"
+    with Environment('/') as env:
+      env.set_params({'conf_dir': "/etc/hadoop/conf"})
+      self.assertEqual("hdfs /etc/hadoop/conf 005", format("{user} {conf_dir} {port:03d}", port=5))
+      self.assertEqual("hdfs:'secret pass'", format("{user}:{password!p}"))
+      self.assertEqual("secret pass", format("{password!h}"))
+      # parsed format string is reused
+      self.assertTrue("{user}:{password!p}" in parsed_formats)
+
+      self.assertEqual({"hdfs:'secret pass'": "hdfs:[PROTECTED]",
+                        "secret pass": "[PROTECTED]"}, Logger.sensitive_strings)
+
+  def test_variable_conflict(self):
+    conf_dir = "/etc/hbase/conf"
+    with Environment('/') as env:
+      env.set_params({'conf_dir': "/etc/hadoop/conf"})
+      try:
+        format("{conf_dir}")
+        self.fail("Should throw exception")
+      except Fail, err:
+        self.assertTrue("'conf_dir' already exists" in str(err))
+
+  def test_filter_text(self):
+    Logger.add_sensitive_string("-p secret", "-p [PROTECTED]")
+    Logger.add_sensitive_string("-p secret -u admin", "-p [PROTECTED] -u admin")
+    self.assertEqual("mysql -p [PROTECTED] -u admin; echo -p [PROTECTED]",
+                     Logger.filter_text("mysql -p secret -u admin; echo -p secret"))
+
+    # strings added to the dictionary directly are matched too
+    Logger.sensitive_strings["token"] = "[PROTECTED]"
+    self.assertEqual("curl -H [PROTECTED]", Logger.filter_text("curl -H token"))
+
+    # known strings do not rebuild the pattern
+    pattern = Logger.sensitive_pattern
+    Logger.add_sensitive_string("token", "[PROTECTED]")
+    Logger.filter_text("curl -H token")
+    self.assertTrue(pattern is Logger.sensitive_pattern)
@@ -24,9 +24,17 @@ from resource_management.core.system import System
 from resource_management.core.resources import Package
 
 from resource_management.core import shell
+from resource_management.core.providers.package import PackageProvider, PackagesInventory
 from resource_management.core.providers.package.apt import replace_underscores
 
+LIST_DEBS_CALL = call(['dpkg-query', '--show', '--showformat=${Package}\t${Status}\n'])
+LIST_RPMS_CALL = call(['rpm', '-qa', '--qf', '%{NAME}\t%{VERSION}\t%{RELEASE}\t%{ARCH}\n'])
+INSTALLED_RPMS = "some_package\t3.5.0\t1\tx86_64\nother_package\t1.0\t2\tnoarch\n"
+
 class TestPackageResource(TestCase):
+  def setUp(self):
+    PackageProvider.invalidate_installed_packages()
+
   @patch.object(shell, "call")
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'ubuntu')
@@ -35,7 +43,7 @@ class TestPackageResource(TestCase):
     with Environment('/') as env:
       Package("some_package",
       )
-    call_mock.assert_has_calls([call("dpkg --get-selections | grep -v deinstall | awk '{print $1}' | grep '^some-package$'"),
+    call_mock.assert_has_calls([LIST_DEBS_CALL,
                                 call(['/usr/bin/apt-get', '-q', '-o', 'Dpkg::Options::=--force-confdef', '--allow-unauthenticated', '--assume-yes', 'install', 'some-package'], logoutput=False, sudo=True, env={'DEBIAN_FRONTEND': 'noninteractive'}),
                                 call(['/usr/bin/apt-get', 'update', '-qq'], logoutput=False, sudo=True)])
     
@@ -46,11 +54,11 @@ class TestPackageResource(TestCase):
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'ubuntu')
   def test_action_install_ubuntu(self, shell_mock, call_mock):
-    call_mock.side_effect = [(1, None), (0, None)]
+    call_mock.side_effect = [(0, "other-package\tinstall ok installed\n"), (0, None)]
     with Environment('/') as env:
       Package("some_package",
       )
-    call_mock.assert_has_calls([call("dpkg --get-selections | grep -v deinstall | awk '{print $1}' | grep '^some-package$'"),
+    call_mock.assert_has_calls([LIST_DEBS_CALL,
                                 call(['/usr/bin/apt-get', '-q', '-o', 'Dpkg::Options::=--force-confdef', '--allow-unauthenticated', '--assume-yes', 'install', 'some-package'], logoutput=False, sudo=True, env={'DEBIAN_FRONTEND': 'noninteractive'})])
     
     self.assertEqual(shell_mock.call_count, 0, "shell.checked_call shouldn't be called")
@@ -59,18 +67,14 @@ class TestPackageResource(TestCase):
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'ubuntu')
   def test_action_install_regex_ubuntu(self, shell_mock, call_mock):
-    call_mock.side_effect = [(0, None),
+    call_mock.side_effect = [(0, "some-package1\tinstall ok installed\nsome-package2\tdeinstall ok config-files\n"),
                              (0, "some-package1\nsome-package2"),
-                             (0, "Some text.\nStatus: install ok installed\nSome text"),
-                             (0, "Some text.\nStatus: not installed\nSome text"),
                              (0, None)]
     with Environment('/') as env:
       Package("some_package.*",
       )
-    call_mock.assert_has_calls([call("dpkg --get-selections | grep -v deinstall | awk '{print $1}' | grep '^some-package.*$'"),
+    call_mock.assert_has_calls([LIST_DEBS_CALL,
                                 call("apt-cache --names-only search '^some-package.*$' | awk '{print $1}'"),
-                                call("dpkg --status 'some-package1'"),
-                                call("dpkg --status 'some-package2'"),
                                 call(['/usr/bin/apt-get', '-q', '-o', 'Dpkg::Options::=--force-confdef', '--allow-unauthenticated', '--assume-yes', 'install', 'some-package.*'], logoutput=False, sudo=True, env={'DEBIAN_FRONTEND': 'noninteractive'})])
     self.assertEqual(shell_mock.call_count, 0, "shell.checked_call shouldn't be called")
 
@@ -78,19 +82,16 @@ class TestPackageResource(TestCase):
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'ubuntu')
   def test_action_install_regex_installed_ubuntu(self, shell_mock, call_mock):
-    call_mock.side_effect = [(0, None),
+    # held packages are installed too
+    call_mock.side_effect = [(0, "some-package1\tinstall ok installed\nsome-package2\thold ok installed\n"),
                              (0, "some-package1\nsome-package2"),
-                             (0, "Some text.\nStatus: install ok installed\nSome text"),
-                             (0, "Some text.\nStatus: install ok installed\nSome text"),
                              (0, None)]
     with Environment('/') as env:
       Package("some_package.*",
               )
-    call_mock.assert_has_calls([call("dpkg --get-selections | grep -v deinstall | awk '{print $1}' | grep '^some-package.*$'"),
-                                call("apt-cache --names-only search '^some-package.*$' | awk '{print $1}'"),
-                                call("dpkg --status 'some-package1'"),
-                                call("dpkg --status 'some-package2'")])
-    self.assertEqual(call_mock.call_count, 4, "Package should not be installed")
+    call_mock.assert_has_calls([LIST_DEBS_CALL,
+                                call("apt-cache --names-only search '^some-package.*$' | awk '{print $1}'")])
+    self.assertEqual(call_mock.call_count, 2, "Package should not be installed")
     self.assertEqual(shell_mock.call_count, 0, "shell.checked_call shouldn't be called")
 
   @patch.object(shell, "call")
@@ -101,18 +102,18 @@ class TestPackageResource(TestCase):
     with Environment('/') as env:
       Package("some_package",
       )
-    call_mock.assert_called_with("installed_pkgs=`rpm -qa 'some_package'` ; [ ! -z \"$installed_pkgs\" ]")
+    call_mock.assert_has_calls([LIST_RPMS_CALL])
     shell_mock.assert_called_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'install', 'some_package'], logoutput=False, sudo=True)
 
   @patch.object(shell, "call")
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'redhat')
   def test_action_install_pattern_rhel(self, shell_mock, call_mock):
-    call_mock.side_effect=[(0, None), (1, "Some text")]
+    call_mock.side_effect=[(0, INSTALLED_RPMS), (1, "Some text")]
     with Environment('/') as env:
       Package("some_package*",
       )
-    call_mock.assert_has_calls([call("installed_pkgs=`rpm -qa 'some_package*'` ; [ ! -z \"$installed_pkgs\" ]"),
+    call_mock.assert_has_calls([LIST_RPMS_CALL,
                                 call("! yum list available 'some_package*'")])
     shell_mock.assert_called_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'install', 'some_package*'], logoutput=False, sudo=True)
 
@@ -120,11 +121,11 @@ class TestPackageResource(TestCase):
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'redhat')
   def test_action_install_pattern_installed_rhel(self, shell_mock, call_mock):
-    call_mock.side_effect=[(0, None), (0, "Some text")]
+    call_mock.side_effect=[(0, INSTALLED_RPMS), (0, "Some text")]
     with Environment('/') as env:
       Package("some_package*",
       )
-    call_mock.assert_has_calls([call("installed_pkgs=`rpm -qa 'some_package*'` ; [ ! -z \"$installed_pkgs\" ]"),
+    call_mock.assert_has_calls([LIST_RPMS_CALL,
                                 call("! yum list available 'some_package*'")])
     self.assertEqual(shell_mock.call_count, 0, "shell.checked_call shouldn't be called")
 
@@ -136,18 +137,18 @@ class TestPackageResource(TestCase):
     with Environment('/') as env:
       Package("some_package",
       )
-    call_mock.assert_called_with("installed_pkgs=`rpm -qa 'some_package'` ; [ ! -z \"$installed_pkgs\" ]")
+    call_mock.assert_has_calls([LIST_RPMS_CALL])
     shell_mock.assert_called_with(['/usr/bin/zypper', '--quiet', 'install', '--auto-agree-with-licenses', '--no-confirm', 'some_package'], logoutput=False, sudo=True)
 
   @patch.object(shell, "call")
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'suse')
   def test_action_install_pattern_suse(self, shell_mock, call_mock):
-    call_mock.side_effect=[(0, None), (0, "Loading repository data...\nReading installed packages...\n\nS | Name\n--+-----\n  | Pack")]
+    call_mock.side_effect=[(0, INSTALLED_RPMS), (0, "Loading repository data...\nReading installed packages...\n\nS | Name\n--+-----\n  | Pack")]
     with Environment('/') as env:
       Package("some_package*",
               )
-    call_mock.assert_has_calls([call("installed_pkgs=`rpm -qa 'some_package*'` ; [ ! -z \"$installed_pkgs\" ]"),
+    call_mock.assert_has_calls([LIST_RPMS_CALL,
                                 call("zypper --non-interactive search --type package --uninstalled-only --match-exact 'some_package*'")])
     shell_mock.assert_called_with(['/usr/bin/zypper', '--quiet', 'install', '--auto-agree-with-licenses', '--no-confirm', 'some_package*'], logoutput=False, sudo=True)
 
@@ -155,15 +156,15 @@ class TestPackageResource(TestCase):
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'suse')
   def test_action_install_pattern_suse(self, shell_mock, call_mock):
-    call_mock.side_effect=[(0, None), (0, "Loading repository data...\nReading installed packages...\nNo packages found.\n")]
+    call_mock.side_effect=[(0, INSTALLED_RPMS), (0, "Loading repository data...\nReading installed packages...\nNo packages found.\n")]
     with Environment('/') as env:
       Package("some_package*",
               )
-    call_mock.assert_has_calls([call("installed_pkgs=`rpm -qa 'some_package*'` ; [ ! -z \"$installed_pkgs\" ]"),
+    call_mock.assert_has_calls([LIST_RPMS_CALL,
                                 call("zypper --non-interactive search --type package --uninstalled-only --match-exact 'some_package*'")])
     self.assertEqual(shell_mock.call_count, 0, "shell.checked_call shouldn't be called")
 
-  @patch.object(shell, "call", new = MagicMock(return_value=(0, None)))
+  @patch.object(shell, "call", new = MagicMock(return_value=(0, INSTALLED_RPMS)))
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'redhat')
   def test_action_install_existent_rhel(self, shell_mock):
@@ -172,7 +173,7 @@ class TestPackageResource(TestCase):
               )
     self.assertFalse(shell_mock.mock_calls)
 
-  @patch.object(shell, "call", new = MagicMock(return_value=(0, None)))
+  @patch.object(shell, "call", new = MagicMock(return_value=(0, INSTALLED_RPMS)))
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'redhat')
   def test_action_install_use_repos_rhel(self, shell_mock):
@@ -184,7 +185,7 @@ class TestPackageResource(TestCase):
                        '--disablerepo=*',
                        '--enablerepo=HDP-UTILS-2.2.0.1-885,HDP-2.2.0.1-885', 'some_package'])
 
-  @patch.object(shell, "call", new = MagicMock(return_value=(0, None)))
+  @patch.object(shell, "call", new = MagicMock(return_value=(0, INSTALLED_RPMS)))
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'suse')
   def test_action_install_existent_suse(self, shell_mock):
@@ -193,7 +194,7 @@ class TestPackageResource(TestCase):
               )
     self.assertFalse(shell_mock.mock_calls)
 
-  @patch.object(shell, "call", new = MagicMock(return_value=(0, None)))
+  @patch.object(shell, "call", new = MagicMock(return_value=(0, INSTALLED_RPMS)))
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'redhat')
   def test_action_remove_rhel(self, shell_mock):
@@ -203,7 +204,7 @@ class TestPackageResource(TestCase):
       )
     shell_mock.assert_called_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'erase', 'some_package'], logoutput=False, sudo=True)
 
-  @patch.object(shell, "call", new = MagicMock(return_value=(0, None)))
+  @patch.object(shell, "call", new = MagicMock(return_value=(0, INSTALLED_RPMS)))
   @patch.object(shell, "checked_call")
   @patch.object(System, "os_family", new = 'suse')
   def test_action_remove_suse(self, shell_mock):
@@ -223,6 +224,45 @@ class TestPackageResource(TestCase):
       )
     shell_mock.assert_called_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'install', 'some_package-3.5.0'], logoutput=False, sudo=True)
 
+  @patch.object(shell, "call")
+  @patch.object(shell, "checked_call")
+  @patch.object(System, "os_family", new = 'redhat')
+  def test_installed_packages_cache_rhel(self, shell_mock, call_mock):
+    call_mock.return_value = (0, INSTALLED_RPMS)
+    with Environment('/') as env:
+      Package("some_package")
+      Package("other_package.noarch")
+      Package("some_package-3.5.0")
+      Package("missing_package")
+      Package("other_package")
+    # the list is reloaded after installation only
+    self.assertEqual([LIST_RPMS_CALL, LIST_RPMS_CALL], call_mock.call_args_list)
+    shell_mock.assert_called_once_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'install', 'missing_package'], logoutput=False, sudo=True)
+
+  @patch.object(shell, "call")
+  @patch.object(shell, "checked_call")
+  @patch.object(System, "os_family", new = 'redhat')
+  def test_action_install_packages_rhel(self, shell_mock, call_mock):
+    call_mock.return_value = (0, INSTALLED_RPMS)
+    with Environment('/') as env:
+      Package("packages",
+              packages=["some_package", "missing_package", "other_package", "another_package"]
+      )
+    shell_mock.assert_called_once_with(['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'install', 'missing_package', 'another_package'], logoutput=False, sudo=True)
+
+  def test_packages_inventory(self):
+    inventory = PackagesInventory(["hadoop", "hadoop-client", "hadoop-hdfs", "hbase", "libstdc++6"])
+    self.assertTrue("hadoop" in inventory)
+    self.assertFalse("hadoop-yarn" in inventory)
+    self.assertEqual(["hadoop-client", "hadoop-hdfs"], inventory.match("hadoop-*"))
+    self.assertEqual(["hadoop", "hbase"], inventory.match("h[ab]*[ep]"))
+    self.assertEqual([], inventory.match("zookeeper*"))
+    self.assertEqual(["hadoop", "hadoop-client", "hadoop-hdfs"], inventory.match_regex("hadoop.*"))
+    self.assertEqual(["hadoop-client"], inventory.match_regex("hadoop-c.*"))
+    self.assertEqual(["hbase"], inventory.match_regex("hb*ase"))
+    self.assertEqual(["libstdc++6"], inventory.match_regex("libstdc++.*"))
+    self.assertEqual([], inventory.match_regex("hadoo"))
+
   @replace_underscores
   def func_to_test(self, name):
     return name
@@ -19,6 +19,7 @@ limitations under the License.
 '''
 import ConfigParser
 import os
+import shutil
 
 import pprint
 
@@ -89,7 +90,9 @@ class TestScript(TestCase):
       Script.config = dummy_config
       script.install_packages("env")
     resource_dump = pprint.pformat(env.resource_list)
-    self.assertEqual(resource_dump, '[u"Package[\'hbase\']", u"Package[\'yet-another-package\']"]')
+    # packages are installed in one transaction
+    self.assertEqual(resource_dump, '[u"Package[\'hbase, yet-another-package\']"]')
+    self.assertEqual(["hbase", "yet-another-package"], env.resource_list[0].packages)
 
   @patch("__builtin__.open")
   def test_structured_out(self, open_mock):
@@ -154,6 +157,79 @@ class TestScript(TestCase):
     self.assertEquals(resource_dump, '[]')
 
 
+  def test_execute_status_batch(self):
+    package_dir = tempfile.mkdtemp()
+    scripts_dir = os.path.join(package_dir, "scripts")
+    os.mkdir(scripts_dir)
+    component_script = """
+from resource_management import *
+from resource_management.core.exceptions import ComponentIsNotRunning
+
+class Component(Script):
+  def status(self, env):
+    import status_params
+    if not status_params.running:
+      raise ComponentIsNotRunning()
+
+  def security_status(self, env):
+    self.put_structured_out({"securityState": "UNSECURED"})
+
+if __name__ == "__main__":
+  Component().execute()
+"""
+    for name in ["master.py", "slave.py"]:
+      with open(os.path.join(scripts_dir, name), "w") as fp:
+        fp.write(component_script)
+    with open(os.path.join(scripts_dir, "status_params.py"), "w") as fp:
+      fp.write("from resource_management import *\n"
+               "running = Script.get_config()['configurations']['dummy-env']['running']\n")
+
+    def status_command(component, script, running):
+      return {
+        "componentName" : component,
+        "commandParams" : {"script" : script},
+        "configurations" : {"dummy-env" : {"running" : running}},
+      }
+    commands = [status_command("MASTER", "scripts/master.py", "true"),
+                status_command("SLAVE", "scripts/slave.py", "false"),
+                status_command("UNKNOWN", "scripts/unknown.py", "false")]
+
+    sys.path.insert(0, scripts_dir)
+    try:
+      script = Script()
+      script.basedir = package_dir
+      script.stroutfile = os.path.join(package_dir, "structured-out.json")
+      script.execute_status_batch(commands)
+    finally:
+      sys.path.remove(scripts_dir)
+      sys.modules.pop("status_params", None)
+      shutil.rmtree(package_dir)
+    structured_out = Script.structuredOut
+    Script.structuredOut = {}
+
+    self.assertEqual({"components" : {
+      "MASTER" : {"exitcode" : 0, "securityState" : "UNSECURED", "structuredOut" : {}},
+      # status_params have been imported again with configuration of the component
+      "SLAVE" : {"exitcode" : 1, "securityState" : "UNSECURED", "structuredOut" : {}},
+      "UNKNOWN" : {"exitcode" : 1, "securityState" : "UNKNOWN", "structuredOut" : {}},
+    }}, structured_out)
+
+  def test_load_command_json(self):
+    tmp_dir = tempfile.mkdtemp()
+    configurations_file = os.path.join(tmp_dir, "configurations-1.json")
+    with open(configurations_file, "w") as fp:
+      fp.write('{"foo-site": {"foo": "bar"}}')
+    try:
+      command = Script().load_command_json(StringIO.StringIO(
+        '{"configurationsFile": "%s", "roleCommand": "START"}' % configurations_file))
+      self.assertEqual({"foo-site": {"foo": "bar"}}, command['configurations'])
+      # commands with inline configurations are loaded as is
+      command = Script().load_command_json(StringIO.StringIO(
+        '{"configurations": {"foo-site": {}}}'))
+      self.assertEqual({"configurations": {"foo-site": {}}}, command)
+    finally:
+      shutil.rmtree(tmp_dir)
+
   def tearDown(self):
     # enable stdout
     sys.stdout = sys.__stdout__
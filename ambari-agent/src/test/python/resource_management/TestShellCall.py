@@ -0,0 +1,88 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+import time
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from resource_management.core import shell
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from only_for_platform import only_for_platform, PLATFORM_LINUX
+
+
+@patch.object(Logger, "logger", new = logging.getLogger("resource_management_test"))
+class TestShellCall(TestCase):
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_call_output(self):
+    code, out = shell.call("for i in $(seq 1 20000); do echo line$i; done; exit 3")
+    self.assertEqual(3, code)
+    lines = out.splitlines()
+    self.assertEqual(20000, len(lines))
+    self.assertEqual("line20000", lines[-1])
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_call_arguments_list(self):
+    code, out = shell.call(["echo", "$HOME", "`ls`"])
+    self.assertEqual((0, "$HOME `ls`"), (code, out.strip()))
+
+    code, out = shell.call(["/nonexistent/command", "arg"])
+    self.assertEqual(127, code)
+    try:
+      shell.checked_call(["/nonexistent/command", "arg"])
+      self.fail("Should throw exception")
+    except Fail:
+      pass
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_call_on_new_line(self):
+    on_new_line = MagicMock()
+    shell.call("echo -n first; sleep 0.1; echo ' line'; echo second; echo -n last", on_new_line=on_new_line)
+    # pty may translate new lines to \r\n
+    self.assertEqual(["first line\n", "second\n", "last"],
+                     [args[0][0].replace("\r", "") for args in on_new_line.call_args_list])
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_call_output_limit(self):
+    code, out = shell.call("seq 1 10000", output_limit=100)
+    out = out.replace("\r", "")
+    self.assertTrue(out.startswith("1\n2\n"))
+    self.assertTrue(out.endswith("9999\n10000"))
+    self.assertTrue("bytes of output skipped" in out)
+    self.assertTrue(len(out) < 200)
+
+  @only_for_platform(PLATFORM_LINUX)
+  def test_call_background_process(self):
+    # the started process keeps the output open, but is not waited for
+    start = time.time()
+    code, out = shell.call("sleep 5 & echo started")
+    self.assertEqual((0, "started"), (code, out.strip()))
+    self.assertTrue(time.time() - start < 4)
+
+  def test_output_buffer(self):
+    output = shell.OutputBuffer(10)
+    for chunk in ["abc", "defgh", "ijklmnop", "qr"]:
+      output.append(chunk)
+    self.assertEqual("abcde\n[8 bytes of output skipped]\nnopqr", output.get_value())
+
+    output = shell.OutputBuffer()
+    for chunk in ["abc", "defgh"]:
+      output.append(chunk)
+    self.assertEqual("abcdefgh", output.get_value())
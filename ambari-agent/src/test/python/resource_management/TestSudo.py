@@ -0,0 +1,94 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+from mock.mock import patch
+
+from resource_management.core import sudo
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from only_for_platform import only_for_platform, PLATFORM_LINUX
+
+
+class TestSudo(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.helper = sudo.PrivilegedHelper()
+
+  def tearDown(self):
+    self.helper.stop()
+    shutil.rmtree(self.tmp_dir)
+
+  @only_for_platform(PLATFORM_LINUX)
+  @patch("os.geteuid")
+  def test_helper_process(self, geteuid_mock):
+    geteuid_mock.return_value = 1000
+    self.helper.helper_command = lambda: [sys.executable, self.helper.HELPER_SCRIPT]
+    self.assertTrue(self.helper.is_available())
+    process = self.helper.process
+
+    path = os.path.join(self.tmp_dir, "dir", "file")
+    self.helper.execute('makedirs', os.path.dirname(path), 0750)
+    self.helper.execute('create_file', path, "content\n\xff")
+    self.assertEqual("content\n\xff", self.helper.execute('read_file', path))
+    self.assertEqual([os.getuid(), os.getgid(), 0644], self.helper.execute('stat', path))
+    self.assertEqual(0750, self.helper.execute('stat', os.path.dirname(path))[2])
+
+    link = os.path.join(self.tmp_dir, "link")
+    self.helper.execute('symlink', path, link)
+    self.assertTrue(self.helper.execute('path_lexists', link))
+    self.helper.execute('unlink', link)
+    self.assertFalse(self.helper.execute('path_exists', link))
+
+    try:
+      self.helper.execute('read_file', link)
+      self.fail("Should throw exception")
+    except Fail, err:
+      self.assertTrue("IOError" in str(err))
+
+    # all operations are served by the same process
+    self.assertTrue(self.helper.is_available())
+    self.assertTrue(process is self.helper.process)
+
+  @only_for_platform(PLATFORM_LINUX)
+  @patch.object(Logger, "info")
+  @patch("os.geteuid")
+  def test_helper_not_available(self, geteuid_mock, info_mock):
+    geteuid_mock.return_value = 1000
+    self.helper.helper_command = lambda: ["false"]
+    self.assertFalse(self.helper.is_available())
+    self.assertTrue(self.helper.disabled)
+    self.assertTrue(self.helper.process is None)
+
+  @patch.object(sudo, "_helper")
+  @patch("resource_management.core.shell.checked_call")
+  def test_sudo_fallback(self, checked_call_mock, helper_mock):
+    helper_mock.is_available.return_value = False
+    sudo.chmod("/a/b", 0755)
+    checked_call_mock.assert_called_with(["chmod", "0755", "/a/b"], sudo=True)
+
+    helper_mock.is_available.return_value = True
+    checked_call_mock.reset_mock()
+    sudo.chmod("/a/b", 0755)
+    helper_mock.execute.assert_called_with('chmod', "/a/b", 0755)
+    self.assertFalse(checked_call_mock.called)
@@ -0,0 +1,341 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import BaseHTTPServer
+import json
+import os
+import shutil
+import socket
+import SocketServer
+import ssl
+import tempfile
+import threading
+import urlparse
+from unittest import TestCase
+
+from resource_management import *
+from resource_management.core import shell
+from resource_management.core.logger import Logger
+from resource_management.libraries.functions import webhdfs, web_request
+from resource_management.libraries.providers import hdfs_directory, copy_from_local
+from mock.mock import patch, MagicMock, call
+
+HDFS_SITE = """<configuration>
+  <property><name>dfs.webhdfs.enabled</name><value>{enabled}</value></property>
+  <property><name>dfs.nameservices</name><value>ns1</value></property>
+  <property><name>dfs.ha.namenodes.ns1</name><value>nn1,nn2</value></property>
+  <property><name>dfs.namenode.http-address.ns1.nn1</name><value>c6401:50070</value></property>
+  <property><name>dfs.namenode.http-address.ns1.nn2</name><value>c6402:50070</value></property>
+</configuration>"""
+CORE_SITE = """<configuration>
+  <property><name>fs.defaultFS</name><value>hdfs://ns1</value></property>
+</configuration>"""
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  # keep-alive connection of the client must not block the upload
+  daemon_threads = True
+
+
+class FakeNameNode(BaseHTTPServer.BaseHTTPRequestHandler):
+  """
+  Keeps the file system in server.files: path -> content (None for directories)
+  """
+  protocol_version = "HTTP/1.1"
+
+  def setup(self):
+    BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+    self.server.connections += 1
+
+  def log_message(self, *args):
+    pass
+
+  def send(self, status, body="", headers={}):
+    self.send_response(status)
+    for name, value in headers.items():
+      self.send_header(name, value)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def handle_request(self):
+    url = urlparse.urlparse(self.path)
+    path = url.path[len("/webhdfs/v1"):]
+    params = dict(urlparse.parse_qsl(url.query))
+    self.server.requests.append((self.command, path, params))
+    files = self.server.files
+
+    if self.server.standby:
+      self.send(403, json.dumps({"RemoteException": {"exception": "StandbyException", "message": "standby"}}))
+    elif url.path == "/data":
+      files[params['path']] = self.rfile.read(int(self.headers['Content-Length']))
+      self.send(201)
+    elif params['op'] in ['GETFILESTATUS', 'LISTSTATUS'] and not path in files and path != '/':
+      self.send(404, json.dumps({"RemoteException": {"message": "File does not exist: " + path}}))
+    elif params['op'] == 'GETFILESTATUS':
+      if path in files:
+        self.send(200, json.dumps({"FileStatus": {"type": "FILE" if files[path] else "DIRECTORY"}}))
+      else:
+        self.send(200, json.dumps({"FileStatus": {"type": "DIRECTORY"}}))
+    elif params['op'] == 'LISTSTATUS':
+      children = [name for name in files if os.path.dirname(name) == path]
+      self.send(200, json.dumps({"FileStatuses": {"FileStatus": [
+        {"pathSuffix": os.path.basename(name), "type": "FILE" if files[name] else "DIRECTORY"} for name in sorted(children)]}}))
+    elif params['op'] == 'MKDIRS':
+      while path != '/':
+        files.setdefault(path, None)
+        path = os.path.dirname(path)
+      self.send(200, '{"boolean": true}')
+    elif params['op'] == 'CREATE':
+      self.send(307, headers={"Location": "http://localhost:%d/data?path=%s" % (self.server.server_port, path)})
+    else:
+      self.send(200)
+
+  do_GET = handle_request
+  do_PUT = handle_request
+
+
+class TestWebHDFS(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.servers = []
+    webhdfs.clients.clear()
+
+  def tearDown(self):
+    for server in self.servers:
+      server.shutdown()
+      server.server_close()
+    shutil.rmtree(self.tmp_dir)
+    webhdfs.clients.clear()
+
+  def start_namenode(self, standby=False):
+    server = ThreadingHTTPServer(("localhost", 0), FakeNameNode)
+    server.files = {}
+    server.requests = []
+    server.connections = 0
+    server.standby = standby
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.servers.append(server)
+    return server
+
+  def test_client(self):
+    standby = self.start_namenode(standby=True)
+    active = self.start_namenode()
+    client = webhdfs.WebHDFS([("localhost", standby.server_port), ("localhost", active.server_port)], "hdfs")
+
+    self.assertEqual(None, client.get_file_status("/apps/tez"))
+    client.mkdirs("/apps/tez/lib")
+    self.assertEqual("DIRECTORY", client.get_file_status("/apps/tez")['type'])
+
+    local_file = os.path.join(self.tmp_dir, "tez.tar.gz")
+    with open(local_file, "wb") as fp:
+      fp.write("content" * 1000)
+    client.upload(local_file, "/apps/tez/lib/tez.tar.gz")
+    self.assertEqual("content" * 1000, active.files["/apps/tez/lib/tez.tar.gz"])
+
+    client.set_owner("/apps/tez", "tez", "hadoop", recursive=True)
+    setowner = [path for method, path, params in active.requests if params.get('op') == 'SETOWNER']
+    self.assertEqual(["/apps/tez", "/apps/tez/lib", "/apps/tez/lib/tez.tar.gz"], setowner)
+    self.assertTrue(all(params.get('user.name') == "hdfs" for method, path, params in active.requests
+                        if 'op' in params))
+
+    # standby NameNode is asked once, all requests to the active one go through the same connection
+    self.assertEqual(1, len(standby.requests))
+    self.assertEqual(1, active.connections - 1) # the other one is the upload
+    client.close()
+
+  def test_errors(self):
+    active = self.start_namenode()
+    client = webhdfs.WebHDFS([("localhost", active.server_port)], "hdfs")
+    try:
+      client.list_status("/missing")
+      self.fail("Should throw exception")
+    except Fail, err:
+      self.assertEqual("WebHDFS LISTSTATUS /missing failed: 404 File does not exist: /missing", str(err))
+
+    client.get_file_status("/")
+    # NameNode has closed the keep-alive connection
+    client.connection.sock.close()
+    client.get_file_status("/")
+    client.close()
+
+  def test_unavailable_namenode(self):
+    # port nothing listens on
+    sock = socket.socket()
+    sock.bind(("localhost", 0))
+    down_port = sock.getsockname()[1]
+    sock.close()
+
+    active = self.start_namenode()
+    client = webhdfs.WebHDFS([("localhost", down_port), ("localhost", active.server_port)], "hdfs")
+    client.mkdirs("/apps/tez")
+    self.assertEqual("DIRECTORY", client.get_file_status("/apps/tez")['type'])
+    # NameNode which is up is asked first from now on
+    self.assertEqual(("localhost", active.server_port), client.addresses[0])
+    client.close()
+
+    client = webhdfs.WebHDFS([("localhost", down_port)], "hdfs")
+    self.assertRaises(webhdfs.WebHDFSUnavailable, client.get_file_status, "/")
+    self.assertFalse(client.available)
+    webhdfs.clients[(self.tmp_dir, "hdfs", False, True)] = client
+    self.assertEqual(None, webhdfs.get_webhdfs(self.tmp_dir, "hdfs"))
+
+  @patch.object(webhdfs, "get_negotiate_header")
+  def test_spnego_failure(self, get_negotiate_header_mock):
+    get_negotiate_header_mock.side_effect = Exception("No Kerberos credentials available")
+    active = self.start_namenode()
+    client = webhdfs.WebHDFS([("localhost", active.server_port)], "root", security_enabled=True)
+    try:
+      client.get_file_status("/")
+      self.fail("Should throw exception")
+    except webhdfs.WebHDFSUnavailable, err:
+      self.assertTrue("No Kerberos credentials available" in str(err))
+    self.assertEqual(0, len(active.requests))
+
+  def test_certificates(self):
+    client = webhdfs.WebHDFS([("c6401", 50470)], "hdfs", https=True)
+    self.assertEqual(ssl.CERT_REQUIRED, client._create_connection("c6401", 50470, True)._context.verify_mode)
+
+    # verification is turned off only on request
+    client = webhdfs.WebHDFS([("c6401", 50470)], "hdfs", https=True, verify_certificates=False)
+    self.assertEqual(ssl.CERT_NONE, client._create_connection("c6401", 50470, True)._context.verify_mode)
+
+  def write_configs(self, enabled="true"):
+    with open(os.path.join(self.tmp_dir, "hdfs-site.xml"), "w") as fp:
+      fp.write(HDFS_SITE.format(enabled=enabled))
+    with open(os.path.join(self.tmp_dir, "core-site.xml"), "w") as fp:
+      fp.write(CORE_SITE)
+
+  @patch.object(Logger, "info")
+  def test_get_webhdfs(self, info_mock):
+    # configuration is not available
+    self.assertEqual(None, webhdfs.get_webhdfs(self.tmp_dir, "hdfs"))
+
+    webhdfs.clients.clear()
+    self.write_configs()
+    client = webhdfs.get_webhdfs(self.tmp_dir, "hdfs")
+    self.assertEqual([("c6401", 50070), ("c6402", 50070)], client.addresses)
+    self.assertTrue(client is webhdfs.get_webhdfs(self.tmp_dir, "hdfs"))
+
+    with patch.object(web_request, "kerberos", new = None):
+      self.assertEqual(None, webhdfs.get_webhdfs(self.tmp_dir, "hdfs", security_enabled=True))
+
+    webhdfs.clients.clear()
+    self.write_configs(enabled="false")
+    self.assertEqual(None, webhdfs.get_webhdfs(self.tmp_dir, "hdfs"))
+
+  @patch.object(System, "os_family", new = 'redhat')
+  @patch.object(hdfs_directory, "get_webhdfs")
+  def test_hdfs_directory(self, get_webhdfs_mock):
+    client = get_webhdfs_mock.return_value
+    client.get_file_status.side_effect = lambda path: path == "/apps/hive" or None
+    with Environment('/') as env:
+      HdfsDirectory("/apps/hive",
+                    action="create_delayed",
+                    owner="hive",
+                    mode=0755,
+                    conf_dir="/etc/hadoop/conf",
+                    hdfs_user="hdfs")
+      HdfsDirectory("/apps/webhcat",
+                    action="create_delayed",
+                    owner="hcat",
+                    group="hadoop",
+                    recursive_chown=True,
+                    conf_dir="/etc/hadoop/conf",
+                    hdfs_user="hdfs")
+      HdfsDirectory(None,
+                    action="create",
+                    conf_dir="/etc/hadoop/conf",
+                    hdfs_user="hdfs")
+
+    get_webhdfs_mock.assert_called_with("/etc/hadoop/conf", "hdfs", False)
+    client.mkdirs.assert_has_calls([call("/apps/hive"), call("/apps/webhcat")])
+    client.set_permission.assert_called_once_with("/apps/hive", 0755, recursive=False)
+    client.set_owner.assert_has_calls([call("/apps/hive", "hive", None, recursive=False),
+                                       call("/apps/webhcat", "hcat", "hadoop", recursive=True)], any_order=True)
+
+  @patch.object(System, "os_family", new = 'redhat')
+  @patch.object(hdfs_directory, "Execute")
+  @patch.object(hdfs_directory, "get_webhdfs")
+  def test_hdfs_directory_fallback(self, get_webhdfs_mock, execute_mock):
+    client = get_webhdfs_mock.return_value
+    client.get_file_status.side_effect = webhdfs.WebHDFSUnavailable("connection refused")
+    with Environment('/') as env:
+      HdfsDirectory("/apps/hive",
+                    action="create",
+                    owner="hive",
+                    conf_dir="/etc/hadoop/conf",
+                    hdfs_user="hdfs")
+
+    self.assertFalse(client.mkdirs.called)
+    self.assertTrue(execute_mock.call_args[0][0].startswith("hadoop --config /etc/hadoop/conf fs -mkdir -p /apps/hive"))
+
+  @patch.object(System, "os_family", new = 'redhat')
+  @patch.object(shell, "call", new = MagicMock(return_value=(1, "")))
+  @patch.object(copy_from_local, "get_webhdfs")
+  def test_copy_from_local(self, get_webhdfs_mock):
+    client = get_webhdfs_mock.return_value
+    client.get_file_status.return_value = None
+    for name in ["a.jar", "b.jar"]:
+      open(os.path.join(self.tmp_dir, name), "w").close()
+
+    with Environment('/') as env:
+      CopyFromLocal(os.path.join(self.tmp_dir, "*.jar"),
+                    mode=0444,
+                    owner="hive",
+                    group="hadoop",
+                    dest_dir="/apps/hive/",
+                    hdfs_user="hdfs")
+
+    get_webhdfs_mock.assert_has_calls([call("/etc/hadoop/conf", "hive", False),
+                                       call("/etc/hadoop/conf", "hdfs", False)])
+    client.upload.assert_has_calls([call(os.path.join(self.tmp_dir, "a.jar"), "/apps/hive/a.jar"),
+                                    call(os.path.join(self.tmp_dir, "b.jar"), "/apps/hive/b.jar")])
+    client.set_owner.assert_called_with("/apps/hive/b.jar", "hive", "hadoop")
+    client.set_permission.assert_called_with("/apps/hive/b.jar", 0444)
+
+  @patch.object(System, "os_family", new = 'redhat')
+  @patch.object(copy_from_local, "ExecuteHadoop")
+  @patch.object(copy_from_local, "get_webhdfs")
+  def test_copy_from_local_fallback(self, get_webhdfs_mock, execute_hadoop_mock):
+    client = get_webhdfs_mock.return_value
+    client.get_file_status.side_effect = webhdfs.WebHDFSUnavailable("connection refused")
+    source = os.path.join(self.tmp_dir, "a.jar")
+    open(source, "w").close()
+    with Environment('/') as env:
+      CopyFromLocal(source,
+                    owner="hive",
+                    dest_dir="/apps/hive/",
+                    hdfs_user="hdfs")
+
+    self.assertFalse(client.upload.called)
+    self.assertEqual("fs -copyFromLocal {0} /apps/hive/".format(source), execute_hadoop_mock.call_args_list[0][0][0])
+
+    # nothing matches the pattern
+    try:
+      with Environment('/') as env:
+        CopyFromLocal(os.path.join(self.tmp_dir, "*.tar.gz"),
+                      owner="hive",
+                      dest_dir="/apps/hive/",
+                      hdfs_user="hdfs")
+      self.fail("Should throw exception")
+    except Fail, err:
+      self.assertTrue("no such files" in str(err))
@@ -0,0 +1,160 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import BaseHTTPServer
+import os
+import shutil
+import SocketServer
+import tempfile
+import threading
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from resource_management.core.exceptions import Fail
+from resource_management.libraries.functions import web_request
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class FakeWebServer(BaseHTTPServer.BaseHTTPRequestHandler):
+  """
+  /secured requires SPNEGO authentication, /old redirects to /status
+  """
+  protocol_version = "HTTP/1.1"
+
+  def setup(self):
+    BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+    self.server.connections += 1
+
+  def log_message(self, *args):
+    pass
+
+  def send(self, status, body="", headers={}):
+    self.send_response(status)
+    for name, value in headers.items():
+      self.send_header(name, value)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    self.server.requests.append((self.path, self.headers.get('Authorization'), self.headers.get('Cookie')))
+    if self.path == '/old':
+      self.send(302, headers={"Location": "/status"})
+    elif self.path == '/secured' and self.headers.get('Cookie') != 'hadoop.auth=token':
+      if self.headers.get('Authorization') == 'Negotiate spnego-token':
+        self.send(200, "secured", {"Set-Cookie": "hadoop.auth=token; Path=/"})
+      else:
+        self.send(401, headers={"WWW-Authenticate": "Negotiate"})
+    else:
+      self.send(200, '{"status": "ok"}')
+
+
+class TestWebRequest(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.server = ThreadingHTTPServer(("localhost", 0), FakeWebServer)
+    self.server.requests = []
+    self.server.connections = 0
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.url = "http://localhost:{0}".format(self.server.server_port)
+
+  def tearDown(self):
+    for connections in web_request.idle_connections.values():
+      for connection in connections:
+        connection.close()
+    web_request.idle_connections.clear()
+    web_request.auth_cookies.clear()
+    self.server.shutdown()
+    self.server.server_close()
+    shutil.rmtree(self.tmp_dir)
+
+  def test_make_web_request(self):
+    self.assertEqual((200, '{"status": "ok"}'), web_request.make_web_request(self.url + "/status"))
+    self.assertEqual((200, '{"status": "ok"}'), web_request.make_web_request(self.url + "/old"))
+    self.assertEqual(["/status", "/old", "/status"], [path for path, _, _ in self.server.requests])
+    # all the requests went through the same keep-alive connection
+    self.assertEqual(1, self.server.connections)
+
+    # server has closed the connection
+    web_request.idle_connections.values()[0][0].sock.close()
+    self.assertEqual(200, web_request.make_web_request(self.url + "/status")[0])
+    self.assertEqual(2, self.server.connections)
+
+    # server has been restarted, all the idle connections are stale
+    key = web_request.idle_connections.keys()[0]
+    web_request._release_connection(key, web_request._create_connection(key, 5))
+    connections = web_request.idle_connections[key]
+    self.assertEqual(2, len(connections))
+    for connection in connections:
+      connection.connect()
+      connection.sock.close()
+    self.assertEqual((200, '{"status": "ok"}'), web_request.make_web_request(self.url + "/status"))
+    self.assertEqual(1, len(web_request.idle_connections[key]))
+
+  @patch.object(web_request, "kerberos")
+  def test_spnego(self, kerberos_mock):
+    kerberos_mock.authGSSClientInit.return_value = (1, "context")
+    kerberos_mock.authGSSClientResponse.return_value = "spnego-token"
+
+    self.assertEqual(401, web_request.make_web_request(self.url + "/secured")[0])
+    self.assertEqual((200, "secured"), web_request.make_web_request(self.url + "/secured", "/tmp/cc"))
+    kerberos_mock.authGSSClientInit.assert_called_once_with("HTTP@localhost")
+
+    # cookie is used instead of a new negotiation
+    self.assertEqual(200, web_request.make_web_request(self.url + "/secured", "/tmp/cc")[0])
+    self.assertEqual(1, kerberos_mock.authGSSClientInit.call_count)
+    self.assertEqual((None, 'hadoop.auth=token'), self.server.requests[-1][1:])
+
+  @patch("time.time")
+  @patch("subprocess.Popen")
+  def test_ticket_manager(self, popen_mock, time_mock):
+    popen_mock.return_value.communicate.return_value = ("", None)
+    popen_mock.return_value.returncode = 0
+    time_mock.return_value = 1000
+    ccache = os.path.join(self.tmp_dir, "cc")
+    manager = web_request.KerberosTicketManager()
+
+    manager.kinit(ccache, "HTTP/c6401@EXAMPLE.COM", "/etc/security/keytabs/spnego.service.keytab")
+    self.assertEqual(1, popen_mock.call_count)
+    self.assertEqual(['-l', '300s', '-c', ccache, '-kt', "/etc/security/keytabs/spnego.service.keytab",
+                      "HTTP/c6401@EXAMPLE.COM"], popen_mock.call_args[0][0][1:])
+
+    # ticket is valid
+    open(ccache, "w").close()
+    time_mock.return_value = 1200
+    manager.kinit(ccache, "HTTP/c6401@EXAMPLE.COM", "/etc/security/keytabs/spnego.service.keytab")
+    self.assertEqual(1, popen_mock.call_count)
+
+    # ticket is about to expire
+    time_mock.return_value = 1280
+    manager.kinit(ccache, "HTTP/c6401@EXAMPLE.COM", "/etc/security/keytabs/spnego.service.keytab")
+    self.assertEqual(2, popen_mock.call_count)
+
+    popen_mock.return_value.returncode = 1
+    popen_mock.return_value.communicate.return_value = ("Keytab contains no suitable keys\n", None)
+    try:
+      manager.kinit(os.path.join(self.tmp_dir, "other"), "nn/c6401@EXAMPLE.COM", "/etc/nn.keytab")
+      self.fail("Should throw exception")
+    except Fail, err:
+      self.assertTrue("Keytab contains no suitable keys" in str(err))
@@ -24,7 +24,7 @@ import os
 import time
 from unittest import TestCase
 from mock.mock import patch, MagicMock
-from resource_management.core import Environment, sudo
+from resource_management.core import Environment, sudo, source
 from resource_management.core.system import System
 from resource_management.libraries import XmlConfig
 
@@ -179,6 +179,46 @@ class TestXmlConfigResource(TestCase):
 
     create_file_mock.assert_called_with('/dir/conf/file.xml', u'<!--Wed 2014-02-->\n    <configuration>\n    \n    <property>\n      <name></name>\n      <value></value>\n    </property>\n    \n    <property>\n      <name>first</name>\n      <value>should be first</value>\n    </property>\n    \n    <property>\n      <name>second</name>\n      <value>should be second</value>\n    </property>\n    \n    <property>\n      <name>third</name>\n      <value>should be third</value>\n    </property>\n    \n    <property>\n      <name>z_last</name>\n      <value>should be last</value>\n    </property>\n    \n  </configuration>\n')
 
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch.object(sudo, "create_file")
+  @patch.object(sudo, "path_exists")
+  @patch.object(sudo, "path_isdir")
+  @patch.object(time, "asctime")
+  def test_action_create_xml_config_with_templates(self,
+                                                   time_asctime_mock,
+                                                   os_path_isdir_mock,
+                                                   os_path_exists_mock,
+                                                   create_file_mock,
+                                                   ensure_mock):
+    """
+    Tests if 'create' action - renders values which are templates with the params,
+    every template is compiled once and literal values are not compiled at all
+    """
+    os_path_isdir_mock.side_effect = lambda path: path == '/dir/conf'
+    os_path_exists_mock.return_value = False
+    time_asctime_mock.return_value = 'Wed 2014-02'
+
+    with patch.object(source.inline_template_environment, "get_template",
+                      wraps=source.inline_template_environment.get_template) as get_template_mock:
+      with Environment('/') as env:
+        env.config.params = {'java_home': '/usr/jdk'}
+        XmlConfig('file.xml',
+                  conf_dir='/dir/conf',
+                  configurations={'home': '{{java_home}}', 'literal': ' value ',
+                                  'opts': '{% if java_home %}-Xmx1g{% endif %}'},
+                  configuration_attributes={'final': {'home': 'true'}}
+                  )
+        XmlConfig('file.xml',
+                  conf_dir='/dir/conf',
+                  configurations={'home': '{{java_home}}'},
+                  configuration_attributes={}
+                  )
+
+    create_file_mock.assert_any_call('/dir/conf/file.xml', u'<!--Wed 2014-02-->\n    <configuration>\n    \n    <property>\n      <name>home</name>\n      <value>/usr/jdk</value>\n      <final>true</final>\n    </property>\n    \n    <property>\n      <name>literal</name>\n      <value>value</value>\n    </property>\n    \n    <property>\n      <name>opts</name>\n      <value>-Xmx1g</value>\n    </property>\n    \n  </configuration>\n')
+    self.assertEqual(['{% if java_home %}-Xmx1g{% endif %}', '{{java_home}}'],
+                     sorted(set(args[0][0] for args in get_template_mock.call_args_list)))
+    self.assertEqual(3, get_template_mock.call_count)
+
   @patch("resource_management.libraries.providers.xml_config.File")
   @patch.object(sudo, "path_exists")
   @patch.object(sudo, "path_isdir")
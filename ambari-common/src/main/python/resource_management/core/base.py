@@ -144,7 +144,8 @@ class Resource(object):
         except InvalidArgument, exc:
           raise InvalidArgument("%s %s" % (self, exc))
     
-    if not self.env.test_mode:
+    # resources of env.parallel() blocks are executed at the end of the block
+    if not self.env.test_mode and self.env.parallel_workers is None:
       self.env.run()
 
   def validate(self):
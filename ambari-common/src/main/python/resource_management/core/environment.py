@@ -23,9 +23,14 @@ Ambari Agent
 __all__ = ["Environment"]
 
 import os
+import errno
 import logging
 import shutil
+import sys
+import threading
 import time
+import Queue
+from contextlib import contextmanager
 from datetime import datetime
 
 from resource_management.core import shell
@@ -36,8 +41,22 @@ from resource_management.core.system import System
 from resource_management.core.logger import Logger
 
 
+# resources of these types touch only the returned paths (and their parent
+# directories), so they can be executed concurrently with each other
+RESOURCE_PATHS = {
+  'File': lambda resource: [resource.path],
+  'Directory': lambda resource: [resource.path],
+  'Link': lambda resource: [resource.path, os.path.join(os.path.dirname(resource.path), resource.to)],
+  'TemplateConfig': lambda resource: [resource.path],
+  'XmlConfig': lambda resource: [os.path.join(resource.conf_dir, resource.filename)],
+  'PropertiesFile': lambda resource: [os.path.join(resource.dir, resource.filename) if resource.dir else resource.filename],
+}
+PARALLEL_WORKERS = 4
+
 class Environment(object):
   _instances = []
+  # threads executing resources in parallel have stacks of their own
+  _thread_instances = threading.local()
 
   def __init__(self, basedir=None, tmp_dir=None, test_mode=False, logging_level=logging.INFO):
     """
@@ -57,6 +76,7 @@ class Environment(object):
     self.resource_list = []
     self.delayed_actions = set()
     self.test_mode = test_mode
+    self.parallel_workers = None # resources are not executed immediately when set
     self.tmp_dir = tmp_dir
     self.update_config({
       # current time
@@ -74,7 +94,12 @@ class Environment(object):
   def backup_file(self, path):
     if self.config.backup:
       if not os.path.exists(self.config.backup.path):
-        os.makedirs(self.config.backup.path, 0700)
+        try:
+          os.makedirs(self.config.backup.path, 0700)
+        except OSError, err:
+          # created by a resource running in parallel
+          if err.errno != errno.EEXIST:
+            raise
       new_name = self.config.backup.prefix + path.replace('/', '-')
       backup_path = os.path.join(self.config.backup.path, new_name)
       Logger.info("backing up %s to %s" % (path, backup_path))
@@ -131,40 +156,184 @@ class Environment(object):
     with self:
       # Run resource actions
       while self.resource_list:
-        resource = self.resource_list.pop(0)
-        Logger.info_resource(resource)
-        
-        if resource.initial_wait:
-          time.sleep(resource.initial_wait)
-
-        if resource.not_if is not None and self._check_condition(
-          resource.not_if):
-          Logger.info("Skipping %s due to not_if" % resource)
-          continue
-
-        if resource.only_if is not None and not self._check_condition(
-          resource.only_if):
-          Logger.info("Skipping %s due to only_if" % resource)
-          continue
-
-        for action in resource.action:
-          if not resource.ignore_failures:
-            self.run_action(resource, action)
-          else:
-            try:
-              self.run_action(resource, action)
-            except Exception as ex:
-              Logger.info("Skipping failure of %s due to ignore_failures. Failure reason: %s" % (resource, str(ex)))
-              pass
+        resources = self.resource_list[:]
+        del self.resource_list[:]
+        self._run_resources(resources)
 
       # Run delayed actions
       while self.delayed_actions:
         action, resource = self.delayed_actions.pop()
         self.run_action(resource, action)
 
+  def _run_resources(self, resources):
+    for i, resource in enumerate(resources):
+      try:
+        self._run_resource(resource)
+      except:
+        # not executed resources are kept, the same as they were never taken
+        self.resource_list[0:0] = resources[i + 1:]
+        raise
+
+  def _run_resource(self, resource):
+    Logger.info_resource(resource)
+    
+    if resource.initial_wait:
+      time.sleep(resource.initial_wait)
+
+    if resource.not_if is not None and self._check_condition(
+      resource.not_if):
+      Logger.info("Skipping %s due to not_if" % resource)
+      return
+
+    if resource.only_if is not None and not self._check_condition(
+      resource.only_if):
+      Logger.info("Skipping %s due to only_if" % resource)
+      return
+
+    for action in resource.action:
+      if not resource.ignore_failures:
+        self.run_action(resource, action)
+      else:
+        try:
+          self.run_action(resource, action)
+        except Exception as ex:
+          Logger.info("Skipping failure of %s due to ignore_failures. Failure reason: %s" % (resource, str(ex)))
+          pass
+
+  @contextmanager
+  def parallel(self, max_workers=PARALLEL_WORKERS):
+    """
+    Resources declared inside of the block are executed when it ends.
+    Files, directories and other resources which touch unrelated paths run
+    concurrently, in up to max_workers threads. Any other resource (Execute,
+    Package, a resource with not_if/only_if...) waits for all resources
+    declared before it, and the ones declared after it wait for it.
+    Messages are logged in the order the resources were declared.
+
+    with env.parallel():
+      XmlConfig("hdfs-site.xml", ...)
+      XmlConfig("core-site.xml", ...)
+    """
+    if self.parallel_workers is not None:
+      yield # nested block, the outer one executes the resources
+      return
+    first = len(self.resource_list)
+    self.parallel_workers = max_workers
+    try:
+      yield
+    except:
+      # resources of the block have not been executed
+      del self.resource_list[first:]
+      raise
+    finally:
+      self.parallel_workers = None
+    if not self.test_mode:
+      with self:
+        resources = self.resource_list[first:]
+        del self.resource_list[first:]
+        self._run_resources_parallel(resources, max_workers)
+      self.run()
+
+  def _run_resources_parallel(self, resources, max_workers):
+    # resource index -> indexes of the resources it waits for
+    dependencies = dict((i, set()) for i in range(len(resources)))
+    paths = [Environment._get_resource_paths(resource) for resource in resources]
+    for i in range(len(resources)):
+      for j in range(i):
+        if paths[i] is None or paths[j] is None or Environment._paths_related(paths[i], paths[j]):
+          dependencies[i].add(j)
+
+    instances = list(self._get_instances())
+    tasks = Queue.Queue()
+    results = Queue.Queue()
+
+    def worker():
+      Environment._thread_instances.stack = list(instances)
+      while True:
+        i = tasks.get()
+        if i is None:
+          break
+        Logger.start_buffering()
+        try:
+          self._run_resource(resources[i])
+          error = None
+        except Exception:
+          error = sys.exc_info()
+        results.put((i, Logger.stop_buffering(), error))
+
+    workers = [threading.Thread(target=worker, name="ResourceWorker-{0}".format(n))
+               for n in range(min(max_workers, len(resources)))]
+    for thread in workers:
+      thread.daemon = True
+      thread.start()
+
+    started = set()
+    finished = {} # index -> (log records, error)
+    errors = {} # index -> exc_info
+    next_to_log = 0
+    try:
+      while len(finished) < len(resources):
+        # no new resources are started after a failure
+        if not errors:
+          for i in sorted(dependencies):
+            if not i in started and dependencies[i].issubset(finished):
+              started.add(i)
+              tasks.put(i)
+        if len(started) == len(finished):
+          break
+        i, records, error = results.get()
+        finished[i] = records
+        if error is not None:
+          errors[i] = error
+        while next_to_log in finished:
+          Logger.log_records(finished[next_to_log])
+          next_to_log += 1
+    finally:
+      for thread in workers:
+        tasks.put(None)
+      for thread in workers:
+        thread.join()
+
+    if errors:
+      # resources which have finished after a resource not started because of the failure
+      for i in sorted(finished):
+        if i >= next_to_log:
+          Logger.log_records(finished[i])
+      # not executed resources are kept, the same as they were never taken
+      self.resource_list[0:0] = [resource for i, resource in enumerate(resources) if not i in started]
+      exc_type, exc_value, exc_traceback = errors[min(errors)]
+      raise exc_type, exc_value, exc_traceback
+
+  @staticmethod
+  def _get_resource_paths(resource):
+    """
+    @return: paths the resource works with, None if they are not known
+    """
+    get_paths = RESOURCE_PATHS.get(resource.__class__.__name__)
+    if get_paths is None or resource.not_if is not None or resource.only_if is not None or resource.initial_wait:
+      return None
+    try:
+      return [os.path.normpath(os.path.abspath(path)) for path in get_paths(resource)]
+    except (TypeError, AttributeError):
+      return None
+
+  @staticmethod
+  def _paths_related(paths1, paths2):
+    for path1 in paths1:
+      for path2 in paths2:
+        if path1 == path2 or path1.startswith(path2.rstrip(os.sep) + os.sep) or \
+            path2.startswith(path1.rstrip(os.sep) + os.sep):
+          return True
+    return False
+
+  @classmethod
+  def _get_instances(cls):
+    stack = getattr(cls._thread_instances, 'stack', None)
+    return cls._instances if stack is None else stack
+
   @classmethod
   def get_instance(cls):
-    return cls._instances[-1]
+    return cls._get_instances()[-1]
   
   @classmethod
   def get_instance_copy(cls):
@@ -178,11 +347,11 @@ class Environment(object):
     return new_instance
 
   def __enter__(self):
-    self.__class__._instances.append(self)
+    self.__class__._get_instances().append(self)
     return self
 
   def __exit__(self, exc_type, exc_val, exc_tb):
-    self.__class__._instances.pop()
+    self.__class__._get_instances().pop()
     return False
 
   def __getstate__(self):
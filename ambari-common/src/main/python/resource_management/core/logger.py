@@ -21,8 +21,10 @@ Ambari Agent
 """
 
 __all__ = ["Logger"]
+import re
 import sys
 import logging
+import threading
 from resource_management.libraries.script.config_dictionary import UnknownConfiguration
 
 MESSAGE_MAX_LEN = 256
@@ -32,6 +34,10 @@ class Logger:
   logger = None
   # unprotected_strings : protected_strings map
   sensitive_strings = {}
+  # (number of sensitive strings, regex matching any of them), see filter_text()
+  sensitive_pattern = (0, None)
+  # messages of threads which buffer them, see start_buffering()
+  thread_records = threading.local()
   
   @staticmethod
   def initialize_logger(logging_level=logging.INFO, name='resource_management', format='%(asctime)s - %(message)s'):
@@ -54,19 +60,49 @@ class Logger:
 
   @staticmethod
   def error(text):
-    Logger.logger.error(Logger.filter_text(text))
+    Logger._log('error', Logger.filter_text(text))
 
   @staticmethod
   def warning(text):
-    Logger.logger.warning(Logger.filter_text(text))
+    Logger._log('warning', Logger.filter_text(text))
 
   @staticmethod
   def info(text):
-    Logger.logger.info(Logger.filter_text(text))
+    Logger._log('info', Logger.filter_text(text))
 
   @staticmethod
   def debug(text):
-    Logger.logger.debug(Logger.filter_text(text))
+    Logger._log('debug', Logger.filter_text(text))
+
+  @staticmethod
+  def _log(level, text):
+    records = getattr(Logger.thread_records, 'records', None)
+    if records is not None:
+      records.append((level, text))
+    else:
+      getattr(Logger.logger, level)(text)
+
+  @staticmethod
+  def start_buffering():
+    """
+    Messages of the current thread are kept until stop_buffering(), so
+    output of resources executed concurrently is not mixed up
+    """
+    Logger.thread_records.records = []
+
+  @staticmethod
+  def stop_buffering():
+    """
+    @return: messages buffered by the current thread, see log_records()
+    """
+    records = Logger.thread_records.records
+    Logger.thread_records.records = None
+    return records
+
+  @staticmethod
+  def log_records(records):
+    for level, text in records:
+      getattr(Logger.logger, level)(text)
 
   @staticmethod
   def error_resource(resource):
@@ -84,6 +120,13 @@ class Logger:
   def debug_resource(resource):
     Logger.debug(Logger.filter_text(Logger._get_resource_repr(resource)))
     
+  @staticmethod
+  def add_sensitive_string(unprotected_string, protected_string):
+    if not unprotected_string in Logger.sensitive_strings:
+      # the pattern is built again only when a new string appears
+      Logger.sensitive_pattern = (0, None)
+    Logger.sensitive_strings[unprotected_string] = protected_string
+
   @staticmethod    
   def filter_text(text):
     """
@@ -91,14 +134,30 @@ class Logger:
     """
     from resource_management.core.shell import PLACEHOLDERS_TO_STR
     
-    for unprotected_string, protected_string in Logger.sensitive_strings.iteritems():
-      text = text.replace(unprotected_string, protected_string)
+    pattern = Logger._get_sensitive_pattern()
+    if pattern:
+      sensitive_strings = Logger.sensitive_strings
+      text = pattern.sub(lambda match: sensitive_strings[match.group(0)], text)
 
     for placeholder in PLACEHOLDERS_TO_STR.keys():
       text = text.replace(placeholder, '')
 
     return text
   
+  @staticmethod
+  def _get_sensitive_pattern():
+    """
+    All the sensitive strings are replaced in one scan of the text, the
+    longest one wins when they overlap
+    """
+    count, pattern = Logger.sensitive_pattern
+    sensitive_strings = Logger.sensitive_strings
+    if pattern is None or count != len(sensitive_strings):
+      keys = sorted([key for key in sensitive_strings.keys() if key], key=len, reverse=True)
+      pattern = re.compile("|".join(map(re.escape, keys))) if keys else None
+      Logger.sensitive_pattern = (len(sensitive_strings), pattern)
+    return pattern
+
   @staticmethod
   def _get_resource_repr(resource):
     return Logger.get_function_repr(repr(resource), resource.arguments)
@@ -20,27 +20,98 @@ Ambari Agent
 
 """
 
+import bisect
+import fnmatch
 import logging
+import os
+import re
+import threading
 
+from resource_management.core import shell
 from resource_management.core.base import Fail
 from resource_management.core.providers import Provider
 from resource_management.core.logger import Logger
 
+GLOB_SPECIAL_CHARS = re.compile(r'[*?\[]')
+REGEX_SPECIAL_CHARS = re.compile(r'[.\[*^$\\]')
+
+
+class PackagesInventory(object):
+  """
+  Snapshot of installed packages, indexed by name. Each package is known by
+  several names (e.g. name and name-version for rpm), see
+  PackageProvider.get_package_labels()
+  """
+  def __init__(self, names):
+    self.names = sorted(set(names))
+    self.names_set = set(self.names)
+    # results of slow checks of the providers (e.g. repository queries)
+    # made against this snapshot
+    self.checks = {}
+
+  def __contains__(self, name):
+    return name in self.names_set
+
+  def match(self, pattern):
+    """
+    @return: installed packages matching the glob pattern (as rpm -qa does)
+    """
+    prefix = GLOB_SPECIAL_CHARS.split(pattern, 1)[0]
+    if prefix == pattern:
+      return [pattern] if pattern in self.names_set else []
+    return [name for name in self._get_names_with_prefix(prefix) if fnmatch.fnmatchcase(name, pattern)]
+
+  def match_regex(self, pattern):
+    """
+    @return: installed packages matching the whole basic regular expression
+    (as grep '^pattern$' does)
+    """
+    prefix = REGEX_SPECIAL_CHARS.split(pattern, 1)[0]
+    if prefix == pattern:
+      return [pattern] if pattern in self.names_set else []
+    if pattern[len(prefix)] == '*':
+      prefix = prefix[:-1] # the last char is optional
+    # characters below are not special in basic regular expressions
+    regex = re.compile(re.sub(r'([+?|(){}])', r'\\\1', pattern) + '$')
+    return [name for name in self._get_names_with_prefix(prefix) if regex.match(name)]
+
+  def _get_names_with_prefix(self, prefix):
+    i = bisect.bisect_left(self.names, prefix)
+    while i < len(self.names) and self.names[i].startswith(prefix):
+      yield self.names[i]
+      i += 1
+
 
 class PackageProvider(Provider):
+  # command which lists installed packages and files of the packages database,
+  # the list is reloaded when any of them changes
+  LIST_INSTALLED_CMD = None
+  PACKAGES_DATABASE = []
+
+  # (provider class, database modification time, PackagesInventory)
+  _installed_packages = None
+  _installed_packages_lock = threading.Lock()
+
   def __init__(self, *args, **kwargs):
     super(PackageProvider, self).__init__(*args, **kwargs)   
   
   def install_package(self, name, version):
     raise NotImplementedError()
+  def install_packages(self, names, use_repos=[]):
+    # providers which can install several packages in one transaction override this
+    for name in names:
+      self.install_package(name, use_repos)
   def remove_package(self, name):
     raise NotImplementedError()
   def upgrade_package(self, name, version):
     raise NotImplementedError()
 
   def action_install(self):
-    package_name = self.get_package_name_with_version()
-    self.install_package(package_name, self.resource.use_repos)
+    if self.resource.packages:
+      self.install_packages(self.resource.packages, self.resource.use_repos)
+    else:
+      package_name = self.get_package_name_with_version()
+      self.install_package(package_name, self.resource.use_repos)
 
   def action_upgrade(self):
     package_name = self.get_package_name_with_version()
@@ -58,5 +129,43 @@ class PackageProvider(Provider):
     
   def get_logoutput(self):
     return self.resource.logoutput==True and Logger.logger.isEnabledFor(logging.INFO) or self.resource.logoutput==None and Logger.logger.isEnabledFor(logging.DEBUG)
-    
-    
+
+  def get_installed_packages(self):
+    """
+    The list of installed packages is loaded once, and again only after
+    packages have been installed or removed by the providers or anybody else.
+    @return: PackagesInventory
+    """
+    mtime = self._get_database_mtime()
+    with PackageProvider._installed_packages_lock:
+      cached = PackageProvider._installed_packages
+      if cached and cached[0] == self.__class__ and cached[1] == mtime:
+        return cached[2]
+
+      code, out = shell.call(self.LIST_INSTALLED_CMD)
+      if code:
+        Logger.info("Unable to get the list of installed packages: %s" % out)
+        return PackagesInventory([])
+      names = []
+      for line in out.splitlines():
+        if line.strip():
+          names += self.get_package_labels(line.strip())
+      inventory = PackagesInventory(names)
+      PackageProvider._installed_packages = (self.__class__, mtime, inventory)
+      return inventory
+
+  @staticmethod
+  def invalidate_installed_packages():
+    with PackageProvider._installed_packages_lock:
+      PackageProvider._installed_packages = None
+
+  def get_package_labels(self, line):
+    """
+    @param line: line of LIST_INSTALLED_CMD output
+    @return: names the package can be referred to by
+    """
+    raise NotImplementedError()
+
+  def _get_database_mtime(self):
+    mtimes = [os.path.getmtime(path) for path in self.PACKAGES_DATABASE if os.path.exists(path)]
+    return max(mtimes) if mtimes else None
@@ -39,11 +39,12 @@ REMOVE_CMD = {
 }
 REPO_UPDATE_CMD = ['/usr/bin/apt-get', 'update','-qq']
 
-CHECK_EXISTENCE_CMD = "dpkg --get-selections | grep -v deinstall | awk '{print $1}' | grep '^%s$'"
+LIST_INSTALLED_CMD = ['dpkg-query', '--show', '--showformat=${Package}\t${Status}\n']
+DPKG_DATABASE = ['/var/lib/dpkg/status']
 GET_PACKAGES_BY_PATTERN_CMD = "apt-cache --names-only search '^%s$' | awk '{print $1}'"
-GET_PACKAGE_STATUS_CMD = "dpkg --status '%s'"
 
-PACKAGE_INSTALLED_STATUS = 'Status: install ok installed'
+# last word of the dpkg status, e.g. 'install ok installed' or 'hold ok installed'
+PACKAGE_INSTALLED_STATE = 'installed'
 
 EMPTY_FILE = "/dev/null"
 APT_SOURCES_LIST_DIR = "/etc/apt/sources.list.d"
@@ -57,6 +58,8 @@ def replace_underscores(function_to_decorate):
 
 
 class AptProvider(PackageProvider):
+  LIST_INSTALLED_CMD = LIST_INSTALLED_CMD
+  PACKAGES_DATABASE = DPKG_DATABASE
 
   @replace_underscores
   def install_package(self, name, use_repos=[]):
@@ -81,6 +84,7 @@ class AptProvider(PackageProvider):
       cmd = cmd + [name]
       Logger.info("Installing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
       code, out = shell.call(cmd, sudo=True, env=INSTALL_CMD_ENV, logoutput=self.get_logoutput())
+      self.invalidate_installed_packages()
       
       # apt-get update wasn't done too long
       if code:
@@ -92,7 +96,10 @@ class AptProvider(PackageProvider):
           Logger.info("Execution of '%s' returned %d. %s" % (REPO_UPDATE_CMD, code, out))
           
         Logger.info("Retrying to install package %s" % (name))
-        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+        try:
+          shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+        finally:
+          self.invalidate_installed_packages()
 
       if is_tmp_dir_created:
         for temporal_sources_file in copied_sources_files:
@@ -112,21 +119,27 @@ class AptProvider(PackageProvider):
     if self._check_existence(name):
       cmd = REMOVE_CMD[self.get_logoutput()] + [name]
       Logger.info("Removing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
-      shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      try:
+        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      finally:
+        self.invalidate_installed_packages()
     else:
       Logger.info("Skipping removing non-existent package %s" % (name))
 
+  def get_package_labels(self, line):
+    name, status = line.split('\t')
+    return [name] if status.split()[-1:] == [PACKAGE_INSTALLED_STATE] else []
+
   @replace_underscores
   def _check_existence(self, name):
-    code, out = shell.call(CHECK_EXISTENCE_CMD % name)
-    if bool(code):
+    installed_packages = self.get_installed_packages()
+    if not installed_packages.match_regex(name):
       return False
     elif '*' in name or '.' in name:  # Check if all packages matching regexp are installed
-      code1, out1 = shell.call(GET_PACKAGES_BY_PATTERN_CMD % name)
-      for package_name in out1.splitlines():
-        code2, out2 = shell.call(GET_PACKAGE_STATUS_CMD % package_name)
-        if PACKAGE_INSTALLED_STATUS not in out2.splitlines():
-          return False
-      return True
+      if not name in installed_packages.checks:
+        code1, out1 = shell.call(GET_PACKAGES_BY_PATTERN_CMD % name)
+        installed_packages.checks[name] = all(package_name in installed_packages
+                                              for package_name in out1.splitlines())
+      return installed_packages.checks[name]
     else:
       return True
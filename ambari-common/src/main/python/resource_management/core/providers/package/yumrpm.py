@@ -24,7 +24,6 @@ from resource_management.core.providers.package import PackageProvider
 from resource_management.core import shell
 from resource_management.core.shell import string_cmd_from_args_list
 from resource_management.core.logger import Logger
-import os
 
 INSTALL_CMD = {
   True: ['/usr/bin/yum', '-y', 'install'],
@@ -36,21 +35,44 @@ REMOVE_CMD = {
   False: ['/usr/bin/yum', '-d', '0', '-e', '0', '-y', 'erase'],
 }
 
-CHECK_CMD = "installed_pkgs=`rpm -qa '%s'` ; [ ! -z \"$installed_pkgs\" ]"
+LIST_INSTALLED_RPMS_CMD = ['rpm', '-qa', '--qf', '%{NAME}\t%{VERSION}\t%{RELEASE}\t%{ARCH}\n']
+RPM_DATABASE = ['/var/lib/rpm/Packages', '/var/lib/rpm/rpmdb.sqlite']
 CHECK_AVAILABLE_PACKAGES_CMD = "! yum list available '%s'"
 
+def get_rpm_labels(line):
+  """
+  Names an installed rpm can be referred to by (the same as rpm -qa accepts)
+  """
+  name, version, release, arch = line.split('\t')
+  return [name, name + '.' + arch, name + '-' + version, name + '-' + version + '-' + release,
+          name + '-' + version + '-' + release + '.' + arch]
+
 class YumProvider(PackageProvider):
+  LIST_INSTALLED_CMD = LIST_INSTALLED_RPMS_CMD
+  PACKAGES_DATABASE = RPM_DATABASE
+
   def install_package(self, name, use_repos=[]):
-    if not self._check_existence(name) or use_repos:
+    self.install_packages([name], use_repos)
+
+  def install_packages(self, names, use_repos=[]):
+    packages_to_install = []
+    for name in names:
+      if not self._check_existence(name) or use_repos:
+        packages_to_install.append(name)
+      else:
+        Logger.info("Skipping installing existent package %s" % (name))
+
+    if packages_to_install:
       cmd = INSTALL_CMD[self.get_logoutput()]
       if use_repos:
         enable_repo_option = '--enablerepo=' + ",".join(use_repos)
         cmd = cmd + ['--disablerepo=*', enable_repo_option]
-      cmd = cmd + [name]
-      Logger.info("Installing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
-      shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
-    else:
-      Logger.info("Skipping installing existent package %s" % (name))
+      cmd = cmd + packages_to_install
+      Logger.info("Installing package %s ('%s')" % (", ".join(packages_to_install), string_cmd_from_args_list(cmd)))
+      try:
+        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      finally:
+        self.invalidate_installed_packages()
 
   def upgrade_package(self, name, use_repos=[]):
     return self.install_package(name, use_repos)
@@ -59,18 +81,25 @@ class YumProvider(PackageProvider):
     if self._check_existence(name):
       cmd = REMOVE_CMD[self.get_logoutput()] + [name]
       Logger.info("Removing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
-      shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      try:
+        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      finally:
+        self.invalidate_installed_packages()
     else:
       Logger.info("Skipping removing non-existent package %s" % (name))
 
+  def get_package_labels(self, line):
+    return get_rpm_labels(line)
+
   def _check_existence(self, name):
-    if '.' in name:  # To work with names like 'zookeeper_2_2_1_0_2072.noarch'
-      name = os.path.splitext(name)[0]
-    code, out = shell.call(CHECK_CMD % name)
-    if bool(code):
+    installed_packages = self.get_installed_packages()
+    if not installed_packages.match(name):
       return False
     elif '*' in name or '?' in name:  # Check if all packages matching pattern are installed
-      code1, out1 = shell.call(CHECK_AVAILABLE_PACKAGES_CMD % name)
-      return not bool(code1)
+      # repositories are asked once per pattern until packages change
+      if not name in installed_packages.checks:
+        code1, out1 = shell.call(CHECK_AVAILABLE_PACKAGES_CMD % name)
+        installed_packages.checks[name] = not bool(code1)
+      return installed_packages.checks[name]
     else:
       return True
@@ -21,6 +21,7 @@ Ambari Agent
 """
 
 from resource_management.core.providers.package import PackageProvider
+from resource_management.core.providers.package.yumrpm import LIST_INSTALLED_RPMS_CMD, RPM_DATABASE, get_rpm_labels
 from resource_management.core import shell
 from resource_management.core.shell import string_cmd_from_args_list
 from resource_management.core.logger import Logger
@@ -33,7 +34,6 @@ REMOVE_CMD = {
   True: ['/usr/bin/zypper', 'remove', '--no-confirm'],
   False: ['/usr/bin/zypper', '--quiet', 'remove', '--no-confirm'],
 }
-CHECK_CMD = "installed_pkgs=`rpm -qa '%s'` ; [ ! -z \"$installed_pkgs\" ]"
 GET_NOT_INSTALLED_CMD = "zypper --non-interactive search --type package --uninstalled-only --match-exact '%s'"
 
 NO_PACKAGES_FOUND_STATUS = 'No packages found.'
@@ -54,8 +54,21 @@ def get_active_base_repos():
 
 
 class ZypperProvider(PackageProvider):
+  LIST_INSTALLED_CMD = LIST_INSTALLED_RPMS_CMD
+  PACKAGES_DATABASE = RPM_DATABASE
+
   def install_package(self, name, use_repos=[]):
-    if not self._check_existence(name) or use_repos:
+    self.install_packages([name], use_repos)
+
+  def install_packages(self, names, use_repos=[]):
+    packages_to_install = []
+    for name in names:
+      if not self._check_existence(name) or use_repos:
+        packages_to_install.append(name)
+      else:
+        Logger.info("Skipping installing existent package %s" % (name))
+
+    if packages_to_install:
       cmd = INSTALL_CMD[self.get_logoutput()]
       if use_repos:
         active_base_repos = get_active_base_repos()
@@ -67,11 +80,12 @@ class ZypperProvider(PackageProvider):
           use_repos_options = use_repos_options + ['--repo', repo]
         cmd = cmd + use_repos_options
 
-      cmd = cmd + [name]
-      Logger.info("Installing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
-      shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
-    else:
-      Logger.info("Skipping installing existent package %s" % (name))
+      cmd = cmd + packages_to_install
+      Logger.info("Installing package %s ('%s')" % (", ".join(packages_to_install), string_cmd_from_args_list(cmd)))
+      try:
+        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      finally:
+        self.invalidate_installed_packages()
 
   def upgrade_package(self, name, use_repos=[]):
     return self.install_package(name, use_repos)
@@ -80,16 +94,25 @@ class ZypperProvider(PackageProvider):
     if self._check_existence(name):
       cmd = REMOVE_CMD[self.get_logoutput()] + [name]
       Logger.info("Removing package %s ('%s')" % (name, string_cmd_from_args_list(cmd)))
-      shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      try:
+        shell.checked_call(cmd, sudo=True, logoutput=self.get_logoutput())
+      finally:
+        self.invalidate_installed_packages()
     else:
       Logger.info("Skipping removing non-existent package %s" % (name))
 
+  def get_package_labels(self, line):
+    return get_rpm_labels(line)
+
   def _check_existence(self, name):
-    code, out = shell.call(CHECK_CMD % name)
-    if bool(code):
+    installed_packages = self.get_installed_packages()
+    if not installed_packages.match(name):
       return False
     elif '*' in name or '?' in name:  # Check if all packages matching pattern are installed
-      code1, out1 = shell.call(GET_NOT_INSTALLED_CMD % name)
-      return NO_PACKAGES_FOUND_STATUS in out1.splitlines()
+      # repositories are asked once per pattern until packages change
+      if not name in installed_packages.checks:
+        code1, out1 = shell.call(GET_NOT_INSTALLED_CMD % name)
+        installed_packages.checks[name] = NO_PACKAGES_FOUND_STATUS in out1.splitlines()
+      return installed_packages.checks[name]
     else:
       return True
@@ -40,5 +40,8 @@ class Package(Resource):
   logoutput = ResourceArgument(default=None)
 
   version = ResourceArgument()
+  # packages installed by the install action in one transaction (when the
+  # package manager allows it) instead of package_name
+  packages = ForcedListArgument(default=[])
   actions = ["install", "upgrade", "remove"]
   build_vars = ForcedListArgument(default=[])
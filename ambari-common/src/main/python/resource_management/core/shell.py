@@ -24,6 +24,8 @@ __all__ = ["non_blocking_call", "checked_call", "call", "quote_bash_args", "as_u
 
 import os
 import pty
+import errno
+import collections
 import select
 import sys
 import logging
@@ -41,6 +43,7 @@ from ambari_commons.constants import AMBARI_SUDO_BINARY
 RMF_FOLDER = 'resource_management/'
 EXPORT_PLACEHOLDER = "[RMF_EXPORT_PLACEHOLDER]"
 ENV_PLACEHOLDER = "[RMF_ENV_PLACEHOLDER]"
+READ_SIZE = 64 * 1024
 
 PLACEHOLDERS_TO_STR = {
   EXPORT_PLACEHOLDER: "export {env_str} > /dev/null ; ",
@@ -73,22 +76,24 @@ def log_function_call(function):
 
 @log_function_call
 def checked_call(command, quiet=False, logoutput=None,
-         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None):
+         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None,
+         output_limit=None):
   """
   Execute the shell command and throw an exception on failure.
   @throws Fail
   @return: return_code, output
   """
-  return _call(command, logoutput, True, cwd, env, preexec_fn, user, wait_for_finish, timeout, path, sudo, on_new_line)
+  return _call(command, logoutput, True, cwd, env, preexec_fn, user, wait_for_finish, timeout, path, sudo, on_new_line, output_limit)
 
 @log_function_call
 def call(command, quiet=False, logoutput=None,
-         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None):
+         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None,
+         output_limit=None):
   """
   Execute the shell command despite failures.
   @return: return_code, output
   """
-  return _call(command, logoutput, False, cwd, env, preexec_fn, user, wait_for_finish, timeout, path, sudo, on_new_line)
+  return _call(command, logoutput, False, cwd, env, preexec_fn, user, wait_for_finish, timeout, path, sudo, on_new_line, output_limit)
 
 @log_function_call
 def non_blocking_call(command, quiet=False,
@@ -103,7 +108,8 @@ def non_blocking_call(command, quiet=False,
   return _call(command, False, True, cwd, env, preexec_fn, user, False, timeout, path, sudo, None)
 
 def _call(command, logoutput=None, throw_on_failure=True,
-         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None):
+         cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, path=None, sudo=False, on_new_line=None,
+         output_limit=None):
   """
   Execute shell command
   
@@ -111,6 +117,8 @@ def _call(command, logoutput=None, throw_on_failure=True,
   or string of the command to execute
   @param logoutput: boolean, whether command output should be logged of not
   @param throw_on_failure: if true, when return code is not zero exception is thrown
+  @param on_new_line: function called with every line of the output
+  @param output_limit: if set, only the first and the last output_limit/2 bytes of the output are returned
   """
 
   command_alias = string_cmd_from_args_list(command) if isinstance(command, (list, tuple)) else command
@@ -122,6 +130,9 @@ def _call(command, logoutput=None, throw_on_failure=True,
     path = os.pathsep.join(path) if isinstance(path, (list, tuple)) else path
     env['PATH'] = os.pathsep.join([env['PATH'], path])
 
+  # arguments lists are quoted anyway, so they don't need a shell
+  exec_directly = isinstance(command, (list, tuple)) and not sudo and not user and wait_for_finish
+
   # prepare command cmd
   if sudo:
     command = as_sudo(command, env=env)
@@ -129,21 +140,38 @@ def _call(command, logoutput=None, throw_on_failure=True,
     command = as_user(command, user, env=env)
     
   # convert to string and escape
-  if isinstance(command, (list, tuple)):
+  if isinstance(command, (list, tuple)) and not exec_directly:
     command = string_cmd_from_args_list(command)
     
   # replace placeholder from as_sudo / as_user if present
-  env_str = _get_environment_str(env)
-  for placeholder, replacement in PLACEHOLDERS_TO_STR.iteritems():
-    command = command.replace(placeholder, replacement.format(env_str=env_str))
+  if not exec_directly:
+    env_str = _get_environment_str(env)
+    for placeholder, replacement in PLACEHOLDERS_TO_STR.iteritems():
+      command = command.replace(placeholder, replacement.format(env_str=env_str))
 
   master_fd, slave_fd = pty.openpty()
 
-  # --noprofile is used to preserve PATH set for ambari-agent
-  subprocess_command = ["/bin/bash","--login","--noprofile","-c", command]
-  proc = subprocess.Popen(subprocess_command, bufsize=1, stdout=slave_fd, stderr=subprocess.STDOUT,
-                          cwd=cwd, env=env, shell=False,
-                          preexec_fn=preexec_fn)
+  if exec_directly:
+    subprocess_command = list(command)
+  else:
+    # --noprofile is used to preserve PATH set for ambari-agent
+    subprocess_command = ["/bin/bash","--login","--noprofile","-c", command]
+
+  try:
+    proc = subprocess.Popen(subprocess_command, bufsize=1, stdout=slave_fd, stderr=subprocess.STDOUT,
+                            cwd=cwd, env=env, shell=False,
+                            preexec_fn=preexec_fn)
+  except OSError, err:
+    os.close(slave_fd)
+    os.close(master_fd)
+    if not exec_directly:
+      raise
+    # the same as bash reports for missing or not executable commands
+    code = 127 if err.errno == errno.ENOENT else 126
+    out = "{0}: {1}".format(command[0], err.strerror)
+    if throw_on_failure:
+      raise Fail(Logger.filter_text(("Execution of '%s' returned %d. %s") % (command_alias, code, out)))
+    return code, out
   
   if timeout:
     timeout_event = threading.Event()
@@ -155,35 +183,51 @@ def _call(command, logoutput=None, throw_on_failure=True,
     
   # in case logoutput==False, never log.    
   logoutput = logoutput==True and Logger.logger.isEnabledFor(logging.INFO) or logoutput==None and Logger.logger.isEnabledFor(logging.DEBUG)
-  out = ""
-  read_timeout = .04 # seconds
+  out = OutputBuffer(output_limit)
+  line_buffer = "" # incomplete line for on_new_line
+
+  # the pty is closed when the command exits, unless it has started daemons
+  # which still hold it. Those are not waited for, the waiter thread reports
+  # the exit of the command itself.
+  os.close(slave_fd)
+  exit_read_fd, exit_write_fd = os.pipe()
+  waiter = threading.Thread(target=_wait_for_process, args=(proc, exit_write_fd))
+  waiter.daemon = True
+  waiter.start()
 
   try:
     while True:
-      ready, _, _ = select.select([master_fd], [], [], read_timeout)
-      if ready:
-        line = os.read(master_fd, 512)
-        if not line:
-            break
-          
-        out += line
+      ready, _, _ = _select([master_fd, exit_read_fd])
+      if master_fd in ready:
         try:
-          if on_new_line:
-            on_new_line(line)
-        except Exception, err:
-          err_msg = "Caused by on_new_line function failed with exception for input argument '{0}':\n{1}".format(line, traceback.format_exc())
-          raise Fail(err_msg)
+          chunk = os.read(master_fd, READ_SIZE)
+        except OSError, err:
+          if err.errno != errno.EIO:
+            raise
+          chunk = "" # all ends of the pty are closed
+        if not chunk:
+          break
+          
+        out.append(chunk)
+        if on_new_line:
+          lines = (line_buffer + chunk).split('\n')
+          line_buffer = lines.pop()
+          for line in lines:
+            _on_new_line(on_new_line, line + '\n')
           
         if logoutput:
-          _print(line)    
-      elif proc.poll() is not None:
+          _print(chunk)    
+      elif exit_read_fd in ready:
         break # proc exited
+    if on_new_line and line_buffer:
+      _on_new_line(on_new_line, line_buffer)
   finally:
-    os.close(slave_fd)
     os.close(master_fd)
+    os.close(exit_read_fd)
+
+  waiter.join()
 
-  proc.wait()  
-  out = out.strip('\n')
+  out = out.get_value().strip('\n')
   
   if timeout: 
     if not timeout_event.is_set():
@@ -200,6 +244,71 @@ def _call(command, logoutput=None, throw_on_failure=True,
   
   return code, out
 
+class OutputBuffer(object):
+  """
+  Collects output of a command. When the limit is set, only the beginning
+  and the end of the output are kept, up to limit/2 bytes each.
+  """
+  def __init__(self, limit=None):
+    self.limit = limit
+    self.head = []
+    self.head_size = 0
+    self.tail = collections.deque()
+    self.tail_size = 0
+    self.skipped = 0
+
+  def append(self, chunk):
+    if not self.limit:
+      self.head.append(chunk)
+      return
+    half = self.limit / 2
+    if self.head_size < half:
+      head_chunk = chunk[:half - self.head_size]
+      self.head.append(head_chunk)
+      self.head_size += len(head_chunk)
+      chunk = chunk[len(head_chunk):]
+    if chunk:
+      self.tail.append(chunk)
+      self.tail_size += len(chunk)
+      while self.tail_size > half:
+        excess = self.tail_size - half
+        if len(self.tail[0]) <= excess:
+          removed = len(self.tail.popleft())
+        else:
+          removed = excess
+          self.tail[0] = self.tail[0][excess:]
+        self.tail_size -= removed
+        self.skipped += removed
+
+  def get_value(self):
+    if not self.skipped:
+      return "".join(self.head) + "".join(self.tail)
+    return "{0}\n[{1} bytes of output skipped]\n{2}".format("".join(self.head), self.skipped, "".join(self.tail))
+
+def _select(fds):
+  while True:
+    try:
+      return select.select(fds, [], [])
+    except select.error, err:
+      if err.args[0] != errno.EINTR:
+        raise
+
+def _wait_for_process(proc, exit_write_fd):
+  proc.wait()
+  try:
+    os.write(exit_write_fd, "\0")
+  except OSError:
+    pass # nobody is listening anymore
+  finally:
+    os.close(exit_write_fd)
+
+def _on_new_line(on_new_line, line):
+  try:
+    on_new_line(line)
+  except Exception, err:
+    err_msg = "Caused by on_new_line function failed with exception for input argument '{0}':\n{1}".format(line, traceback.format_exc())
+    raise Fail(err_msg)
+
 def as_sudo(command, env=None, auto_escape=True):
   """
   command - list or tuple of arguments.
@@ -261,7 +370,8 @@ def string_cmd_from_args_list(command, auto_escape=True):
 
 def _on_timeout(proc, timeout_event):
   timeout_event.set()
-  if proc.poll() == None:
+  # the process is reaped by the waiter thread of _call
+  if proc.returncode == None:
     try:
       proc.terminate()
     except:
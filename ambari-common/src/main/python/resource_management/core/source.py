@@ -30,6 +30,9 @@ from resource_management.core import sudo
 __all__ = ["Source", "Template", "InlineTemplate", "StaticFile", "DownloadSource"]
 
 import os
+import sys
+import tempfile
+import threading
 import time
 import urllib2
 import urlparse
@@ -79,6 +82,7 @@ class StaticFile(Source):
 
 try:
   from ambari_jinja2 import Environment as JinjaEnvironment, BaseLoader, TemplateNotFound, FunctionLoader, StrictUndefined
+  from ambari_jinja2.bccache import FileSystemBytecodeCache
 except ImportError:
   class Template(Source):
     def __init__(self, name, variables=None, env=None):
@@ -88,9 +92,77 @@ except ImportError:
     def __init__(self, name, variables=None, env=None):
       raise Exception("Jinja2 required for Template/InlineTemplate")
 else:
+  # compiled templates are shared by all Template/InlineTemplate instances of the process
+  TEMPLATES_CACHE_SIZE = 1000
+  BYTECODE_CACHE_DIR = "templates_bytecode"
+
+  template_environments = {} # (basedir, bytecode dir) -> JinjaEnvironment
+  template_environments_lock = threading.Lock()
+  inline_template_environment = JinjaEnvironment(loader=FunctionLoader(lambda text: text),
+                                                 cache_size=TEMPLATES_CACHE_SIZE)
+
+  def get_template_environment(basedir, tmp_dir=None):
+    """
+    Returns the environment which loads templates of the basedir. Compiled
+    templates are also stored under tmp_dir, so other commands don't have
+    to compile them again.
+    """
+    bytecode_dir = os.path.join(tmp_dir, BYTECODE_CACHE_DIR) if tmp_dir else None
+    key = (basedir, bytecode_dir)
+    with template_environments_lock:
+      if not key in template_environments:
+        template_environments[key] = JinjaEnvironment(loader=TemplateLoader(basedir),
+                                                      autoescape=False, undefined=StrictUndefined, trim_blocks=True,
+                                                      cache_size=TEMPLATES_CACHE_SIZE,
+                                                      bytecode_cache=TemplateBytecodeCache.create(bytecode_dir))
+      return template_environments[key]
+
+  class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """
+    Bytecode of the templates on disk. Jinja rejects the bytecode when the
+    template source has changed.
+    """
+    @staticmethod
+    def create(directory):
+      """
+      Returns None when the directory cannot be used safely
+      """
+      if not directory:
+        return None
+      try:
+        if not os.path.isdir(directory):
+          os.makedirs(directory, 0700)
+        # bytecode gets executed, so nobody else should be able to write there
+        if os.stat(directory).st_uid != os.geteuid():
+          return None
+      except OSError:
+        return None
+      return TemplateBytecodeCache(directory, "template-py%d%d-%%s.cache" % sys.version_info[:2])
+
+    def load_bytecode(self, bucket):
+      try:
+        FileSystemBytecodeCache.load_bytecode(self, bucket)
+      except Exception:
+        # broken file, the template will be compiled again
+        bucket.reset()
+
+    def dump_bytecode(self, bucket):
+      # several commands can compile the same template at the same time
+      try:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+      except (IOError, OSError):
+        return
+      try:
+        with os.fdopen(fd, "wb") as fp:
+          bucket.write_bytecode(fp)
+        os.rename(tmp_path, self._get_cache_filename(bucket))
+      except (IOError, OSError):
+        if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+
   class TemplateLoader(BaseLoader):
-    def __init__(self, env=None):
-      self.env = env or Environment.get_instance()
+    def __init__(self, basedir):
+      self.basedir = basedir
 
     def get_source(self, environment, template_name):
       # absolute path
@@ -98,8 +170,7 @@ else:
         path = template_name
       # relative path
       else:
-        basedir = self.env.config.basedir
-        path = os.path.join(basedir, "templates", template_name)
+        path = os.path.join(self.basedir, "templates", template_name)
       
       if not os.path.exists(path):
         raise TemplateNotFound("%s at %s" % (template_name, path))
@@ -119,8 +190,7 @@ else:
       self.imports_dict = dict((module.__name__, module) for module in extra_imports)
       self.context = variables.copy() if variables else {}
       if not hasattr(self, 'template_env'):
-        self.template_env = JinjaEnvironment(loader=TemplateLoader(self.env),
-                                        autoescape=False, undefined=StrictUndefined, trim_blocks=True)
+        self.template_env = get_template_environment(self.env.config.basedir, self.env.tmp_dir)
         
       self.template = self.template_env.get_template(self.name)     
     
@@ -134,7 +204,7 @@ else:
     
   class InlineTemplate(Template):
     def __init__(self, name, extra_imports=[], **kwargs):
-      self.template_env = JinjaEnvironment(loader=FunctionLoader(lambda text: text))
+      self.template_env = inline_template_environment
       super(InlineTemplate, self).__init__(name, extra_imports, **kwargs) 
   
     def __repr__(self):
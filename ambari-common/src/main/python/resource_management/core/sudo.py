@@ -19,12 +19,116 @@ Ambari Agent
 
 """
 
+import atexit
+import json
 import os
+import select
+import subprocess
+import sys
 import tempfile
+import threading
 from resource_management.core import shell
+from resource_management.core import sudo_helper
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from ambari_commons.constants import AMBARI_SUDO_BINARY
+
+class PrivilegedHelper(object):
+  """
+  Executes the file operations of this module as root in a single
+  long-lived sudo_helper.py process, instead of spawning sudo and bash for
+  every call. The helper is started on first use and is spoken to over a pipe.
+
+  When the script already runs as root the operations are executed in
+  process. When the helper cannot be started (e.g. sudoers does not allow
+  the python interpreter) every operation falls back to a separate sudo call.
+  """
+  HELPER_SCRIPT = os.path.splitext(os.path.abspath(sudo_helper.__file__))[0] + ".py"
+  STARTUP_TIMEOUT = 10 # seconds
+
+  def __init__(self):
+    self.lock = threading.RLock()
+    self.process = None
+    self.pid = None # helper belongs to the process which has started it
+    self.disabled = False
+
+  def helper_command(self):
+    # -n: fail instead of waiting for a password
+    return [AMBARI_SUDO_BINARY, "-n", "-H", sys.executable, self.HELPER_SCRIPT]
+
+  def is_available(self):
+    if os.geteuid() == 0:
+      return True
+    with self.lock:
+      if self.disabled:
+        return False
+      if self.process is None or self.pid != os.getpid() or self.process.poll() is not None:
+        self.start()
+      return not self.disabled
+
+  def start(self):
+    self.pid = os.getpid()
+    try:
+      self.process = subprocess.Popen(self.helper_command(), stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, close_fds=True)
+      ready, _, _ = select.select([self.process.stdout], [], [], self.STARTUP_TIMEOUT)
+      response = self.process.stdout.readline() if ready else None
+      if response and json.loads(response).get('ready'):
+        return
+    except Exception, err:
+      Logger.info("Cannot start privileged helper: {0}".format(str(err)))
+    Logger.info("Privileged helper is not available, file operations will be run via sudo")
+    self.disabled = True
+    if self.process is not None and self.process.poll() is None:
+      self.process.kill()
+    self.stop()
+
+  def execute(self, operation, *args):
+    """
+    Returns the result of the operation
+    @throws Fail
+    """
+    if os.geteuid() == 0:
+      try:
+        return sudo_helper.OPERATIONS[operation](*args)
+      except Exception, err:
+        raise Fail("{0} of {1} failed: {2}".format(operation, args[0], str(err)))
+
+    request = json.dumps({'operation': operation, 'args': sudo_helper.encode(args)})
+    with self.lock:
+      try:
+        self.process.stdin.write(request + '\n')
+        self.process.stdin.flush()
+        response = self.process.stdout.readline()
+      except IOError:
+        response = None
+      if not response:
+        self.stop()
+        raise Fail("Privileged helper has exited during {0} of {1}".format(operation, args[0]))
+
+    response = json.loads(response)
+    if 'error' in response:
+      raise Fail("{0} of {1} failed: {2}".format(operation, args[0], response['error']))
+    return sudo_helper.decode(response['result'])
+
+  def stop(self):
+    with self.lock:
+      if self.process is not None and self.pid == os.getpid():
+        try:
+          # helper exits as soon as the pipe is closed
+          self.process.stdin.close()
+          self.process.wait()
+        except Exception:
+          pass
+      self.process = None
+
+_helper = PrivilegedHelper()
+atexit.register(_helper.stop)
 
 # os.chown replacement
 def chown(path, owner, group):
+  if _helper.is_available():
+    return _helper.execute('chown', path, owner, group)
   if owner:
     shell.checked_call(["chown", owner, path], sudo=True)
   if group:
@@ -32,35 +136,51 @@ def chown(path, owner, group):
     
 # os.chmod replacement
 def chmod(path, mode):
+  if _helper.is_available():
+    return _helper.execute('chmod', path, mode)
   shell.checked_call(["chmod", oct(mode), path], sudo=True)
   
 def chmod_extended(path, mode):
+  if _helper.is_available():
+    return _helper.execute('chmod_extended', path, mode)
   shell.checked_call(["chmod", mode, path], sudo=True)
   
 # os.makedirs replacement
 def makedirs(path, mode):
+  if _helper.is_available():
+    return _helper.execute('makedirs', path, mode)
   shell.checked_call(["mkdir", "-p", path], sudo=True)
   chmod(path, mode)
   
 # os.makedir replacement
 def makedir(path, mode):
+  if _helper.is_available():
+    return _helper.execute('makedir', path, mode)
   shell.checked_call(["mkdir", path], sudo=True)
   chmod(path, mode)
   
 # os.symlink replacement
 def symlink(source, link_name):
+  if _helper.is_available():
+    return _helper.execute('symlink', source, link_name)
   shell.checked_call(["ln","-sf", source, link_name], sudo=True)
   
 # os.link replacement
 def link(source, link_name):
+  if _helper.is_available():
+    return _helper.execute('link', source, link_name)
   shell.checked_call(["ln", "-f", source, link_name], sudo=True)
   
 # os unlink
 def unlink(path):
+  if _helper.is_available():
+    return _helper.execute('unlink', path)
   shell.checked_call(["rm","-f", path], sudo=True)
   
 # shutil.rmtree
 def rmtree(path):
+  if _helper.is_available():
+    return _helper.execute('rmtree', path)
   shell.checked_call(["rm","-rf", path], sudo=True)
   
 # fp.write replacement
@@ -68,6 +188,9 @@ def create_file(filename, content):
   """
   if content is None, create empty file
   """
+  if _helper.is_available():
+    return _helper.execute('create_file', filename, content)
+
   tmpf = tempfile.NamedTemporaryFile()
   
   if content:
@@ -82,6 +205,9 @@ def create_file(filename, content):
     
 # fp.read replacement
 def read_file(filename):
+  if _helper.is_available():
+    return _helper.execute('read_file', filename)
+
   tmpf = tempfile.NamedTemporaryFile()
   shell.checked_call(["cp", "-f", filename, tmpf.name], sudo=True)
   
@@ -91,20 +217,29 @@ def read_file(filename):
     
 # os.path.exists
 def path_exists(path):
+  if _helper.is_available():
+    return _helper.execute('path_exists', path)
   return (shell.call(["test", "-e", path], sudo=True)[0] == 0)
 
 # os.path.isdir
 def path_isdir(path):
+  if _helper.is_available():
+    return _helper.execute('path_isdir', path)
   return (shell.call(["test", "-d", path], sudo=True)[0] == 0)
 
 # os.path.lexists
 def path_lexists(path):
+  if _helper.is_available():
+    return _helper.execute('path_lexists', path)
   return (shell.call(["test", "-L", path], sudo=True)[0] == 0)
 
 # os.stat
 def stat(path):
   class Stat:
     def __init__(self, path):
+      if _helper.is_available():
+        self.st_uid, self.st_gid, self.st_mode = _helper.execute('stat', path)
+        return
       # TODO: check this on Ubuntu
       out = shell.checked_call(["stat", "-c", "%u %g %a", path], sudo=True)[1]
       uid_str, gid_str, mode_str = out.split(' ')
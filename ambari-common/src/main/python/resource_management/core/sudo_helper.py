@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+"""
+Privileged side of resource_management.core.sudo. Started once per script
+run as 'ambari-sudo.sh python sudo_helper.py', then executes file operations
+on behalf of the script.
+
+Requests and responses are json documents, one per line:
+  stdout: {"ready": true} once, when the helper has started
+  stdin:  {"operation": ..., "args": [...]}
+  stdout: {"result": ...} or {"error": ...}
+Strings are passed as {"b64": ...}, so file content and paths in any
+encoding survive the trip.
+
+Only the standard library is used here, the helper does not depend on
+PYTHONPATH of the script.
+"""
+
+import base64
+import grp
+import json
+import os
+import pwd
+import shutil
+import stat as stat_module
+import subprocess
+import sys
+
+# os.chown replacement
+def chown(path, owner, group):
+  uid = _get_id(owner, pwd.getpwnam, 'user') if owner else -1
+  gid = _get_id(group, grp.getgrnam, 'group') if group else -1
+  os.chown(path, uid, gid)
+
+def chmod(path, mode):
+  os.chmod(path, mode)
+
+def chmod_extended(path, mode):
+  # symbolic modes like 'a+rx'
+  subprocess.check_call(["chmod", mode, path])
+
+def makedirs(path, mode):
+  # mkdir -p
+  if not os.path.isdir(path):
+    try:
+      os.makedirs(path)
+    except OSError:
+      # created concurrently
+      if not os.path.isdir(path):
+        raise
+  os.chmod(path, mode)
+
+def makedir(path, mode):
+  os.mkdir(path)
+  os.chmod(path, mode)
+
+def symlink(source, link_name):
+  # ln -sf
+  link_name = _get_link_name(source, link_name)
+  if os.path.lexists(link_name):
+    os.unlink(link_name)
+  os.symlink(source, link_name)
+
+def link(source, link_name):
+  # ln -f
+  link_name = _get_link_name(source, link_name)
+  if os.path.lexists(link_name):
+    os.unlink(link_name)
+  os.link(source, link_name)
+
+def unlink(path):
+  # rm -f
+  if os.path.lexists(path):
+    os.unlink(path)
+
+def rmtree(path):
+  # rm -rf
+  if os.path.islink(path) or os.path.isfile(path):
+    os.unlink(path)
+  elif os.path.isdir(path):
+    shutil.rmtree(path)
+
+def create_file(filename, content):
+  with open(filename, "wb") as fp:
+    if content:
+      fp.write(content)
+  # set default files mode
+  os.chmod(filename, 0644)
+
+def read_file(filename):
+  with open(filename, "rb") as fp:
+    return fp.read()
+
+def path_exists(path):
+  return os.path.exists(path)
+
+def path_isdir(path):
+  return os.path.isdir(path)
+
+def path_lexists(path):
+  # test -L
+  return os.path.islink(path)
+
+def stat(path):
+  """
+  Returns (uid, gid, permission bits)
+  """
+  st = os.stat(path)
+  return st.st_uid, st.st_gid, stat_module.S_IMODE(st.st_mode)
+
+OPERATIONS = dict((function.__name__, function) for function in [
+  chown, chmod, chmod_extended, makedirs, makedir, symlink, link, unlink,
+  rmtree, create_file, read_file, path_exists, path_isdir, path_lexists, stat
+])
+
+def _get_id(name, lookup, kind):
+  if isinstance(name, (int, long)):
+    return name
+  try:
+    return getattr(lookup(name), 'pw_uid' if kind == 'user' else 'gr_gid')
+  except KeyError:
+    if name.isdigit():
+      return int(name)
+    raise OSError("Unknown {0} '{1}'".format(kind, name))
+
+def _get_link_name(source, link_name):
+  # ln creates the link inside of an existing directory
+  if os.path.isdir(link_name):
+    return os.path.join(link_name, os.path.basename(source))
+  return link_name
+
+def encode(value):
+  if isinstance(value, unicode):
+    value = value.encode('utf-8')
+  if isinstance(value, str):
+    return {'b64': base64.b64encode(value)}
+  if isinstance(value, (list, tuple)):
+    return [encode(item) for item in value]
+  return value
+
+def decode(value):
+  if isinstance(value, dict):
+    return base64.b64decode(value['b64'])
+  if isinstance(value, list):
+    return [decode(item) for item in value]
+  return value
+
+def execute(request):
+  try:
+    function = OPERATIONS[request['operation']]
+    return {'result': encode(function(*decode(request['args'])))}
+  except Exception, err:
+    return {'error': "{0}: {1}".format(err.__class__.__name__, str(err))}
+
+def main():
+  # stdin and stdout are used for communication with the script
+  requests = os.fdopen(os.dup(0), 'r')
+  responses = os.fdopen(os.dup(1), 'w')
+  devnull = os.open(os.devnull, os.O_RDWR)
+  os.dup2(devnull, 0)
+  os.dup2(devnull, 1)
+  os.close(devnull)
+
+  responses.write(json.dumps({'ready': True}) + '\n')
+  responses.flush()
+  while True:
+    line = requests.readline()
+    if not line:
+      break # script has finished
+    responses.write(json.dumps(execute(json.loads(line))) + '\n')
+    responses.flush()
+
+if __name__ == '__main__':
+  main()
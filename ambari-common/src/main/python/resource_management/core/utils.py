@@ -96,11 +96,18 @@ class AttributeDictionary(object):
   def __setstate__(self, state):
     super(AttributeDictionary, self).__setattr__("_dict", state)
     
-def checked_unite(dict1, dict2):
+def check_unique(dict1, dict2):
+  """
+  Fails if a key of dict1 has another value in dict2, so it is not important
+  in which order the dictionaries are looked up
+  """
   for key in dict1:
     if key in dict2:
       if not dict2[key] is dict1[key]: # it's not a big deal if this is the same variable
         raise Fail("Variable '%s' already exists more than once as a variable/configuration/kwarg parameter. Cannot evaluate it." % key)
+
+def checked_unite(dict1, dict2):
+  check_unique(dict1, dict2)
   
   result = dict1.copy()
   result.update(dict2)
@@ -25,6 +25,7 @@ import re
 import tempfile
 from resource_management.libraries.functions.default import default
 from resource_management.libraries.functions.format import format
+from resource_management.libraries.functions.webhdfs import get_webhdfs, WebHDFSUnavailable
 from resource_management.libraries.resources.copy_from_local import CopyFromLocal
 from resource_management.libraries.resources.execute_hadoop import ExecuteHadoop
 from resource_management.core.resources.system import Execute
@@ -182,17 +183,25 @@ def copy_tarballs_to_hdfs(tarball_prefix, hdp_select_component_name, component_u
             path='/bin'
     )
 
-  does_hdfs_file_exist = False
-  try:
-    ExecuteHadoop(does_hdfs_file_exist_cmd,
-                  user=component_user,
-                  logoutput=True,
-                  conf_dir=params.hadoop_conf_dir,
-                  bin_dir=params.hadoop_bin_dir
-    )
-    does_hdfs_file_exist = True
-  except Fail:
-    pass
+  does_hdfs_file_exist = None
+  webhdfs = get_webhdfs(params.hadoop_conf_dir, component_user, params.security_enabled)
+  if webhdfs:
+    try:
+      does_hdfs_file_exist = webhdfs.get_file_status(destination_file) is not None
+    except WebHDFSUnavailable, err:
+      Logger.info("Using hadoop CLI, WebHDFS is not available: %s" % str(err))
+  if does_hdfs_file_exist is None:
+    does_hdfs_file_exist = False
+    try:
+      ExecuteHadoop(does_hdfs_file_exist_cmd,
+                    user=component_user,
+                    logoutput=True,
+                    conf_dir=params.hadoop_conf_dir,
+                    bin_dir=params.hadoop_bin_dir
+      )
+      does_hdfs_file_exist = True
+    except Fail:
+      pass
 
   if not does_hdfs_file_exist:
     source_and_dest_pairs = [(component_tar_source_file, destination_file), ]
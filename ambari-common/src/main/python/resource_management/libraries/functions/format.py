@@ -24,11 +24,29 @@ __all__ = ["format"]
 import sys
 from string import Formatter
 from resource_management.core.exceptions import Fail
-from resource_management.core.utils import checked_unite
+from resource_management.core.utils import checked_unite, check_unique
 from resource_management.core.environment import Environment
 from resource_management.core.logger import Logger
 from resource_management.core.shell import quote_bash_args
 
+PARSED_FORMATS_MAX_SIZE = 10000
+# format string -> [(literal_text, field_name, format_spec, conversion)]
+parsed_formats = {}
+
+
+class FormatVariables(object):
+  """
+  Looks up the names in the dictionaries without merging them
+  """
+  def __init__(self, *dictionaries):
+    self.dictionaries = dictionaries
+
+  def __getitem__(self, name):
+    for dictionary in self.dictionaries:
+      if name in dictionary:
+        return dictionary[name]
+    raise KeyError(name)
+
 
 class ConfigurationFormatter(Formatter):
   """
@@ -41,28 +59,55 @@ class ConfigurationFormatter(Formatter):
     env = Environment.get_instance()
     variables = kwargs
     params = env.config.params
-    all_params = checked_unite(variables, params)
+    check_unique(variables, params)
+    all_params = FormatVariables(variables, params)
     
-    self.convert_field = self.convert_field_protected
-    result_protected = self.vformat(format_string, args, all_params)
-    
-    self.convert_field = self.convert_field_unprotected
-    result_unprotected = self.vformat(format_string, args, all_params)
+    result_unprotected, result_protected = self._vformat_both(format_string, args, all_params, 2)
     
     if result_protected != result_unprotected:
-      Logger.sensitive_strings[result_unprotected] = result_protected
+      Logger.add_sensitive_string(result_unprotected, result_protected)
       
     return result_unprotected
-  
-  def convert_field_unprotected(self, value, conversion):
-    return self._convert_field(value, conversion, False)
-  
-  def convert_field_protected(self, value, conversion):
+
+  def _vformat_both(self, format_string, args, kwargs, recursion_depth):
     """
-    Enable masking sensitive information like
-    passwords from logs via !p (password) format flag.
+    Renders the unprotected and the protected (!h, !p values are hidden)
+    results in one pass over the parsed format string
     """
-    return self._convert_field(value, conversion, True)
+    if recursion_depth < 0:
+      raise ValueError('Max string recursion exceeded')
+
+    unprotected = []
+    protected = []
+    for literal_text, field_name, format_spec, conversion in self._parse(format_string):
+      if literal_text:
+        unprotected.append(literal_text)
+        protected.append(literal_text)
+      if field_name is None:
+        continue
+
+      obj, _ = self.get_field(field_name, args, kwargs)
+      spec_unprotected = spec_protected = format_spec
+      if '{' in format_spec:
+        spec_unprotected, spec_protected = self._vformat_both(format_spec, args, kwargs, recursion_depth-1)
+
+      text = self.format_field(self._convert_field(obj, conversion, False), spec_unprotected)
+      unprotected.append(text)
+      if conversion in ('h', 'p') or spec_protected != spec_unprotected:
+        text = self.format_field(self._convert_field(obj, conversion, True), spec_protected)
+      protected.append(text)
+
+    return ''.join(unprotected), ''.join(protected)
+
+  def _parse(self, format_string):
+    try:
+      return parsed_formats[format_string]
+    except KeyError:
+      tokens = list(self.parse(format_string))
+      if len(parsed_formats) >= PARSED_FORMATS_MAX_SIZE:
+        parsed_formats.clear()
+      parsed_formats[format_string] = tokens
+      return tokens
   
   def _convert_field(self, value, conversion, is_protected):
     if conversion == 'e':
@@ -18,6 +18,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import os
 import sys
 import logging
 import subprocess
@@ -29,8 +30,11 @@ from ambari_commons import shell
 __all__ = ["installedPkgsByName", "allInstalledPackages", "allAvailablePackages", "nameMatch",
            "getInstalledRepos", "getInstalledPkgsByRepo", "getInstalledPkgsByNames", "getPackageDetails"]
 
-LIST_INSTALLED_PACKAGES_UBUNTU = "for i in $(dpkg -l |grep ^ii |awk -F' ' '{print $2}'); do      apt-cache showpkg \"$i\"|head -3|grep -v '^Versions'| tr -d '()' | awk '{ print $1\" \"$2 }'|sed -e 's/^Package: //;' | paste -d ' ' - -;  done"
-LIST_AVAILABLE_PACKAGES_UBUNTU = "packages=`for  i in $(ls -1 /var/lib/apt/lists  | grep -v \"ubuntu.com\") ; do grep ^Package: /var/lib/apt/lists/$i |  awk '{print $2}' ; done` ; for i in $packages; do      apt-cache showpkg \"$i\"|head -3|grep -v '^Versions'| tr -d '()' | awk '{ print $1\" \"$2 }'|sed -e 's/^Package: //;' | paste -d ' ' - -;  done"
+LIST_INSTALLED_PACKAGES_UBUNTU = ["dpkg-query", "--show", "--showformat=${Package}\t${Version}\t${Status}\n"]
+# package indexes of the repositories, the same files apt-cache reads
+APT_LISTS_DIR = "/var/lib/apt/lists"
+# reported as the repository of installed packages no repository provides
+DPKG_STATUS_FILE = "/var/lib/dpkg/status"
 
 logger = logging.getLogger()
 
@@ -99,7 +103,7 @@ def allInstalledPackages(allInstalledPackages):
       'Installed Packages',
       allInstalledPackages)
   elif osType == OSConst.UBUNTU_FAMILY:
-     return _lookUpAptPackages(
+     return _lookUpInstalledAptPackages(
       LIST_INSTALLED_PACKAGES_UBUNTU,
       allInstalledPackages)
 
@@ -117,23 +121,58 @@ def allAvailablePackages(allAvailablePackages):
       'Available Packages',
       allAvailablePackages)
   elif osType == OSConst.UBUNTU_FAMILY:
-     return _lookUpAptPackages(
-      LIST_AVAILABLE_PACKAGES_UBUNTU,
-      allAvailablePackages)
+     return _lookUpAvailableAptPackages(allAvailablePackages)
 
 
-def _lookUpAptPackages(command, allPackages):
+def _lookUpInstalledAptPackages(command, allPackages):
   try:
     result = subprocessWithTimeout(command)
     if 0 == result['retCode']:
-      for x in result['out'].split('\n'):
-        if x.strip():
-          allPackages.append(x.split(' '))
+      repos = {}
+      for name, version, repo in _readAptLists(_getAptLists()):
+        repos.setdefault((name, version), repo)
+
+      for line in result['out'].split('\n'):
+        items = line.strip().split('\t')
+        if len(items) == 3 and items[2] == 'install ok installed':
+          name, version = items[0], items[1]
+          allPackages.append([name, version, repos.get((name, version), DPKG_STATUS_FILE)])
+  except:
+    logger.error("Unexpected error:", sys.exc_info()[0])
+
 
+def _lookUpAvailableAptPackages(allPackages):
+  try:
+    lists = [fileName for fileName in _getAptLists() if not "ubuntu.com" in fileName]
+    for name, version, repo in _readAptLists(lists):
+      allPackages.append([name, version, repo])
   except:
     logger.error("Unexpected error:", sys.exc_info()[0])
 
 
+def _getAptLists():
+  if not os.path.isdir(APT_LISTS_DIR):
+    return []
+  return sorted(fileName for fileName in os.listdir(APT_LISTS_DIR) if fileName.endswith("_Packages"))
+
+
+def _readAptLists(fileNames):
+  """
+  Yields (name, version, list file) for every package of the repository
+  package lists
+  """
+  for fileName in fileNames:
+    path = os.path.join(APT_LISTS_DIR, fileName)
+    name = None
+    with open(path) as listFile:
+      for line in listFile:
+        if line.startswith("Package:"):
+          name = line[8:].strip()
+        elif line.startswith("Version:") and name:
+          yield name, line[8:].strip(), path
+          name = None
+
+
 def _lookUpYumPackages(command, skipTill, allPackages):
   try:
     result = subprocessWithTimeout(command)
@@ -147,10 +186,12 @@ def _lookUpYumPackages(command, skipTill, allPackages):
           skipIndex = index + 1
           break
 
+      # a record can be wrapped to several lines, so lines are joined into
+      # one stream of tokens
       for line in lines[skipIndex:]:
-        items = items + line.strip(' \t\n\r').split()
+        items.extend(line.strip(' \t\n\r').split())
 
-      for i in range(0, len(items), 3):
+      for i in range(0, len(items) - 2, 3):
         if items[i + 2].find('@') == 0:
           items[i + 2] = items[i + 2][1:]
         allPackages.append(items[i:i + 3])
@@ -164,7 +205,7 @@ def _lookUpZypperPackages(command, allPackages):
     if 0 == result['retCode']:
       lines = result['out'].split('\n')
       lines = [line.strip() for line in lines]
-      items = []
+      skipIndex = len(lines)
       for index in range(len(lines)):
         if "--+--" in lines[index]:
           skipIndex = index + 1
@@ -172,7 +213,8 @@ def _lookUpZypperPackages(command, allPackages):
 
       for line in lines[skipIndex:]:
         items = line.strip(' \t\n\r').split('|')
-        allPackages.append([items[1].strip(), items[3].strip(), items[5].strip()])
+        if len(items) >= 6:
+          allPackages.append([items[1].strip(), items[3].strip(), items[5].strip()])
   except:
     logger.error("Unexpected error:", sys.exc_info()[0])
 
@@ -215,15 +257,9 @@ def getInstalledPkgsByRepo(repos, ignorePackages, installedPackages):
   """
   Get all the installed packages from the repos listed in repos
   """
-  packagesFromRepo = []
+  repos = set(repos)
+  packagesFromRepo = set(item[0] for item in installedPackages if item[2] in repos)
   packagesToRemove = []
-  for repo in repos:
-    subResult = []
-    for item in installedPackages:
-      if repo == item[2]:
-        subResult.append(item[0])
-    packagesFromRepo = list(set(packagesFromRepo + subResult))
-
   for package in packagesFromRepo:
     keepPackage = True
     for ignorePackage in ignorePackages:
@@ -239,26 +275,30 @@ def getInstalledPkgsByNames(pkgNames, installedPackages):
   """
   Gets all installed packages that start with names in pkgNames
   """
-  packages = []
+  packages = set()
   for pkgName in pkgNames:
     subResult = []
     installedPkgsByName(installedPackages, pkgName, subResult)
-    packages = list(set(packages + subResult))
-  return packages
+    packages.update(subResult)
+  return list(packages)
 
 
 def getPackageDetails(installedPackages, foundPackages):
   """
   Gets the name, version, and repoName for the packages
   """
+  packagesByName = {}
+  for installedPackage in installedPackages:
+    packagesByName[installedPackage[0]] = installedPackage
+
   packageDetails = []
   for package in foundPackages:
     pkgDetail = {}
-    for installedPackage in installedPackages:
-      if package == installedPackage[0]:
-        pkgDetail['name'] = installedPackage[0]
-        pkgDetail['version'] = installedPackage[1]
-        pkgDetail['repoName'] = installedPackage[2]
+    if package in packagesByName:
+      installedPackage = packagesByName[package]
+      pkgDetail['name'] = installedPackage[0]
+      pkgDetail['version'] = installedPackage[1]
+      pkgDetail['repoName'] = installedPackage[2]
     packageDetails.append(pkgDetail)
   return packageDetails
 
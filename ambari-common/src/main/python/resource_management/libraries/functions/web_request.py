@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+__all__ = ["make_web_request", "is_spnego_supported", "get_negotiate_header", "KerberosTicketManager",
+           "ticket_manager"]
+
+import httplib
+import os
+import socket
+import subprocess
+import threading
+import time
+import urlparse
+
+from resource_management.core.exceptions import Fail
+from resource_management.libraries.functions.get_kinit_path import get_kinit_path
+
+try:
+  import kerberos # SPNEGO authentication, optional
+except ImportError:
+  kerberos = None
+
+CONNECTION_TIMEOUT = 20
+MAX_REDIRECTS = 5
+MAX_IDLE_CONNECTIONS = 2 # per (scheme, host, port)
+REDIRECT_STATUSES = (301, 302, 303, 307)
+# tickets are requested for a short time, so regenerated keytabs are picked up soon
+TICKET_LIFETIME = 5 * 60
+TICKET_RENEW_MARGIN = 30
+
+# (scheme, host, port) -> idle keep-alive connections
+idle_connections = {}
+# (scheme, host, port) -> hadoop.auth cookie, saves SPNEGO negotiation
+auth_cookies = {}
+connections_lock = threading.Lock()
+# KRB5CCNAME is process wide, so tokens are generated one at a time
+kerberos_lock = threading.Lock()
+
+
+class KerberosTicketManager(object):
+  """
+  Keeps the tickets of principals in ccache files. Expiration times are
+  tracked in memory, so kinit is executed only when a ticket is missing or
+  about to expire, and klist is never needed.
+  """
+
+  def __init__(self):
+    self.expirations = {} # ccache path -> time the ticket expires
+    self.lock = threading.Lock()
+
+  def kinit(self, ccache_path, principal, keytab):
+    with self.lock:
+      if time.time() < self.expirations.get(ccache_path, 0) - TICKET_RENEW_MARGIN \
+          and os.path.exists(ccache_path):
+        return
+
+      start_time = time.time()
+      command = [get_kinit_path(), '-l', '{0}s'.format(TICKET_LIFETIME), '-c', ccache_path,
+                 '-kt', keytab, principal]
+      process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+      out, _ = process.communicate()
+      if process.returncode != 0:
+        self.expirations.pop(ccache_path, None)
+        raise Fail("Unable to kinit as {0} using {1}: {2}".format(principal, keytab, out.strip()))
+      self.expirations[ccache_path] = start_time + TICKET_LIFETIME
+
+# shared by all the alerts of the agent
+ticket_manager = KerberosTicketManager()
+
+
+def is_spnego_supported():
+  return kerberos is not None
+
+
+def get_negotiate_header(host, ccache_path=None):
+  """
+  @return: value of Authorization header for the HTTP service of the host
+  """
+  with kerberos_lock:
+    saved_ccache_path = os.environ.get('KRB5CCNAME')
+    if ccache_path:
+      os.environ['KRB5CCNAME'] = ccache_path
+    try:
+      _, context = kerberos.authGSSClientInit("HTTP@" + host)
+      kerberos.authGSSClientStep(context, "")
+      token = kerberos.authGSSClientResponse(context)
+    finally:
+      if saved_ccache_path is None:
+        os.environ.pop('KRB5CCNAME', None)
+      else:
+        os.environ['KRB5CCNAME'] = saved_ccache_path
+  return 'Negotiate ' + token
+
+
+def make_web_request(url, ccache_path=None, timeout=CONNECTION_TIMEOUT):
+  """
+  Makes a GET request, redirects are followed and SPNEGO is negotiated when
+  the server asks for it. Connections are kept alive and reused by the next
+  requests to the same server.
+
+  @param ccache_path: credentials cache for SPNEGO, None if the server is not secured
+  @return: (status code, body)
+  @raise: socket.error, httplib.HTTPException if the request failed
+  """
+  if ccache_path and not is_spnego_supported():
+    return _make_curl_request(url, ccache_path, timeout)
+
+  for redirect in range(MAX_REDIRECTS + 1):
+    parsed_url = urlparse.urlparse(url)
+    key = (parsed_url.scheme, parsed_url.hostname,
+           parsed_url.port or (443 if parsed_url.scheme == 'https' else 80))
+    path = (parsed_url.path or '/') + ('?' + parsed_url.query if parsed_url.query else '')
+
+    headers = {}
+    if key in auth_cookies:
+      headers['Cookie'] = auth_cookies[key]
+    response, body = _send(key, path, headers, timeout)
+
+    if response.status == 401 and ccache_path and \
+        'negotiate' in (response.getheader('www-authenticate') or '').lower():
+      headers = {'Authorization': get_negotiate_header(parsed_url.hostname, ccache_path)}
+      response, body = _send(key, path, headers, timeout)
+
+    cookie = response.getheader('set-cookie')
+    if cookie and cookie.startswith('hadoop.auth='):
+      auth_cookies[key] = cookie.split(';')[0]
+
+    location = response.getheader('location')
+    if not response.status in REDIRECT_STATUSES or not location:
+      break
+    url = urlparse.urljoin(url, location)
+
+  return response.status, body
+
+
+def _send(key, path, headers, timeout):
+  connection, reused = _get_connection(key, timeout)
+  while True:
+    try:
+      connection.request('GET', path, headers=headers)
+      response = connection.getresponse()
+      body = response.read()
+    except (httplib.HTTPException, socket.error):
+      connection.close()
+      if not reused:
+        raise
+      # keep-alive connection has been closed by the server, which has likely
+      # closed the other idle ones too, so the request goes over a new one
+      _drop_idle_connections(key)
+      connection, reused = _create_connection(key, timeout), False
+      continue
+
+    if response.will_close:
+      connection.close()
+    else:
+      _release_connection(key, connection)
+    return response, body
+
+
+def _get_connection(key, timeout):
+  """
+  @return: (connection, whether it has been used before)
+  """
+  with connections_lock:
+    connections = idle_connections.get(key)
+    if connections:
+      return connections.pop(), True
+  return _create_connection(key, timeout), False
+
+
+def _create_connection(key, timeout):
+  scheme, host, port = key
+  if scheme == 'https':
+    return httplib.HTTPSConnection(host, port, timeout=timeout)
+  return httplib.HTTPConnection(host, port, timeout=timeout)
+
+
+def _drop_idle_connections(key):
+  with connections_lock:
+    connections = idle_connections.pop(key, [])
+  for connection in connections:
+    connection.close()
+
+
+def _release_connection(key, connection):
+  with connections_lock:
+    connections = idle_connections.setdefault(key, [])
+    if len(connections) < MAX_IDLE_CONNECTIONS:
+      connections.append(connection)
+      return
+  connection.close()
+
+
+def _make_curl_request(url, ccache_path, timeout):
+  """
+  Used when python kerberos module is not available
+  """
+  curl = subprocess.Popen(['curl', '--negotiate', '-u', ':', '-sL', '-w', '\n%{http_code}', url,
+                           '--connect-timeout', str(timeout)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          env=dict(os.environ, KRB5CCNAME=ccache_path))
+  out, err = curl.communicate()
+  if err != '':
+    raise Fail(err)
+
+  body, _, status_code = out.rpartition('\n')
+  if int(status_code) == 0:
+    raise socket.error("Unable to connect to {0}".format(url))
+  return int(status_code), body
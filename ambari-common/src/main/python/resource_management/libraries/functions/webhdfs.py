@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+__all__ = ["get_webhdfs", "WebHDFS", "WebHDFSUnavailable"]
+
+import httplib
+import json
+import os
+import pwd
+import socket
+import ssl
+import threading
+import urllib
+import urlparse
+
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from resource_management.libraries.functions.security_commons import get_params_from_filesystem, FILE_TYPE_XML
+from resource_management.libraries.functions.web_request import is_spnego_supported, get_negotiate_header
+
+WEBHDFS_PREFIX = "/webhdfs/v1"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CONNECTION_TIMEOUT = 60
+KERBEROS_TICKET_CACHE = "FILE:/tmp/krb5cc_{0}"
+# NameNode can not be reached, ssl.CertificateError is raised on hostname mismatch
+TRANSPORT_ERRORS = (httplib.HTTPException, socket.error) + \
+                   ((ssl.CertificateError,) if hasattr(ssl, 'CertificateError') else ())
+
+# (conf dir, user, security enabled, verify certificates) -> WebHDFS or None
+clients = {}
+clients_lock = threading.Lock()
+
+
+def get_webhdfs(conf_dir, user, security_enabled=False, verify_certificates=True):
+  """
+  Returns a client for the NameNode(s) configured in conf_dir, which acts as
+  the user. None is returned when the hadoop CLI has to be used instead:
+  WebHDFS is disabled, the configuration is not available or kerberos
+  module is missing on a secured cluster.
+
+  Certificates of HTTPS_ONLY NameNodes are verified unless
+  verify_certificates is False.
+
+  Clients are shared by all the resources of the script, so the connection
+  to the NameNode is reused. A client which has failed to reach the
+  NameNodes is not returned anymore.
+  """
+  key = (conf_dir, user, bool(security_enabled), bool(verify_certificates))
+  with clients_lock:
+    if not key in clients:
+      clients[key] = _create_webhdfs(conf_dir, user, security_enabled, verify_certificates)
+    client = clients[key]
+  if client is None or not client.available:
+    return None
+  return client
+
+
+def _create_webhdfs(conf_dir, user, security_enabled, verify_certificates):
+  try:
+    configs = get_params_from_filesystem(conf_dir, {'hdfs-site.xml': FILE_TYPE_XML,
+                                                    'core-site.xml': FILE_TYPE_XML})
+  except Exception, err:
+    Logger.info("WebHDFS is not used, unable to read configuration from {0}: {1}".format(conf_dir, str(err)))
+    return None
+  hdfs_site, core_site = configs['hdfs-site'], configs['core-site']
+
+  if str(hdfs_site.get('dfs.webhdfs.enabled', 'true')).lower() != 'true':
+    return None
+  if security_enabled and not is_spnego_supported():
+    Logger.info("WebHDFS is not used, python kerberos module is not available")
+    return None
+
+  https = hdfs_site.get('dfs.http.policy') == 'HTTPS_ONLY'
+  addresses = _get_namenode_addresses(hdfs_site, core_site, https)
+  if not addresses:
+    return None
+  return WebHDFS(addresses, user, https, security_enabled, verify_certificates)
+
+
+def _get_namenode_addresses(hdfs_site, core_site, https):
+  address_property = 'dfs.namenode.https-address' if https else 'dfs.namenode.http-address'
+  default_fs = urlparse.urlparse(core_site.get('fs.defaultFS') or '')
+
+  nameservice = hdfs_site.get('dfs.nameservices')
+  if nameservice and hdfs_site.get('dfs.ha.namenodes.' + nameservice):
+    namenodes = hdfs_site['dfs.ha.namenodes.' + nameservice].split(',')
+    addresses = [hdfs_site.get('{0}.{1}.{2}'.format(address_property, nameservice, namenode.strip()))
+                 for namenode in namenodes]
+  else:
+    addresses = [hdfs_site.get(address_property)]
+
+  result = []
+  for address in addresses:
+    if not address:
+      continue
+    host, _, port = address.rpartition(':')
+    if host == '0.0.0.0' and default_fs.hostname:
+      host = default_fs.hostname
+    result.append((host, int(port)))
+  return result
+
+
+class WebHDFSUnavailable(Fail):
+  """
+  None of the NameNodes can be reached or the authentication has failed,
+  the hadoop CLI may still work
+  """
+  pass
+
+
+class WebHDFS(object):
+  """
+  Client of WebHDFS REST API. Requests go through one keep-alive connection,
+  standby NameNodes of HA clusters are skipped.
+  """
+
+  def __init__(self, addresses, user, https=False, security_enabled=False, verify_certificates=True):
+    self.addresses = addresses # [(host, port)], active NameNode first when known
+    self.user = user
+    self.https = https
+    self.security_enabled = security_enabled
+    self.verify_certificates = verify_certificates
+    self.available = True
+    self.connection = None
+    self.auth_cookie = None # hadoop.auth cookie, saves SPNEGO negotiation
+    self.lock = threading.RLock()
+
+  def get_file_status(self, path):
+    """
+    @return: FileStatus dict, None if the path does not exist
+    """
+    status, _, body = self._request('GET', path, 'GETFILESTATUS', expected_status=(200, 404))
+    if status == 404:
+      return None
+    return json.loads(body)['FileStatus']
+
+  def list_status(self, path):
+    _, _, body = self._request('GET', path, 'LISTSTATUS')
+    return json.loads(body)['FileStatuses']['FileStatus']
+
+  def mkdirs(self, path, mode=None):
+    # creates parent directories too, the same as 'hadoop fs -mkdir -p'
+    params = {'permission': '%o' % mode} if mode else {}
+    self._request('PUT', path, 'MKDIRS', params)
+
+  def set_permission(self, path, mode, recursive=False):
+    for item in self._get_paths(path, recursive):
+      self._request('PUT', item, 'SETPERMISSION', {'permission': '%o' % mode})
+
+  def set_owner(self, path, owner, group=None, recursive=False):
+    params = {'owner': owner}
+    if group:
+      params['group'] = group
+    for item in self._get_paths(path, recursive):
+      self._request('PUT', item, 'SETOWNER', params)
+
+  def upload(self, local_path, path, overwrite=False):
+    """
+    Streams the local file to a DataNode the NameNode redirects to
+    """
+    _, headers, _ = self._request('PUT', path, 'CREATE', {'overwrite': str(overwrite).lower()},
+                                  expected_status=(307,))
+    location = urlparse.urlparse(headers['location'])
+    connection = self._create_connection(location.hostname, location.port, location.scheme == 'https')
+    try:
+      connection.putrequest('PUT', location.path + '?' + location.query)
+      connection.putheader('Content-Type', 'application/octet-stream')
+      connection.putheader('Content-Length', str(os.path.getsize(local_path)))
+      connection.endheaders()
+      with open(local_path, 'rb') as fp:
+        while True:
+          chunk = fp.read(UPLOAD_CHUNK_SIZE)
+          if not chunk:
+            break
+          connection.send(chunk)
+      response = connection.getresponse()
+      body = response.read()
+    except TRANSPORT_ERRORS, err:
+      raise Fail("WebHDFS upload of {0} to {1} failed: {2}".format(local_path, path, str(err)))
+    finally:
+      connection.close()
+    if response.status != 201:
+      raise Fail("WebHDFS upload of {0} to {1} failed: {2} {3}".format(local_path, path, response.status,
+                                                                      self._get_error_message(body)))
+
+  def close(self):
+    with self.lock:
+      if self.connection:
+        self.connection.close()
+        self.connection = None
+
+  def _get_paths(self, path, recursive):
+    """
+    @return: path and, when recursive, all the paths under it
+    """
+    paths = [path]
+    directories = [path] if recursive else []
+    while directories:
+      directory = directories.pop()
+      for item in self.list_status(directory):
+        if not item['pathSuffix']:
+          continue # path is a file
+        child = directory.rstrip('/') + '/' + item['pathSuffix']
+        paths.append(child)
+        if item['type'] == 'DIRECTORY':
+          directories.append(child)
+    return paths
+
+  def _request(self, method, path, op, params={}, expected_status=(200,)):
+    query = dict(params, op=op)
+    if not self.security_enabled:
+      query['user.name'] = self.user
+    url = WEBHDFS_PREFIX + urllib.quote(path) + '?' + urllib.urlencode(sorted(query.items()))
+
+    with self.lock:
+      try:
+        for attempt in range(len(self.addresses)):
+          try:
+            status, headers, body = self._send(method, url)
+          except WebHDFSUnavailable:
+            if attempt == len(self.addresses) - 1:
+              raise
+            # HA: NameNode is down, the next one is tried
+            self._next_namenode()
+            continue
+          if status == 403 and 'StandbyException' in body and len(self.addresses) > 1:
+            # HA: next NameNode is tried and kept for the next requests
+            self._next_namenode()
+            continue
+          break
+        if status == 401:
+          raise WebHDFSUnavailable("WebHDFS {0} {1} failed: authentication has been rejected".format(op, path))
+      except WebHDFSUnavailable:
+        self.available = False
+        raise
+
+    if not status in expected_status:
+      raise Fail("WebHDFS {0} {1} failed: {2} {3}".format(op, path, status, self._get_error_message(body)))
+    return status, headers, body
+
+  def _next_namenode(self):
+    self.close()
+    self.addresses.append(self.addresses.pop(0))
+
+  def _send(self, method, url):
+    for attempt in range(2):
+      if self.connection is None:
+        host, port = self.addresses[0]
+        self.connection = self._create_connection(host, port, self.https)
+      headers = self._get_auth_headers(self.addresses[0][0])
+      try:
+        self.connection.request(method, url, headers=headers)
+        response = self.connection.getresponse()
+        body = response.read()
+      except TRANSPORT_ERRORS, err:
+        # keep-alive connection may have been closed by the NameNode
+        self.close()
+        if attempt:
+          raise WebHDFSUnavailable("WebHDFS request {0} to {1} failed: {2}".format(
+            url, "{0}:{1}".format(*self.addresses[0]), str(err)))
+        continue
+
+      if response.status == 401 and self.auth_cookie:
+        # cookie has expired
+        self.auth_cookie = None
+        continue
+      cookie = response.getheader('set-cookie')
+      if cookie and cookie.startswith('hadoop.auth='):
+        self.auth_cookie = cookie.split(';')[0]
+      if response.getheader('connection', '').lower() == 'close':
+        self.close()
+      return response.status, dict(response.getheaders()), body
+    return response.status, dict(response.getheaders()), body
+
+  def _create_connection(self, host, port, https):
+    if not https:
+      return httplib.HTTPConnection(host, port, timeout=CONNECTION_TIMEOUT)
+    if not self.verify_certificates and hasattr(ssl, '_create_unverified_context'):
+      # explicitly requested, e.g. for self-signed certificates missing in the system trust store
+      return httplib.HTTPSConnection(host, port, timeout=CONNECTION_TIMEOUT,
+                                     context=ssl._create_unverified_context())
+    return httplib.HTTPSConnection(host, port, timeout=CONNECTION_TIMEOUT)
+
+  def _get_auth_headers(self, host):
+    if self.auth_cookie:
+      return {'Cookie': self.auth_cookie}
+    if not self.security_enabled:
+      return {}
+
+    # ticket of the user is obtained by kinit before the resources are executed
+    ccache_path = KERBEROS_TICKET_CACHE.format(pwd.getpwnam(self.user).pw_uid)
+    try:
+      return {'Authorization': get_negotiate_header(host, ccache_path)}
+    except Exception, err:
+      # kerberos.GSSError, e.g. there is no ticket in the cache
+      raise WebHDFSUnavailable("SPNEGO negotiation with {0} failed: {1}".format(host, str(err)))
+
+  @staticmethod
+  def _get_error_message(body):
+    try:
+      return json.loads(body)['RemoteException']['message']
+    except (ValueError, KeyError, TypeError):
+      return body
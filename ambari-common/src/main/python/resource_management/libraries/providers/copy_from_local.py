@@ -20,8 +20,12 @@ Ambari Agent
 
 """
 
+import glob
 import os
 from resource_management.libraries.resources.execute_hadoop import ExecuteHadoop
+from resource_management.libraries.functions.webhdfs import get_webhdfs, WebHDFSUnavailable
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
 from resource_management.core.providers import Provider
 from resource_management.libraries.functions.format import format
 from resource_management.core.shell import as_user
@@ -57,6 +61,12 @@ class CopyFromLocalProvider(Provider):
               user=user if user else owner,
       )
     
+    # kinit is done only on secured clusters
+    webhdfs = get_webhdfs(hadoop_conf_path, user if user else owner, bool(kinnit_if_needed))
+    admin_webhdfs = get_webhdfs(hadoop_conf_path, hdfs_usr, bool(kinnit_if_needed))
+    if webhdfs and admin_webhdfs and self.copy_with_webhdfs(webhdfs, admin_webhdfs):
+      return
+
     unless_cmd = as_user(format("PATH=$PATH:{bin_dir} hadoop fs -ls {dest_path}"), user if user else owner)
 
     ExecuteHadoop(copy_cmd,
@@ -92,3 +102,40 @@ class CopyFromLocalProvider(Provider):
                     bin_dir=bin_dir,
                     conf_dir=hadoop_conf_path)
     pass
+
+  def copy_with_webhdfs(self, webhdfs, admin_webhdfs):
+    """
+    Does the same as the hadoop commands above without starting a JVM per command.
+    Files are uploaded as the user, owner and mode are set as the hdfs user.
+    Returns False if WebHDFS is not available, so the hadoop commands are used instead
+    """
+    path = self.resource.path
+    dest_dir = self.resource.dest_dir.rstrip('/')
+    sources = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+    if not sources:
+      # the same as 'hadoop fs -copyFromLocal' does
+      raise Fail("Unable to copy {0} to {1}: no such files".format(path, dest_dir))
+
+    dest_paths = [dest_dir + '/' + (self.resource.dest_file or os.path.basename(source))
+                  for source in sources]
+    try:
+      existing = [webhdfs.get_file_status(dest_path) is not None for dest_path in dest_paths]
+      if self.resource.owner or self.resource.mode:
+        # hdfs user may not be able to authenticate either
+        admin_webhdfs.get_file_status(dest_dir)
+    except WebHDFSUnavailable, err:
+      Logger.info("Using hadoop CLI, WebHDFS is not available: %s" % str(err))
+      return False
+
+    for source, dest_path, exists in zip(sources, dest_paths, existing):
+      if not exists:
+        Logger.info("Copying %s to %s using WebHDFS" % (source, dest_path))
+        webhdfs.upload(source, dest_path)
+      else:
+        Logger.info("Skipping copying %s, %s already exists" % (source, dest_path))
+
+      if self.resource.owner:
+        admin_webhdfs.set_owner(dest_path, self.resource.owner, self.resource.group)
+      if self.resource.mode:
+        admin_webhdfs.set_permission(dest_path, self.resource.mode)
+    return True
@@ -22,6 +22,7 @@ Ambari Agent
 import os
 
 from resource_management import *
+from resource_management.libraries.functions.webhdfs import get_webhdfs, WebHDFSUnavailable
 directories_list = [] #direcotries list for mkdir
 chmod_map = {} #(mode,recursive):dir_list map
 chown_map = {} #(owner,group,recursive):dir_list map
@@ -94,19 +95,49 @@ class HdfsDirectoryProvider(Provider):
     if secured:
         Execute(format("{kinit_path} -kt {keytab_file} {hdfs_principal_name}"),
                 user=hdp_hdfs_user)
-    #create all directories in one 'mkdir' call
-    dir_list_str = ' '.join(directories_list)
-    #for hadoop 2 we need to specify -p to create directories recursively
-    parent_flag = '-p'
-
-    Execute(format('hadoop --config {hdp_conf_dir} fs -mkdir {parent_flag} {dir_list_str} && {chmod_cmd} && {chown_cmd}',
-                   chmod_cmd=' && '.join(chmod_commands),
-                   chown_cmd=' && '.join(chown_commands)),
-            user=hdp_hdfs_user,
-            path=bin_dir,
-            not_if=as_user(format("hadoop --config {hdp_conf_dir} fs -ls {dir_list_str}"), hdp_hdfs_user)
-    )
+
+    webhdfs = get_webhdfs(hdp_conf_dir, hdp_hdfs_user, secured)
+    if not webhdfs or not self.create_with_webhdfs(webhdfs):
+      #create all directories in one 'mkdir' call
+      dir_list_str = ' '.join(directories_list)
+      #for hadoop 2 we need to specify -p to create directories recursively
+      parent_flag = '-p'
+
+      Execute(format('hadoop --config {hdp_conf_dir} fs -mkdir {parent_flag} {dir_list_str} && {chmod_cmd} && {chown_cmd}',
+                     chmod_cmd=' && '.join(chmod_commands),
+                     chown_cmd=' && '.join(chown_commands)),
+              user=hdp_hdfs_user,
+              path=bin_dir,
+              not_if=as_user(format("hadoop --config {hdp_conf_dir} fs -ls {dir_list_str}"), hdp_hdfs_user)
+      )
 
     directories_list[:] = []
     chmod_map.clear()
     chown_map.clear()
+
+  def create_with_webhdfs(self, webhdfs):
+    """
+    Does the same as the hadoop commands above without starting a JVM per command.
+    Returns False if WebHDFS is not available, so the hadoop commands are used instead
+    """
+    try:
+      existing = all(webhdfs.get_file_status(dir_name) for dir_name in directories_list)
+    except WebHDFSUnavailable, err:
+      Logger.info("Using hadoop CLI, WebHDFS is not available: %s" % str(err))
+      return False
+
+    # nothing is changed when all the directories exist, as with 'not_if' above
+    if existing:
+      Logger.info("Skipping creation of existent HDFS directories %s" % ", ".join(directories_list))
+      return True
+
+    Logger.info("Creating HDFS directories %s using WebHDFS" % ", ".join(directories_list))
+    for dir_name in directories_list:
+      webhdfs.mkdirs(dir_name)
+    for (mode, recursive), chmod_dirs in chmod_map.items():
+      for dir_name in chmod_dirs:
+        webhdfs.set_permission(dir_name, int(mode, 8), recursive=bool(recursive))
+    for (owner, group, recursive), chown_dirs in chown_map.items():
+      for dir_name in chown_dirs:
+        webhdfs.set_owner(dir_name, owner, group, recursive=bool(recursive))
+    return True
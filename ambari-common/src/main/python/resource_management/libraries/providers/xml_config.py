@@ -22,39 +22,23 @@ Ambari Agent
 
 import time
 import os
-import resource_management
+from ambari_jinja2 import escape
 from resource_management.core.resources import File
 from resource_management.core.providers import Provider
-from resource_management.core.source import InlineTemplate
-from resource_management.libraries.functions.format import format
+from resource_management.core.source import Source, inline_template_environment
 from resource_management.core.environment import Environment
 from resource_management.core.logger import Logger
 
+# values without these are rendered to themselves
+TEMPLATE_TOKENS = ('{{', '{%', '{#', '\r')
+
 class XmlConfigProvider(Provider):
   def action_create(self):
     filename = self.resource.filename
     xml_config_provider_config_dir = self.resource.conf_dir
 
-    # |e - for html-like escaping of <,>,',"
-    config_content = InlineTemplate('''<!--{{time.asctime(time.localtime())}}-->
-    <configuration>
-    {% for key, value in configurations_dict|dictsort %}
-    <property>
-      <name>{{ key|e }}</name>
-      <value>{{ resource_management.core.source.InlineTemplate(value).get_content().strip() |e }}</value>
-      {%- if not configuration_attrs is none -%}
-      {%- for attrib_name, attrib_occurances in  configuration_attrs.items() -%}
-      {%- for property_name, attrib_value in  attrib_occurances.items() -%}
-      {% if property_name == key and attrib_name %}
-      <{{attrib_name|e}}>{{attrib_value|e}}</{{attrib_name|e}}>
-      {%- endif -%}
-      {%- endfor -%}
-      {%- endfor -%}
-      {%- endif %}
-    </property>
-    {% endfor %}
-  </configuration>''', extra_imports=[time, resource_management, resource_management.core, resource_management.core.source], configurations_dict=self.resource.configurations,
-                                    configuration_attrs=self.resource.configuration_attributes)
+    config_content = XmlConfigContent(filename, self.resource.configurations,
+                                      self.resource.configuration_attributes)
 
     xml_config_dest_file_path = os.path.join(xml_config_provider_config_dir, filename)
     Logger.info("Generating config: {0}".format(xml_config_dest_file_path))
@@ -67,3 +51,53 @@ class XmlConfigProvider(Provider):
         mode = self.resource.mode,
         encoding = self.resource.encoding
       )
+
+
+class XmlConfigContent(Source):
+  """
+  Renders configuration xml in a single pass. Property values are
+  templates rendered with the script params (like InlineTemplate), but
+  literal values are written as they are and templates are compiled once
+  per process.
+  """
+  def __init__(self, name, configurations, configuration_attrs):
+    super(XmlConfigContent, self).__init__(name)
+    self.configurations = configurations
+    self.configuration_attrs = configuration_attrs
+
+  def get_content(self):
+    params = self.env.config.params
+    context = params.copy() if params else {}
+    context.update({ 'env':self.env, 'repr':repr, 'str':str, 'bool':bool })
+
+    # property name -> [(attribute name, attribute value)]
+    attributes = {}
+    if self.configuration_attrs is not None:
+      for attrib_name, attrib_occurances in self.configuration_attrs.items():
+        if attrib_name:
+          for property_name, attrib_value in attrib_occurances.items():
+            attributes.setdefault(property_name, []).append((attrib_name, attrib_value))
+
+    # |e - for html-like escaping of <,>,',"
+    lines = [u'<!--', unicode(time.asctime(time.localtime())), u'-->\n    <configuration>\n    ']
+    for key, value in sorted(self.configurations.items(), key=self._sort_key):
+      lines += [u'\n    <property>\n      <name>', escape(key),
+                u'</name>\n      <value>', escape(self._render_value(value, context)), u'</value>']
+      for attrib_name, attrib_value in attributes.get(key, []):
+        lines += [u'\n      <', escape(attrib_name), u'>', escape(attrib_value),
+                  u'</', escape(attrib_name), u'>']
+      lines.append(u'\n    </property>\n    ')
+    lines.append(u'\n  </configuration>\n')
+    return u''.join(lines)
+
+  @staticmethod
+  def _render_value(value, context):
+    if isinstance(value, basestring) and not any(token in value for token in TEMPLATE_TOKENS):
+      return value.strip()
+    return inline_template_environment.get_template(value).render(context).strip()
+
+  @staticmethod
+  def _sort_key(item):
+    # the same order as jinja's dictsort
+    key = item[0]
+    return key.lower() if isinstance(key, basestring) else key
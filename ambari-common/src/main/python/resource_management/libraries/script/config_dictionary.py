@@ -21,23 +21,25 @@ from resource_management.core.exceptions import Fail
 
 class ConfigDictionary(dict):
   """
-  Immutable config dictionary
+  Immutable config dictionary.
+
+  Sub-dictionaries are turned to ConfigDictionary and values are converted
+  to python types on the first access only, the result is kept for the next
+  accesses. Sub-dictionaries share the counters of keys read by the script,
+  see get_access_counts().
   """
   
-  def __init__(self, dictionary, allow_overwrite=False):
-    """
-    Recursively turn dict to ConfigDictionary
-    """
+  def __init__(self, dictionary, allow_overwrite=False, path=(), access_counts=None):
     self.__allow_overwrite = allow_overwrite
-    for k, v in dictionary.iteritems():
-      if isinstance(v, dict):
-        dictionary[k] = ConfigDictionary(v, allow_overwrite=allow_overwrite)
-        
+    self.__path = path
+    self.__values = {} # name -> value converted to python type
+    self.__access_counts = {} if access_counts is None else access_counts
     super(ConfigDictionary, self).__init__(dictionary)
 
   def __setitem__(self, name, value):
     if self.__allow_overwrite:
       super(ConfigDictionary, self).__setitem__(name, value)
+      self.__values.pop(name, None)
     else:
       raise Fail("Configuration dictionary is immutable!")
 
@@ -47,26 +49,78 @@ class ConfigDictionary(dict):
     - enable lazy failure for unknown configs. 
     """
     try:
-      value = super(ConfigDictionary, self).__getitem__(name)
+      value = self.__values[name]
     except KeyError:
-      return UnknownConfiguration(name)
-      
-    
-    if value == "true":
-      value = True
-    elif value == "false":
-      value = False
-    else: 
-      try:
-        value = int(value)
-      except (ValueError, TypeError):
-        try:
-          value =  float(value)
-        except (ValueError, TypeError):
-          pass
-    
+      if not name in self:
+        return UnknownConfiguration(name)
+      value = self.__values.setdefault(name, convert_value(self.__get_value(name)))
+
+    self.__count_access(name)
     return value
 
+  def get(self, name, default=None):
+    if not name in self:
+      return default
+    self.__count_access(name)
+    return self.__get_value(name)
+
+  def iteritems(self):
+    for name in self:
+      yield name, self.__get_value(name)
+
+  def itervalues(self):
+    for name in self:
+      yield self.__get_value(name)
+
+  def items(self):
+    return list(self.iteritems())
+
+  def values(self):
+    return list(self.itervalues())
+
+  def copy(self):
+    return dict(self.iteritems())
+
+  def get_access_counts(self):
+    """
+    @return: {'configurations/hdfs-site/dfs.replication': <number of reads>, ...}
+    for the keys read from this dictionary and its sub-dictionaries
+    """
+    return dict(("/".join(map(str, path)), count) for path, count in self.__access_counts.iteritems())
+
+  def __count_access(self, name):
+    path = self.__path + (name,)
+    self.__access_counts[path] = self.__access_counts.get(path, 0) + 1
+
+  def __get_value(self, name):
+    """
+    Stored value, dict is replaced with ConfigDictionary once
+    """
+    value = super(ConfigDictionary, self).__getitem__(name)
+    if isinstance(value, dict) and not isinstance(value, ConfigDictionary):
+      value = ConfigDictionary(value, allow_overwrite=self.__allow_overwrite,
+                               path=self.__path + (name,), access_counts=self.__access_counts)
+      super(ConfigDictionary, self).__setitem__(name, value)
+    return value
+
+
+def convert_value(value):
+  if isinstance(value, dict):
+    return value
+
+  if value == "true":
+    return True
+  elif value == "false":
+    return False
+
+  try:
+    return int(value)
+  except (ValueError, TypeError):
+    try:
+      return float(value)
+    except (ValueError, TypeError):
+      return value
+
 
 class UnknownConfiguration():
   """
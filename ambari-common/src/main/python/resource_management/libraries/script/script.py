@@ -23,6 +23,7 @@ __all__ = ["Script"]
 
 import os
 import sys
+import imp
 import json
 import logging
 import platform
@@ -51,7 +52,7 @@ else:
 
 USAGE = """Usage: {0} <COMMAND> <JSON_CONFIG> <BASEDIR> <STROUTPUT> <LOGGING_LEVEL> <TMP_DIR>
 
-<COMMAND> command type (INSTALL/CONFIGURE/START/STOP/SERVICE_CHECK...)
+<COMMAND> command type (INSTALL/CONFIGURE/START/STOP/SERVICE_CHECK/STATUS_BATCH...)
 <JSON_CONFIG> path to command json file. Ex: /var/lib/ambari-agent/data/command-2.json
 <BASEDIR> path to service metadata dir. Ex: /var/lib/ambari-agent/cache/common-services/HDFS/2.1.0.2.0/package
 <STROUTPUT> path to file with structured command output (file will be created). Ex:/tmp/my.txt
@@ -95,6 +96,12 @@ class Script(object):
   # Class variable
   tmp_dir = ""
 
+  # Checks status and security state of several components at once
+  STATUS_BATCH_COMMAND = "status_batch"
+
+  # Key of the command json with path to the file with configurations
+  CONFIGURATIONS_FILE_KEY = "configurationsFile"
+
   def get_stack_to_component(self):
     """
     To be overridden by subclasses.
@@ -102,6 +109,17 @@ class Script(object):
     """
     return {}
     
+  def load_command_json(self, fp):
+    """
+    Loads the command json, configurations shared between commands are read
+    from the file the agent refers to
+    """
+    command = json.load(fp)
+    if Script.CONFIGURATIONS_FILE_KEY in command:
+      with open(command[Script.CONFIGURATIONS_FILE_KEY]) as f:
+        command['configurations'] = json.load(f)
+    return command
+
   def load_structured_out(self):
     Script.structuredOut = {}
     if os.path.exists(self.stroutfile):
@@ -195,7 +213,7 @@ class Script(object):
     try:
       with open(self.command_data_file) as f:
         pass
-        Script.config = ConfigDictionary(json.load(f))
+        Script.config = ConfigDictionary(self.load_command_json(f))
         # load passwords here(used on windows to impersonate different users)
         Script.passwords = {}
         for k, v in _PASSWORD_MAP.iteritems():
@@ -206,6 +224,10 @@ class Script(object):
       logger.exception("Can not read json file with command parameters: ")
       sys.exit(1)
 
+    if command_name == self.STATUS_BATCH_COMMAND:
+      self.execute_status_batch(Script.config['statusCommands'])
+      return
+
     # Run class method depending on a command type
     try:
       method = self.choose_method_to_execute(command_name)
@@ -225,6 +247,94 @@ class Script(object):
       if self.should_expose_component_version(command_name):
         self.save_component_version_to_structured_out()
 
+  def execute_status_batch(self, commands):
+    """
+    Executes status and security_status for every component command of the
+    batch. Scripts of the components are loaded from the same service package.
+    Results are written to structured out per component:
+      {"components": {<component>: {"exitcode": 0 if running else 1,
+                                    "securityState": ...,
+                                    "structuredOut": {...}}}}
+    """
+    results = {}
+    previous_configurations = None
+    for command in commands:
+      component = command['componentName']
+      configurations = command.get('configurations')
+      if configurations != previous_configurations:
+        # params modules read configuration at import time
+        self.unload_service_modules()
+        previous_configurations = configurations
+      Script.config = ConfigDictionary(command)
+      try:
+        script = self.load_component_script(command['commandParams']['script'])
+      except Exception, err:
+        Logger.error("Can not load script for component {0}: {1}".format(component, str(err)))
+        results[component] = {"exitcode": 1, "securityState": "UNKNOWN", "structuredOut": {}}
+        continue
+
+      Script.structuredOut = {}
+      exitcode = self.execute_batch_method(script, "status")
+      if script.should_expose_component_version("status"):
+        script.save_component_version_to_structured_out()
+      status_structured_out = Script.structuredOut
+
+      Script.structuredOut = {}
+      security_exitcode = self.execute_batch_method(script, "security_status")
+      security_state = Script.structuredOut.get("securityState", "UNKNOWN") \
+        if security_exitcode == 0 else "UNKNOWN"
+
+      results[component] = {"exitcode": exitcode,
+                            "securityState": security_state,
+                            "structuredOut": status_structured_out}
+
+    Script.structuredOut = {}
+    self.put_structured_out({"components": results})
+
+  def execute_batch_method(self, script, method_name):
+    """
+    Returns 0 if the method has succeeded and 1 otherwise, the same way as
+    exit code of a single command execution
+    """
+    try:
+      with Environment(self.basedir, tmp_dir=Script.tmp_dir) as env:
+        env.config.download_path = Script.tmp_dir
+        getattr(script, method_name)(env)
+      return 0
+    except (ClientComponentHasNoStatus, ComponentIsNotRunning):
+      return 1
+    except Exception:
+      Logger.logger.exception("Error while executing command '{0}':".format(method_name))
+      return 1
+
+  def load_component_script(self, script_path):
+    """
+    Loads the script of a component from the service package and returns an
+    instance of the Script subclass it defines
+    """
+    path = os.path.join(self.basedir, script_path)
+    module_name = "status_batch_" + os.path.splitext(os.path.basename(path))[0]
+    module = imp.load_source(module_name, path)
+    classes = [cls for cls in vars(module).values() if isinstance(cls, type)
+               and issubclass(cls, Script) and cls.__module__ == module_name]
+    # The component class is the one no other class of the script extends
+    leaves = [cls for cls in classes
+              if not any(other is not cls and issubclass(other, cls) for other in classes)]
+    if len(leaves) != 1:
+      raise Fail("Script '{0}' defines {1} component classes".format(path, len(leaves)))
+    return leaves[0]()
+
+  def unload_service_modules(self):
+    """
+    Removes modules imported from the service package, so they are imported
+    again with the current configuration
+    """
+    prefix = os.path.abspath(self.basedir) + os.sep
+    for name, module in sys.modules.items():
+      module_file = getattr(module, '__file__', None)
+      if name != '__main__' and module_file and os.path.abspath(module_file).startswith(prefix):
+        del sys.modules[name]
+
   def choose_method_to_execute(self, command_name):
     """
     Returns a callable object that should be executed for a given command.
@@ -278,6 +388,7 @@ class Script(object):
       package_list_str = config['hostLevelParams']['package_list']
       if isinstance(package_list_str, basestring) and len(package_list_str) > 0:
         package_list = json.loads(package_list_str)
+        package_names = []
         for package in package_list:
           if not package['name'] in exclude_packages:
             name = package['name']
@@ -286,7 +397,12 @@ class Script(object):
                 #TODO all msis must be located in resource folder of server, change it to repo later
                 Msi(name, http_source=os.path.join(config['hostLevelParams']['jdk_location']))
             else:
-              Package(name)
+              package_names.append(name)
+        if len(package_names) == 1:
+          Package(package_names[0])
+        elif package_names:
+          # missing packages are installed in one transaction
+          Package(", ".join(package_names), packages=package_names)
     except KeyError:
       pass  # No reason to worry
 
@@ -359,6 +359,11 @@ public class AmbariServer {
           "org.apache.ambari.server.agent.rest;" + "org.apache.ambari.server.api");
       agent.setInitParameter("com.sun.jersey.api.json.POJOMappingFeature",
           "true");
+      // agents may send and accept gzip-compressed bodies
+      agent.setInitParameter("com.sun.jersey.spi.container.ContainerRequestFilters",
+          "com.sun.jersey.api.container.filter.GZIPContentEncodingFilter");
+      agent.setInitParameter("com.sun.jersey.spi.container.ContainerResponseFilters",
+          "com.sun.jersey.api.container.filter.GZIPContentEncodingFilter");
       agentroot.addServlet(agent, "/agent/v1/*");
       agent.setInitOrder(3);
 
@@ -27,7 +27,11 @@ import sys
 import logging
 import pprint
 import os
+import Queue
+import shutil
 import subprocess
+import tarfile
+import tempfile
 import threading
 import traceback
 import re
@@ -38,8 +42,6 @@ AMBARI_PASSPHRASE_VAR_NAME = "AMBARI_PASSPHRASE"
 HOST_BOOTSTRAP_TIMEOUT = 300
 # how many parallel bootstraps may be run at a time
 MAX_PARALLEL_BOOTSTRAPS = 20
-# How many seconds to wait between polling parallel bootstraps
-POLL_INTERVAL_SEC = 1
 DEBUG = False
 DEFAULT_AGENT_TEMP_FOLDER = "/var/lib/ambari-agent/data/tmp"
 PYTHON_ENV="env PYTHONPATH=$PYTHONPATH:" + DEFAULT_AGENT_TEMP_FOLDER
@@ -64,10 +66,18 @@ class HostLog:
     logFile.close()
 
 
+def getControlOptions(control_path):
+  """ ssh options to run the command through the master connection listening at control_path.
+  ssh connects to the host by itself if the master connection is not available """
+  if control_path is None:
+    return []
+  return ["-o", "ControlPath=" + control_path]
+
+
 class SCP:
   """ SCP implementation that is thread based. The status can be returned using
    status val """
-  def __init__(self, user, sshkey_file, host, inputFile, remote, bootdir, host_log):
+  def __init__(self, user, sshkey_file, host, inputFile, remote, bootdir, host_log, control_path = None):
     self.user = user
     self.sshkey_file = sshkey_file
     self.host = host
@@ -75,6 +85,7 @@ class SCP:
     self.remote = remote
     self.bootdir = bootdir
     self.host_log = host_log
+    self.control_path = control_path
     pass
 
 
@@ -83,9 +94,10 @@ class SCP:
                   "-r",
                   "-o", "ConnectTimeout=60",
                   "-o", "BatchMode=yes",
-                  "-o", "StrictHostKeyChecking=no",
-                  "-i", self.sshkey_file, self.inputFile, self.user + "@" +
-                                                         self.host + ":" + self.remote]
+                  "-o", "StrictHostKeyChecking=no"]
+    scpcommand.extend(getControlOptions(self.control_path))
+    scpcommand.extend(["-i", self.sshkey_file, self.inputFile, self.user + "@" +
+                                                               self.host + ":" + self.remote])
     if DEBUG:
       self.host_log.write("Running scp command " + ' '.join(scpcommand))
     self.host_log.write("==========================")
@@ -105,7 +117,8 @@ class SCP:
 
 class SSH:
   """ Ssh implementation of this """
-  def __init__(self, user, sshkey_file, host, command, bootdir, host_log, errorMessage = None):
+  def __init__(self, user, sshkey_file, host, command, bootdir, host_log, errorMessage = None,
+               control_path = None):
     self.user = user
     self.sshkey_file = sshkey_file
     self.host = host
@@ -113,6 +126,7 @@ class SSH:
     self.bootdir = bootdir
     self.errorMessage = errorMessage
     self.host_log = host_log
+    self.control_path = control_path
     pass
 
 
@@ -122,8 +136,9 @@ class SSH:
                   "-o", "StrictHostKeyChecking=no",
                   "-o", "BatchMode=yes",
                   "-tt", # Should prevent "tput: No value for $TERM and no -T specified" warning
-                  "-i", self.sshkey_file,
-                  self.user + "@" + self.host, self.command]
+                  "-i", self.sshkey_file]
+    sshcommand.extend(getControlOptions(self.control_path))
+    sshcommand.extend([self.user + "@" + self.host, self.command])
     if DEBUG:
       self.host_log.write("Running ssh command " + ' '.join(sshcommand))
     self.host_log.write("==========================")
@@ -150,12 +165,15 @@ class Bootstrap(threading.Thread):
   AMBARI_REPO_FILENAME = "ambari"
   SETUP_SCRIPT_FILENAME = "setupAgent.py"
   PASSWORD_FILENAME = "host_pass"
+  FILES_ARCHIVE_FILENAME = "bootstrap_files.tar.gz"
   ambari_commons="/usr/lib/python2.6/site-packages/ambari_commons"
 
-  def __init__(self, host, shared_state):
+  def __init__(self, host, shared_state, finished_queue = None):
     threading.Thread.__init__(self)
     self.host = host
     self.shared_state = shared_state
+    # the bootstrap is put to the queue when it is finished
+    self.finished_queue = finished_queue
     self.status = {
       "start_time": None,
       "return_code": None,
@@ -164,6 +182,13 @@ class Bootstrap(threading.Thread):
     self.host_log = HostLog(log_file)
     self.daemon = True
 
+    # ssh master connection to the host listens at control_path, commands
+    # and copies are multiplexed through it instead of connecting each time
+    self.control_path = None
+    if shared_state.control_dir is not None:
+      shared_state.control_paths += 1
+      self.control_path = os.path.join(shared_state.control_dir, str(shared_state.control_paths))
+
     if self.is_ubuntu():
       self.AMBARI_REPO_FILENAME = self.AMBARI_REPO_FILENAME + ".list"
     else:
@@ -248,37 +273,43 @@ class Bootstrap(threading.Thread):
     command = "sudo mkdir -p {0} ; sudo chown -R {1} {0}".format(self.TEMP_FOLDER,quote_bash_args(params.user))
 
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("\n")
     return retcode
 
 
-  def copyOsCheckScript(self):
-    # Copying the os check script file
-    fileToCopy = self.getOsCheckScript()
-    target = self.getOsCheckScriptRemoteLocation()
-    params = self.shared_state
-    self.host_log.write("==========================\n")
-    self.host_log.write("Copying OS type check script...")
-    scp = SCP(params.user, params.sshkey_file, self.host, fileToCopy,
-              target, params.bootdir, self.host_log)
-    result = scp.run()
-    self.host_log.write("\n")
-    return result
+  def getNeededFiles(self):
+    """ Local files and their remote locations, the same for all the hosts """
+    return [(self.ambari_commons, os.path.join(self.getCommonFunctionsRemoteLocation(), "ambari_commons")),
+            (self.getOsCheckScript(), self.getOsCheckScriptRemoteLocation()),
+            (self.getRepoFile(), self.getRemoteName(self.AMBARI_REPO_FILENAME)),
+            (self.shared_state.setup_agent_file, self.getRemoteName(self.SETUP_SCRIPT_FILENAME))]
 
-  def copyCommonFunctions(self):
-    # Copying the os check script file
-    fileToCopy = self.ambari_commons
-    target = self.getCommonFunctionsRemoteLocation()
+  def getFilesArchive(self):
+    """ Archive of the needed files, it is created by the first bootstrap
+    and copied to each host by a single scp """
     params = self.shared_state
-    self.host_log.write("==========================\n")
-    self.host_log.write("Copying common functions script...")
-    scp = SCP(params.user, params.sshkey_file, self.host, fileToCopy,
-              target, params.bootdir, self.host_log)
-    result = scp.run()
-    self.host_log.write("\n")
-    return result
+    params.lock.acquire()
+    try:
+      if params.files_archive is None:
+        params.files_archive = self.createFilesArchive()
+      return params.files_archive
+    finally:
+      params.lock.release()
+
+  def createFilesArchive(self):
+    archive = os.path.join(self.shared_state.bootdir, self.FILES_ARCHIVE_FILENAME)
+    tar = tarfile.open(archive, "w:gz")
+    try:
+      # the same as scp -r does
+      tar.dereference = True
+      for fileToCopy, target in self.getNeededFiles():
+        # all the files are extracted to the temp folder
+        tar.add(fileToCopy, os.path.basename(target))
+    finally:
+      tar.close()
+    return archive
 
 
   def getMoveRepoFileWithPasswordCommand(self, targetDir):
@@ -301,49 +332,56 @@ class Bootstrap(threading.Thread):
     return "sudo apt-get update -o Dir::Etc::sourcelist=\"%s/%s\" -o API::Get::List-Cleanup=\"0\" --no-list-cleanup" %\
           ("sources.list.d", self.AMBARI_REPO_FILENAME)
 
+  def getExtractFilesArchiveCommand(self):
+    archive = self.getRemoteName(self.FILES_ARCHIVE_FILENAME)
+    return "tar -xzf {0} -C {1} ; retcode=$? ; rm -f {0} ; exit $retcode".format(archive, self.TEMP_FOLDER)
+
   def copyNeededFiles(self):
     # Copying the files
-    fileToCopy = self.getRepoFile()
-    target = self.getRemoteName(self.AMBARI_REPO_FILENAME)
-
-    self.host_log.write("==========================\n")
-    self.host_log.write("Copying repo file to 'tmp' folder...")
     params = self.shared_state
+    self.host_log.write("==========================\n")
+    self.host_log.write("Copying files archive to 'tmp' folder...")
+    fileToCopy = self.getFilesArchive()
+    target = self.getRemoteName(self.FILES_ARCHIVE_FILENAME)
     scp = SCP(params.user, params.sshkey_file, self.host, fileToCopy,
-              target, params.bootdir, self.host_log)
+              target, params.bootdir, self.host_log, control_path=self.control_path)
     retcode1 = scp.run()
     self.host_log.write("\n")
 
+    self.host_log.write("==========================\n")
+    self.host_log.write("Extracting files archive...")
+    command = self.getExtractFilesArchiveCommand()
+    ssh = SSH(params.user, params.sshkey_file, self.host, command,
+              params.bootdir, self.host_log, control_path=self.control_path)
+    retcode2 = ssh.run()
+    self.host_log.write("\n")
+
+    return max(retcode1["exitstatus"], retcode2["exitstatus"])
+
+
+  def moveRepoFile(self):
     # Move file to repo dir
+    params = self.shared_state
     self.host_log.write("==========================\n")
     self.host_log.write("Moving file to repo dir...")
     targetDir = self.getRepoDir()
     command = self.getMoveRepoFileCommand(targetDir)
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
-    retcode2 = ssh.run()
+              params.bootdir, self.host_log, control_path=self.control_path)
+    retcode = ssh.run()
     self.host_log.write("\n")
 
     # Update repo cache for ubuntu OS
-    if self.is_ubuntu():
+    if self.is_ubuntu() and retcode["exitstatus"] == 0:
       self.host_log.write("==========================\n")
       self.host_log.write("Update apt cache of repository...")
       command = self.getAptUpdateCommand()
       ssh = SSH(params.user, params.sshkey_file, self.host, command,
-                params.bootdir, self.host_log)
-      retcode2 = ssh.run()
+                params.bootdir, self.host_log, control_path=self.control_path)
+      retcode = ssh.run()
       self.host_log.write("\n")
 
-    self.host_log.write("==========================\n")
-    self.host_log.write("Copying setup script file...")
-    fileToCopy = params.setup_agent_file
-    target = self.getRemoteName(self.SETUP_SCRIPT_FILENAME)
-    scp = SCP(params.user, params.sshkey_file, self.host, fileToCopy,
-              target, params.bootdir, self.host_log)
-    retcode3 = scp.run()
-    self.host_log.write("\n")
-
-    return max(retcode1["exitstatus"], retcode2["exitstatus"], retcode3["exitstatus"])
+    return retcode
 
 
   def getAmbariVersion(self):
@@ -402,7 +440,7 @@ class Bootstrap(threading.Thread):
                PYTHON_ENV, self.getOsCheckScriptRemoteLocation(), params.cluster_os_type)
 
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("\n")
     return retcode
@@ -414,7 +452,7 @@ class Bootstrap(threading.Thread):
     self.host_log.write("Running setup agent script...")
     command = self.getRunSetupCommand(self.host)
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("\n")
     return retcode
@@ -447,7 +485,8 @@ class Bootstrap(threading.Thread):
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
               params.bootdir, self.host_log,
               errorMessage="Error: Sudo command is not available. "
-                           "Please install the sudo command.")
+                           "Please install the sudo command.",
+              control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("\n")
     return retcode
@@ -457,7 +496,7 @@ class Bootstrap(threading.Thread):
     self.host_log.write("Copying password file to 'tmp' folder...")
     params = self.shared_state
     scp = SCP(params.user, params.sshkey_file, self.host, params.password_file,
-              self.getPasswordFile(), params.bootdir, self.host_log)
+              self.getPasswordFile(), params.bootdir, self.host_log, control_path=self.control_path)
     retcode1 = scp.run()
 
     self.copied_password_file = True
@@ -466,7 +505,7 @@ class Bootstrap(threading.Thread):
     self.host_log.write("Changing password file mode...")
     command = "chmod 600 " + self.getPasswordFile()
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode2 = ssh.run()
 
     self.host_log.write("Copying password file finished")
@@ -479,7 +518,7 @@ class Bootstrap(threading.Thread):
     params = self.shared_state
     command = "chmod 600 " + self.getPasswordFile()
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("Change password file mode on host finished")
     return retcode
@@ -491,11 +530,66 @@ class Bootstrap(threading.Thread):
     params = self.shared_state
     command = "rm " + self.getPasswordFile()
     ssh = SSH(params.user, params.sshkey_file, self.host, command,
-              params.bootdir, self.host_log)
+              params.bootdir, self.host_log, control_path=self.control_path)
     retcode = ssh.run()
     self.host_log.write("Deleting password file finished")
     return retcode
 
+  def getSharedConnectionCommand(self, *options):
+    params = self.shared_state
+    command = ["ssh",
+               "-o", "ConnectTimeOut=60",
+               "-o", "StrictHostKeyChecking=no",
+               "-o", "BatchMode=yes",
+               "-i", params.sshkey_file]
+    command.extend(getControlOptions(self.control_path))
+    command.extend(options)
+    command.append(params.user + "@" + self.host)
+    return command
+
+  def runSharedConnectionCommand(self, command):
+    if DEBUG:
+      self.host_log.write("Running ssh command " + ' '.join(command))
+    try:
+      # ssh master goes to background, so its output must not be read through pipes
+      log_file = open(self.host_log.log_file, "a")
+      devnull = open(os.devnull, "r")
+      try:
+        return subprocess.call(command, stdin=devnull, stdout=log_file, stderr=log_file, close_fds=True)
+      finally:
+        log_file.close()
+        devnull.close()
+    except (OSError, IOError):
+      self.host_log.write("Traceback: " + traceback.format_exc())
+      return 255
+
+  def openSharedConnection(self):
+    """ Starts ssh master connection to the host. It goes to background once
+    authenticated, the commands connect to the host by themselves if it fails """
+    if self.control_path is None:
+      return
+    self.host_log.write("==========================\n")
+    self.host_log.write("Opening shared SSH connection...")
+    # -M: master mode, -N: no remote command, -f: go to background
+    retcode = self.runSharedConnectionCommand(self.getSharedConnectionCommand("-M", "-N", "-f"))
+    if retcode != 0:
+      self.host_log.write("Shared SSH connection is not available (exitcode=" + str(retcode) +
+                          "), commands will connect to the host separately")
+      self.control_path = None
+    self.host_log.write("\n")
+
+  def closeSharedConnection(self):
+    if self.control_path is None or not os.path.exists(self.control_path):
+      return
+    self.runSharedConnectionCommand(self.getSharedConnectionCommand("-O", "exit"))
+
+  def writeTimings(self, timings):
+    """ Writes how long each action has taken """
+    message = "Bootstrap of host {0} took {1:.1f} seconds:".format(self.host, time.time() - self.status["start_time"])
+    for name, seconds in timings:
+      message += "\n  {0}: {1:.1f} seconds".format(name, seconds)
+    self.host_log.write(message)
+
   def try_to_execute(self, action):
     last_retcode = {"exitstatus": 177, "log":"Try to execute '{0}'".format(str(action)), "errormsg":"Execute of '{0}' failed".format(str(action))}
     try:
@@ -510,11 +604,17 @@ class Bootstrap(threading.Thread):
 
   def run(self):
     """ Copy files and run commands on remote host """
+    try:
+      self.bootstrap()
+    finally:
+      if self.finished_queue is not None:
+        self.finished_queue.put(self)
+
+  def bootstrap(self):
     self.status["start_time"] = time.time()
     # Population of action queue
     action_queue = [self.createTargetDir,
-                    self.copyCommonFunctions,
-                    self.copyOsCheckScript,
+                    self.copyNeededFiles,
                     self.runOsCheckScript,
                     self.checkSudoPackage
     ]
@@ -522,15 +622,20 @@ class Bootstrap(threading.Thread):
       action_queue.extend([self.copyPasswordFile,
                            self.changePasswordFileModeOnHost])
     action_queue.extend([
-      self.copyNeededFiles,
+      self.moveRepoFile,
       self.runSetupAgent,
     ])
 
+    self.openSharedConnection()
+
     # Execution of action queue
     last_retcode = 0
+    timings = []
     while action_queue and last_retcode == 0:
       action = action_queue.pop(0)
+      action_start_time = time.time()
       ret = self.try_to_execute(action)
+      timings.append((action.__name__, time.time() - action_start_time))
       last_retcode = ret["exitstatus"]
       err_msg = ret["errormsg"]
       std_out = ret["log"]
@@ -549,6 +654,8 @@ class Bootstrap(threading.Thread):
         self.host_log.write(message)
         logging.warn(message)
 
+    self.closeSharedConnection()
+    self.writeTimings(timings)
     self.createDoneFile(last_retcode)
     self.status["return_code"] = last_retcode
 
@@ -569,6 +676,8 @@ class Bootstrap(threading.Thread):
                         "Check your network connectivity and retry registration," \
                         " or use manual agent registration.".format(HOST_BOOTSTRAP_TIMEOUT))
     self.createDoneFile(199)
+    # the command which hangs is aborted, and the master connection does not outlive the bootstrap
+    self.closeSharedConnection()
 
 
 
@@ -577,45 +686,56 @@ class PBootstrap:
   def __init__(self, hosts, sharedState):
     self.hostlist = hosts
     self.sharedState = sharedState
+    # bootstraps put themselves here when they are finished
+    self.finished_queue = Queue.Queue()
     pass
 
   def run_bootstrap(self, host):
-    bootstrap = Bootstrap(host, self.sharedState)
+    bootstrap = Bootstrap(host, self.sharedState, self.finished_queue)
     bootstrap.start()
     return bootstrap
 
   def run(self):
     """ Run up to MAX_PARALLEL_BOOTSTRAPS at a time in parallel """
     logging.info("Executing parallel bootstrap")
+    start_time = time.time()
+    self.sharedState.control_dir = tempfile.mkdtemp(prefix="ambari-ssh-")
+    try:
+      self.run_bootstraps()
+    finally:
+      shutil.rmtree(self.sharedState.control_dir, ignore_errors=True)
+      self.sharedState.control_dir = None
+    logging.info("Finished parallel bootstrap of {0} hosts in {1:.1f} seconds".format(len(self.hostlist),
+                                                                                    time.time() - start_time))
+
+  def run_bootstraps(self):
     queue = list(self.hostlist)
     queue.reverse()
-    running_list = []
-    finished_list = []
-    while queue or running_list: # until queue is not empty or not all parallel bootstraps are
-      # poll running bootstraps
-      for bootstrap in running_list:
-        if bootstrap.getStatus()["return_code"] is not None:
-          finished_list.append(bootstrap)
-        else:
-          starttime = bootstrap.getStatus()["start_time"]
-          elapsedtime = time.time() - starttime
-          if elapsedtime > HOST_BOOTSTRAP_TIMEOUT:
-            # bootstrap timed out
-            logging.warn("Bootstrap at host {0} timed out and will be "
-                            "interrupted".format(bootstrap.host))
-            bootstrap.interruptBootstrap()
-            finished_list.append(bootstrap)
-      # Remove finished from the running list
-      running_list[:] = [b for b in running_list if not b in finished_list]
+    running = {} # bootstrap -> time it has been started at
+    while queue or running: # until queue is not empty or not all parallel bootstraps are
       # Start new bootstraps from the queue
-      free_slots = MAX_PARALLEL_BOOTSTRAPS - len(running_list)
-      for i in range(free_slots):
-        if queue:
-          next_host = queue.pop()
-          bootstrap = self.run_bootstrap(next_host)
-          running_list.append(bootstrap)
-      time.sleep(POLL_INTERVAL_SEC)
-    logging.info("Finished parallel bootstrap")
+      while queue and len(running) < MAX_PARALLEL_BOOTSTRAPS:
+        bootstrap = self.run_bootstrap(queue.pop())
+        running[bootstrap] = time.time()
+
+      # Wait until a bootstrap is finished or the earliest started one times out
+      timeout = min(running.values()) + HOST_BOOTSTRAP_TIMEOUT - time.time()
+      try:
+        finished = self.finished_queue.get(True, max(timeout, 0))
+        running.pop(finished, None)
+      except Queue.Empty:
+        pass
+
+      now = time.time()
+      for bootstrap, bootstrap_start_time in running.items():
+        if now - bootstrap_start_time <= HOST_BOOTSTRAP_TIMEOUT:
+          continue
+        del running[bootstrap]
+        if bootstrap.getStatus()["return_code"] is None:
+          # bootstrap timed out
+          logging.warn("Bootstrap at host {0} timed out and will be "
+                          "interrupted".format(bootstrap.host))
+          bootstrap.interruptBootstrap()
 
 
 
@@ -638,6 +758,11 @@ class SharedState:
     self.server_port = server_port
     self.remote_files = {}
     self.ret = {}
+    # directory of ssh master connection sockets, None if connections are not shared
+    self.control_dir = None
+    self.control_paths = 0
+    self.files_archive = None
+    self.lock = threading.Lock()
     pass
 
 
@@ -16,20 +16,25 @@ See the License for the specific language governing permissions and
 limitations under the License.
 
 """
+import socket
 
 from resource_management.core.logger import Logger
 from resource_management.core.exceptions import Fail
 from resource_management.core.resources.system import Execute
 from resource_management.core import shell
 from resource_management.libraries.functions import format
-from resource_management.libraries.functions.decorator import retry
+from namenode_status import get_active_namenode_status, poll
+
+# seconds to wait for the DataNode to shutdown or to rejoin the cluster
+DATANODE_CHECK_TIMEOUT = 120
+DATANODE_CONNECT_TIMEOUT = 5
 
 
 def pre_upgrade_shutdown():
   """
   Runs the "shutdownDatanode {ipc_address} upgrade" command to shutdown the
   DataNode in preparation for an upgrade. This will then periodically check
-  "getDatanodeInfo" to ensure the DataNode has shutdown correctly.
+  the IPC port to ensure the DataNode has shutdown correctly.
   This function will obtain the Kerberos ticket if security is enabled.
   :return:
   """
@@ -62,22 +67,14 @@ def post_upgrade_check():
   _check_datanode_startup()
 
 
-@retry(times=12, sleep_time=10, err_class=Fail)
 def _check_datanode_shutdown():
   """
-  Checks that a DataNode is down by running "hdfs dfsamin getDatanodeInfo"
-  several times, pausing in between runs. Once the DataNode stops responding
-  this method will return, otherwise it will raise a Fail(...) and retry
-  automatically.
+  Checks that a DataNode is down by connecting to its IPC port several
+  times, pausing in between the checks. Once the DataNode stops accepting
+  connections this method will return, otherwise it will raise a Fail(...).
   :return:
   """
-  import params
-
-  command = format('hdfs dfsadmin -getDatanodeInfo {dfs_dn_ipc_address}')
-
-  try:
-    Execute(command, user=params.hdfs_user, tries=1)
-  except:
+  if poll(lambda: not _is_datanode_listening(), DATANODE_CHECK_TIMEOUT, "DataNode to shutdown"):
     Logger.info("DataNode has successfully shutdown for upgrade.")
     return
 
@@ -85,30 +82,68 @@ def _check_datanode_shutdown():
   raise Fail('DataNode has not shutdown.')
 
 
-@retry(times=12, sleep_time=10, err_class=Fail)
 def _check_datanode_startup():
   """
-  Checks that a DataNode is reported as being alive via the
-  "hdfs dfsadmin -report -live" command. Once the DataNode is found to be
-  alive this method will return, otherwise it will raise a Fail(...) and retry
-  automatically.
+  Checks that a DataNode is reported as being alive by the LiveNodes of
+  the active NameNode, read from its JMX. The "hdfs dfsadmin -report -live"
+  command is used when JMX is not available. Once the DataNode is found to be
+  alive this method will return, otherwise it will raise a Fail(...).
   :return:
   """
   import params
 
+  namenode_status = get_active_namenode_status()
+
+  def is_datanode_live():
+    live_datanodes = namenode_status.get_live_datanodes()
+    if live_datanodes is None:
+      return _is_datanode_live_by_cli()
+    return any(params.hostname.lower() in name.lower() for name in live_datanodes)
+
+  if poll(is_datanode_live, DATANODE_CHECK_TIMEOUT, "DataNode {0} to rejoin the cluster".format(params.hostname)):
+    Logger.info("DataNode {0} reports that it has rejoined the cluster.".format(params.hostname))
+    return
+
+  raise Fail("DataNode {0} was not found in the list of live DataNodes".format(params.hostname))
+
+
+def _is_datanode_listening():
+  """
+  Connects to the IPC port of the DataNode on this host, which is far
+  cheaper than "hdfs dfsadmin -getDatanodeInfo".
+  :return: True if the port accepts connections
+  """
+  import params
+
+  host, _, port = params.dfs_dn_ipc_address.rpartition(":")
+  if not host or host == "0.0.0.0":
+    host = params.hostname
+  try:
+    socket.create_connection((host, int(port)), DATANODE_CONNECT_TIMEOUT).close()
+    return True
+  except socket.error:
+    return False
+
+
+def _is_datanode_live_by_cli():
+  """
+  :return: True if the DataNode is in the output of "hdfs dfsadmin -report -live"
+  """
+  import params
+
   try:
     # 'su - hdfs -c "hdfs dfsadmin -report -live"'
     command = 'hdfs dfsadmin -report -live'
     return_code, hdfs_output = shell.call(command, user=params.hdfs_user)
   except:
-    raise Fail('Unable to determine if the DataNode has started after upgrade.')
+    Logger.info('Unable to determine if the DataNode has started after upgrade.')
+    return False
 
   if return_code == 0:
     if params.hostname.lower() in hdfs_output.lower():
-      Logger.info("DataNode {0} reports that it has rejoined the cluster.".format(params.hostname))
-      return
-    else:
-      raise Fail("DataNode {0} was not found in the list of live DataNodes".format(params.hostname))
+      return True
+    Logger.info("DataNode {0} was not found in the list of live DataNodes".format(params.hostname))
+    return False
 
-  # return_code is not 0, fail
-  raise Fail("Unable to determine if the DataNode has started after upgrade (result code {0})".format(str(return_code)))
+  Logger.info("Unable to determine if the DataNode has started after upgrade (result code {0})".format(str(return_code)))
+  return False
@@ -48,36 +48,38 @@ def hdfs(name=None):
     tc_mode = None
     tc_owner = params.hdfs_user
 
-  if "hadoop-policy" in params.config['configurations']:
-    XmlConfig("hadoop-policy.xml",
+  # configuration files are independent of each other
+  with Environment.get_instance().parallel():
+    if "hadoop-policy" in params.config['configurations']:
+      XmlConfig("hadoop-policy.xml",
+                conf_dir=params.hadoop_conf_dir,
+                configurations=params.config['configurations']['hadoop-policy'],
+                configuration_attributes=params.config['configuration_attributes']['hadoop-policy'],
+                owner=params.hdfs_user,
+                group=params.user_group
+      )
+
+    XmlConfig("hdfs-site.xml",
               conf_dir=params.hadoop_conf_dir,
-              configurations=params.config['configurations']['hadoop-policy'],
-              configuration_attributes=params.config['configuration_attributes']['hadoop-policy'],
+              configurations=params.config['configurations']['hdfs-site'],
+              configuration_attributes=params.config['configuration_attributes']['hdfs-site'],
               owner=params.hdfs_user,
               group=params.user_group
     )
 
-  XmlConfig("hdfs-site.xml",
-            conf_dir=params.hadoop_conf_dir,
-            configurations=params.config['configurations']['hdfs-site'],
-            configuration_attributes=params.config['configuration_attributes']['hdfs-site'],
-            owner=params.hdfs_user,
-            group=params.user_group
-  )
-
-  XmlConfig("core-site.xml",
-            conf_dir=params.hadoop_conf_dir,
-            configurations=params.config['configurations']['core-site'],
-            configuration_attributes=params.config['configuration_attributes']['core-site'],
-            owner=params.hdfs_user,
-            group=params.user_group,
-            mode=0644
-  )
+    XmlConfig("core-site.xml",
+              conf_dir=params.hadoop_conf_dir,
+              configurations=params.config['configurations']['core-site'],
+              configuration_attributes=params.config['configuration_attributes']['core-site'],
+              owner=params.hdfs_user,
+              group=params.user_group,
+              mode=0644
+    )
 
-  File(os.path.join(params.hadoop_conf_dir, 'slaves'),
-       owner=tc_owner,
-       content=Template("slaves.j2")
-  )
+    File(os.path.join(params.hadoop_conf_dir, 'slaves'),
+         owner=tc_owner,
+         content=Template("slaves.j2")
+    )
   
   if params.lzo_enabled:
     Package(params.lzo_packages_for_current_host)
@@ -21,7 +21,14 @@ import os.path
 from resource_management import *
 from resource_management.core.exceptions import ComponentIsNotRunning
 
+from resource_management.libraries.functions import SafeMode
+
 from utils import service, safe_zkfc_op
+from namenode_status import get_namenode_status, is_active_namenode
+from namenode_ha_state import NAMENODE_STATE
+
+# seconds to wait for the Namenode to leave safemode after start
+SAFEMODE_OFF_TIMEOUT = 400
 
 
 def namenode(action=None, do_format=True, rolling_restart=False, env=None):
@@ -83,32 +90,40 @@ def namenode(action=None, do_format=True, rolling_restart=False, env=None):
       dfs_check_nn_status_cmd = None
 
     namenode_safe_mode_off = format("hadoop dfsadmin -safemode get | grep 'Safe mode is OFF'")
+    # the state is read from JMX, the CLI commands above are used only when it is not available
+    namenode_status = get_namenode_status()
 
     # If HA is enabled and it is in standby, then stay in safemode, otherwise, leave safemode.
     leave_safe_mode = True
     if dfs_check_nn_status_cmd is not None:
-      code, out = shell.call(dfs_check_nn_status_cmd) # If active NN, code will be 0
-      if code != 0:
-        leave_safe_mode = False
+      leave_safe_mode = is_active_namenode(namenode_status, dfs_check_nn_status_cmd)
 
     if leave_safe_mode:
       # First check if Namenode is not in 'safemode OFF' (equivalent to safemode ON), if so, then leave it
-      code, out = shell.call(namenode_safe_mode_off)
-      if code != 0:
+      if namenode_status.get_safemode() != SafeMode.OFF:
         leave_safe_mode_cmd = format("hdfs --config {hadoop_conf_dir} dfsadmin -safemode leave")
         Execute(leave_safe_mode_cmd,
                 user=params.hdfs_user,
                 path=[params.hadoop_bin_dir],
         )
 
-    # Verify if Namenode should be in safemode OFF
-    Execute(namenode_safe_mode_off,
-            tries=40,
-            try_sleep=10,
-            path=[params.hadoop_bin_dir],
-            user=params.hdfs_user,
-            only_if=dfs_check_nn_status_cmd #skip when HA not active
-    )
+    # Verify if Namenode should be in safemode OFF, HA state is checked again as
+    # the Namenode may have become active in the meantime
+    ha_state = namenode_status.get_ha_state() if dfs_check_nn_status_cmd is not None else None
+    if dfs_check_nn_status_cmd is None or ha_state == NAMENODE_STATE.ACTIVE:
+      safemode_checked = namenode_status.wait_for_safemode(SafeMode.OFF, SAFEMODE_OFF_TIMEOUT)
+    else:
+      # skip when HA not active
+      safemode_checked = ha_state is not None
+
+    if not safemode_checked:
+      Execute(namenode_safe_mode_off,
+              tries=40,
+              try_sleep=10,
+              path=[params.hadoop_bin_dir],
+              user=params.hdfs_user,
+              only_if=dfs_check_nn_status_cmd #skip when HA not active
+      )
     create_hdfs_directories(dfs_check_nn_status_cmd)
 
   if action == "stop":
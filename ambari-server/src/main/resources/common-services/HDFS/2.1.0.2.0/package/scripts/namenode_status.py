@@ -0,0 +1,218 @@
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import httplib
+import json
+import socket
+import time
+import urllib2
+
+from resource_management.core import shell
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from resource_management.libraries.functions import SafeMode
+from resource_management.libraries.functions.default import default
+from utils import get_jmx_bean
+from namenode_ha_state import NAMENODE_STATE, NamenodeHAState
+
+NAMENODE_INFO_BEAN = "Hadoop:service=NameNode,name=NameNodeInfo"
+NAMENODE_STATUS_BEAN = "Hadoop:service=NameNode,name=NameNodeStatus"
+FSNAMESYSTEM_BEAN = "Hadoop:service=NameNode,name=FSNamesystem"
+
+# The awaited state is often reached soon, so the checks are frequent at first
+# and become less frequent up to MAX_POLL_INTERVAL
+INITIAL_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 10
+# JMX is given up on after this many requests in a row have got no answer,
+# e.g., the Namenode has died or its HTTP port is blocked
+MAX_JMX_FAILURES = 4
+
+
+class NamenodeStatus:
+  """
+  Reads the state of a Namenode from its JMX servlet, which costs an HTTP request
+  instead of a JVM started by "hdfs dfsadmin" or "hdfs haadmin".
+  Methods return None when the state is not known, callers fall back to the CLI then.
+  """
+
+  def __init__(self, address, encrypted=False):
+    """
+    :param address: Namenode HTTP address (HTTPS address if encrypted), e.g., host:port
+    """
+    self.address = address
+    self.encrypted = encrypted
+    # False once the servlet refuses the requests, e.g., it requires SPNEGO authentication
+    self.available = address is not None
+    # True once the servlet has answered
+    self.responded = False
+    # requests in a row which have got no answer
+    self.failures = 0
+
+  def get_safemode(self):
+    """
+    :return: SafeMode.ON or SafeMode.OFF, None if not known
+    """
+    bean = self._get_bean(NAMENODE_INFO_BEAN)
+    if bean is None or not "Safemode" in bean:
+      return None
+    # the attribute is the safemode tip, which is empty when safemode is off
+    return SafeMode.ON if bean["Safemode"] else SafeMode.OFF
+
+  def get_ha_state(self):
+    """
+    :return: Member of NAMENODE_STATE, None if not known
+    """
+    bean = self._get_bean(NAMENODE_STATUS_BEAN)
+    state = bean.get("State") if bean else None
+    if not state:
+      # the state is published by the FSNamesystem metrics as well
+      bean = self._get_bean(FSNAMESYSTEM_BEAN)
+      state = bean.get("tag.HAState") if bean else None
+    if not state:
+      return None
+
+    state = state.lower()
+    if state not in [NAMENODE_STATE.ACTIVE, NAMENODE_STATE.STANDBY]:
+      state = NAMENODE_STATE.UNKNOWN
+    return state
+
+  def get_live_datanodes(self):
+    """
+    :return: List of the live Datanode names, e.g., host:port, None if not known
+    """
+    bean = self._get_bean(NAMENODE_INFO_BEAN)
+    if bean is None or not "LiveNodes" in bean:
+      return None
+    try:
+      return json.loads(bean["LiveNodes"]).keys()
+    except (ValueError, AttributeError), err:
+      Logger.info("Unable to parse the live Datanodes of Namenode %s: %s" % (self.address, str(err)))
+      return None
+
+  def wait_for_safemode(self, safemode_state, timeout):
+    """
+    Polls the Namenode until it reaches the safemode state.
+    :param timeout: Seconds to wait
+    :return: True when the state is reached, False if JMX can not be used
+    :raise Fail: if the Namenode has not reached the state in time
+    """
+    def check():
+      if not self.available:
+        return None
+      safemode = self.get_safemode()
+      if self.failures >= MAX_JMX_FAILURES:
+        # the CLI gets the rest of the time instead of waiting for JMX until the timeout
+        return None
+      return safemode == safemode_state
+
+    reached = poll(check, timeout, "Namenode %s to reach safemode state %s" % (self.address, safemode_state))
+    if reached is None or (not reached and not self.responded):
+      Logger.info("JMX of Namenode %s can not be used, safemode will be checked by hdfs CLI" % self.address)
+      return False
+    if not reached:
+      raise Fail("Namenode %s has not reached safemode state %s in %d seconds" % (self.address, safemode_state, timeout))
+    return True
+
+  def _get_bean(self, bean_name):
+    if not self.available:
+      return None
+    try:
+      bean = get_jmx_bean(self.address, bean_name, self.encrypted)
+      self.responded = True
+      self.failures = 0
+      return bean
+    except urllib2.HTTPError, err:
+      # there is no use in asking again
+      Logger.info("JMX of Namenode %s refused to return %s: %s" % (self.address, bean_name, str(err)))
+      self.available = False
+    except (urllib2.URLError, httplib.HTTPException, socket.error, ValueError, KeyError), err:
+      # Namenode may be starting
+      Logger.info("Unable to read %s from JMX of Namenode %s: %s" % (bean_name, self.address, str(err)))
+      self.failures += 1
+    return None
+
+
+def poll(check, timeout, description):
+  """
+  Calls check until it returns something other than False. The interval
+  between the calls starts at INITIAL_POLL_INTERVAL and doubles up to
+  MAX_POLL_INTERVAL.
+  :param timeout: Seconds to sleep between the calls in total
+  :return: Value returned by check, False if it has returned only False in time
+  """
+  interval = INITIAL_POLL_INTERVAL
+  slept = 0
+  while True:
+    result = check()
+    if result is not False:
+      return result
+    if slept >= timeout:
+      return False
+
+    sleep_time = min(interval, timeout - slept)
+    Logger.info("Waiting for %s, next check in %d sec(s)" % (description, sleep_time))
+    time.sleep(sleep_time)
+    slept += sleep_time
+    interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+def is_active_namenode(namenode_status, check_command):
+  """
+  :param check_command: Command which succeeds on the active Namenode, executed if JMX can not be read
+  :return: Returns a bool indicating if the Namenode is active
+  """
+  state = namenode_status.get_ha_state()
+  if state is not None:
+    return state == NAMENODE_STATE.ACTIVE
+
+  code, out = shell.call(check_command)
+  return code == 0
+
+
+def get_namenode_status():
+  """
+  :return: NamenodeStatus of the Namenode on this host
+  """
+  import params
+
+  address_property = "dfs.namenode.https-address" if params.https_only else "dfs.namenode.http-address"
+  if params.dfs_ha_enabled:
+    address_property = "%s.%s.%s" % (address_property, params.dfs_ha_nameservices, params.namenode_id)
+
+  address = default("/configurations/hdfs-site/" + address_property, None)
+  if address and address.startswith("0.0.0.0:"):
+    address = params.hostname + address[len("0.0.0.0"):]
+  return NamenodeStatus(address, params.https_only)
+
+
+def get_active_namenode_status():
+  """
+  :return: NamenodeStatus of the active Namenode
+  """
+  import params
+
+  if not params.dfs_ha_enabled:
+    return get_namenode_status()
+
+  try:
+    namenode_ha = NamenodeHAState()
+  except ValueError, err:
+    Logger.info("Could not retrieve Namenode HA addresses. Error: " + str(err))
+    return NamenodeStatus(None)
+  return NamenodeStatus(namenode_ha.get_address(NAMENODE_STATE.ACTIVE), namenode_ha.is_encrypted())
@@ -25,6 +25,7 @@ from resource_management.libraries.functions.default import default
 from resource_management.core.shell import call
 from resource_management.libraries.functions import Direction, SafeMode
 from resource_management.core.exceptions import Fail
+from namenode_status import get_namenode_status
 
 
 safemode_to_instruction = {SafeMode.ON: "enter",
@@ -41,13 +42,38 @@ def reach_safemode_state(user, safemode_state, in_ha):
   """
   Logger.info("Prepare to transition into safemode state %s" % safemode_state)
   import params
-  original_state = SafeMode.UNKNOWN
+
+  # the state is read from JMX, the CLI is used only when it is not available
+  namenode_status = get_namenode_status()
+  original_state = namenode_status.get_safemode() or get_safemode_by_cli(user, in_ha)
+  if original_state == SafeMode.UNKNOWN:
+    return (False, original_state)
+  if original_state == safemode_state:
+    return (True, original_state)
+
+  # Make a transition
+  command = "hdfs dfsadmin -safemode %s" % (safemode_to_instruction[safemode_state])
+  Execute(command,
+          user=user,
+          logoutput=True,
+          path=[params.hadoop_bin_dir])
+
+  current_state = namenode_status.get_safemode() or get_safemode_by_cli(user, in_ha)
+  Logger.info("Safemode state after the transition: %s" % current_state)
+  return (current_state == safemode_state, original_state)
+
+
+def get_safemode_by_cli(user, in_ha):
+  """
+  Reads the safemode state of the Namenode on this host by "hdfs dfsadmin -safemode get".
+  @param user: user to perform action as
+  @param in_ha: bool indicating if Namenode High Availability is enabled
+  @:return Returns SafeMode.ON, SafeMode.OFF or SafeMode.UNKNOWN
+  """
+  import params
 
   hostname = params.hostname
   safemode_check = format("su - {user} -c 'hdfs dfsadmin -safemode get'")
-
-  grep_pattern = format("Safe mode is {safemode_state} in {hostname}") if in_ha else format("Safe mode is {safemode_state}")
-  safemode_check_with_grep = format("su - {user} -c 'hdfs dfsadmin -safemode get | grep \"{grep_pattern}\"'")
   code, out = call(safemode_check)
   Logger.info("Command: %s\nCode: %d." % (safemode_check, code))
   if code == 0 and out is not None:
@@ -55,23 +81,8 @@ def reach_safemode_state(user, safemode_state, in_ha):
     re_pattern = r"Safe mode is (\S*) in " + hostname.replace(".", "\\.") if in_ha else r"Safe mode is (\S*)"
     m = re.search(re_pattern, out, re.IGNORECASE)
     if m and len(m.groups()) >= 1:
-      original_state = m.group(1).upper()
-
-      if original_state == safemode_state:
-        return (True, original_state)
-      else:
-        # Make a transition
-        command = "hdfs dfsadmin -safemode %s" % (safemode_to_instruction[safemode_state])
-        Execute(command,
-                user=user,
-                logoutput=True,
-                path=[params.hadoop_bin_dir])
-
-        code, out = call(safemode_check_with_grep)
-        Logger.info("Command: %s\nCode: %d. Out: %s" % (safemode_check_with_grep, code, out))
-        if code == 0:
-          return (True, original_state)
-  return (False, original_state)
+      return m.group(1).upper()
+  return SafeMode.UNKNOWN
 
 
 def prepare_rolling_upgrade():
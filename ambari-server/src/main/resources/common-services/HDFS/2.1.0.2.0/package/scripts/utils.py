@@ -28,6 +28,9 @@ from resource_management.core.exceptions import ComponentIsNotRunning
 
 from zkfc_slave import ZkfcSlave
 
+# seconds to wait for a response of the JMX servlet
+JMX_TIMEOUT = 10
+
 def safe_zkfc_op(action, env):
   """
   Idempotent operation on the zkfc process to either start or stop it.
@@ -246,13 +249,7 @@ def get_jmx_data(nn_address, modeler_type, metric, encrypted=False):
   if not nn_address or not modeler_type or not metric:
     return None
 
-  nn_address = nn_address.strip()
-  if not nn_address.startswith("http"):
-    nn_address = ("https://" if encrypted else "http://") + nn_address
-  if not nn_address.endswith("/"):
-    nn_address = nn_address + "/"
-
-  nn_address = nn_address + "jmx"
+  nn_address = get_jmx_url(nn_address, encrypted)
   Logger.info("Retrieve modeler: %s, metric: %s from JMX endpoint %s" % (modeler_type, metric, nn_address))
 
   data = urllib2.urlopen(nn_address).read()
@@ -268,6 +265,27 @@ def get_jmx_data(nn_address, modeler_type, metric, encrypted=False):
             break
   return my_data
 
+def get_jmx_bean(address, bean_name, encrypted=False):
+  """
+  Reads a single bean instead of the whole JMX servlet output.
+  :param address: Address of the daemon, the same as for get_jmx_data
+  :param bean_name: Bean name, e.g., Hadoop:service=NameNode,name=NameNodeInfo
+  :return: Return a dictionary of the bean attributes, or None if the bean does not exist
+  :raise: urllib2.URLError if the servlet can not be read, ValueError if its output is not valid
+  """
+  url = get_jmx_url(address, encrypted) + "?qry=" + bean_name
+  data = urllib2.urlopen(url, timeout=JMX_TIMEOUT).read()
+  beans = json.loads(data)['beans']
+  return beans[0] if beans else None
+
+def get_jmx_url(address, encrypted=False):
+  address = address.strip()
+  if not address.startswith("http"):
+    address = ("https://" if encrypted else "http://") + address
+  if not address.endswith("/"):
+    address = address + "/"
+  return address + "jmx"
+
 def get_port(address):
   """
   Extracts port from the address like 0.0.0.0:1019
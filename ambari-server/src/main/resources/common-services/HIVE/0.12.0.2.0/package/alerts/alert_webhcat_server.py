@@ -18,18 +18,13 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import httplib
 import json
-import subprocess
 import socket
 import time
-import urllib2
 
 from resource_management.core.environment import Environment
-from resource_management.core.resources import Execute
-from resource_management.core.shell import call
-from resource_management.libraries.functions import format
-from resource_management.libraries.functions import get_kinit_path
-from resource_management.libraries.functions import get_klist_path
+from resource_management.libraries.functions.web_request import make_web_request, ticket_manager
 from os import getpid, sep
 
 RESULT_CODE_OK = "OK"
@@ -50,7 +45,7 @@ WEBHCAT_KEYTAB_KEY = '{{webhcat-site/templeton.kerberos.keytab}}'
 WEBHCAT_OK_RESPONSE = 'ok'
 WEBHCAT_PORT_DEFAULT = 50111
 
-CURL_CONNECTION_TIMEOUT = '10'
+CONNECTION_TIMEOUT = 10
 
 def get_tokens():
   """
@@ -93,6 +88,7 @@ def execute(parameters=None, host_name=None):
   total_time = 0
   json_response = {}
 
+  ccache_file = None
   if security_enabled:
     if WEBHCAT_KEYTAB_KEY not in parameters or WEBHCAT_PRINCIPAL_KEY not in parameters:
       return (RESULT_CODE_UNKNOWN, [str(parameters)])
@@ -105,78 +101,37 @@ def execute(parameters=None, host_name=None):
       # substitute _HOST in kerberos principal with actual fqdn
       webhcat_principal = webhcat_principal.replace('_HOST', host_name)
 
-      # Create the kerberos credentials cache (ccache) file and set it in the environment to use
-      # when executing curl
+      # Create the kerberos credentials cache (ccache) file used for SPNEGO
       env = Environment.get_instance()
       ccache_file = "{0}{1}webhcat_alert_cc_{2}".format(env.tmp_dir, sep, getpid())
-      kerberos_env = {'KRB5CCNAME': ccache_file}
 
-      klist_path_local = get_klist_path()
-      klist_command = format("{klist_path_local} -s {ccache_file}")
-
-      # Determine if we need to kinit by testing to see if the relevant cache exists and has
-      # non-expired tickets.  Tickets are marked to expire after 5 minutes to help reduce the number
-      # it kinits we do but recover quickly when keytabs are regenerated
-      return_code, _ = call(klist_command)
-      if return_code != 0:
-        kinit_path_local = get_kinit_path()
-        kinit_command = format("{kinit_path_local} -l 5m -c {ccache_file} -kt {webhcat_keytab} {webhcat_principal}; ")
-
-        # kinit so that curl will work with --negotiate
-        Execute(kinit_command)
-
-      # make a single curl call to get just the http code
-      curl = subprocess.Popen(['curl', '--negotiate', '-u', ':', '-sL', '-w',
-        '%{http_code}', '--connect-timeout', CURL_CONNECTION_TIMEOUT,
-        '-o', '/dev/null', query_url], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=kerberos_env)
-
-      stdout, stderr = curl.communicate()
-
-      if stderr != '':
-        raise Exception(stderr)
-
-      # check the response code
-      response_code = int(stdout)
-
-      # 0 indicates no connection
-      if response_code == 0:
-        label = CRITICAL_CONNECTION_MESSAGE.format(query_url)
-        return (RESULT_CODE_CRITICAL, [label])
-
-      # any other response aside from 200 is a problem
-      if response_code != 200:
-        label = CRITICAL_HTTP_MESSAGE.format(response_code, query_url)
-        return (RESULT_CODE_CRITICAL, [label])
-
-      # now that we have the http status and it was 200, get the content
-      start_time = time.time()
-      curl = subprocess.Popen(['curl', '--negotiate', '-u', ':', '-sL',
-        '--connect-timeout', CURL_CONNECTION_TIMEOUT, query_url, ],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=kerberos_env)
-
-      stdout, stderr = curl.communicate()
-      total_time = time.time() - start_time
-
-      if stderr != '':
-        raise Exception(stderr)
-
-      json_response = json.loads(stdout)
+      # kinit is executed only when the ticket in the cache is about to expire. Tickets are
+      # marked to expire after 5 minutes to help reduce the number it kinits we do but recover
+      # quickly when keytabs are regenerated
+      ticket_manager.kinit(ccache_file, webhcat_principal, webhcat_keytab)
     except Exception, exception:
       return (RESULT_CODE_CRITICAL, [str(exception)])
-  else:
-    try:
-      # execute the query for the JSON that includes WebHCat status
-      start_time = time.time()
-      url_response = urllib2.urlopen(query_url)
-      total_time = time.time() - start_time
-
-      json_response = json.loads(url_response.read())
-    except urllib2.HTTPError as httpError:
-      label = CRITICAL_HTTP_MESSAGE.format(httpError.code, query_url)
-      return (RESULT_CODE_CRITICAL, [label])
-    except:
-      label = CRITICAL_CONNECTION_MESSAGE.format(query_url)
-      return (RESULT_CODE_CRITICAL, [label])
+
+  try:
+    # execute the query for the JSON that includes WebHCat status
+    start_time = time.time()
+    response_code, response = make_web_request(query_url, ccache_file, CONNECTION_TIMEOUT)
+    total_time = time.time() - start_time
+  except (socket.error, httplib.HTTPException):
+    label = CRITICAL_CONNECTION_MESSAGE.format(query_url)
+    return (RESULT_CODE_CRITICAL, [label])
+  except Exception, exception:
+    return (RESULT_CODE_CRITICAL, [str(exception)])
+
+  # any other response aside from 200 is a problem
+  if response_code != 200:
+    label = CRITICAL_HTTP_MESSAGE.format(response_code, query_url)
+    return (RESULT_CODE_CRITICAL, [label])
+
+  try:
+    json_response = json.loads(response)
+  except ValueError:
+    return (RESULT_CODE_CRITICAL, [CRITICAL_WEBHCAT_UNKNOWN_JSON_MESSAGE])
 
 
   # if status is not in the response, we can't do any check; return CRIT
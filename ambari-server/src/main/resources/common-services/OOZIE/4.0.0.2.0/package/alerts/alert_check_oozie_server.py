@@ -19,10 +19,8 @@ limitations under the License.
 """
 from resource_management.core.environment import Environment
 from resource_management.core.resources import Execute
-from resource_management.core.shell import call
 from resource_management.libraries.functions import format
-from resource_management.libraries.functions import get_kinit_path
-from resource_management.libraries.functions import get_klist_path
+from resource_management.libraries.functions.web_request import ticket_manager
 from ambari_commons.os_check import OSConst, OSCheck
 from os import getpid, sep
 from urlparse import urlparse
@@ -91,19 +89,10 @@ def execute(parameters=None, host_name=None):
       ccache_file = "{0}{1}oozie_alert_cc_{2}".format(env.tmp_dir, sep, getpid())
       kerberos_env = {'KRB5CCNAME': ccache_file}
 
-      klist_path_local = get_klist_path()
-      klist_command = format("{klist_path_local} -s {ccache_file}")
-
-      # Determine if we need to kinit by testing to see if the relevant cache exists and has
-      # non-expired tickets.  Tickets are marked to expire after 5 minutes to help reduce the number
-      # it kinits we do but recover quickly when keytabs are regenerated
-      return_code, _ = call(klist_command)
-      if return_code != 0:
-        kinit_path_local = get_kinit_path()
-        kinit_command = format("{kinit_path_local} -l 5m -kt {oozie_keytab} {oozie_principal}; ")
-
-        # kinit
-        Execute(kinit_command, environment=kerberos_env)
+      # kinit is executed only when the ticket in the cache is about to expire. Tickets are
+      # marked to expire after 5 minutes to help reduce the number it kinits we do but recover
+      # quickly when keytabs are regenerated
+      ticket_manager.kinit(ccache_file, oozie_principal, oozie_keytab)
 
     # execute the command
     Execute(command, environment=kerberos_env)
@@ -23,6 +23,8 @@ import subprocess
 import os
 import logging
 import tempfile
+import shutil
+import tarfile
 import pprint
 
 from bootstrap import PBootstrap, Bootstrap, SharedState, HostLog, SCP, SSH
@@ -311,6 +313,15 @@ class TestBootstrap(TestCase):
     self.assertTrue(dummy_error_message in log['text'])
     self.assertEqual(retcode["exitstatus"], 1)
 
+    # run through the master connection
+    ssh = SSH(params.user, params.sshkey_file, "dummy-host", "dummy-command",
+              params.bootdir, host_log_mock, control_path="/tmp/ambari-ssh-x/1")
+    ssh.run()
+    command_str = str(popenMock.call_args[0][0])
+    self.assertEquals(command_str, "['ssh', '-o', 'ConnectTimeOut=60', '-o', "
+            "'StrictHostKeyChecking=no', '-o', 'BatchMode=yes', '-tt', '-i', "
+            "'sshkey_file', '-o', 'ControlPath=/tmp/ambari-ssh-x/1', 'root@dummy-host', 'dummy-command']")
+
 
   def test_getOsCheckScript(self):
     shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
@@ -363,28 +374,32 @@ class TestBootstrap(TestCase):
                      "sudo mkdir -p /var/lib/ambari-agent/data/tmp ; "
                      "sudo chown -R root /var/lib/ambari-agent/data/tmp")
 
-  @patch.object(Bootstrap, "getOsCheckScript")
-  @patch.object(Bootstrap, "getOsCheckScriptRemoteLocation")
-  @patch.object(SCP, "__init__")
-  @patch.object(SCP, "run")
-  @patch.object(HostLog, "write")
-  def test_copyOsCheckScript(self, write_mock, run_mock, init_mock,
-                    getOsCheckScriptRemoteLocation_mock, getOsCheckScript_mock):
-    shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
-                               "setupAgentFile", "ambariServer", "centos6",
-                               None, "8440", "root")
-    bootstrap_obj = Bootstrap("hostname", shared_state)
-    getOsCheckScript_mock.return_value = "OsCheckScript"
-    getOsCheckScriptRemoteLocation_mock.return_value = "OsCheckScriptRemoteLocation"
-    expected = 42
-    init_mock.return_value = None
-    run_mock.return_value = expected
-    res = bootstrap_obj.copyOsCheckScript()
-    self.assertEquals(res, expected)
-    input_file = str(init_mock.call_args[0][3])
-    remote_file = str(init_mock.call_args[0][4])
-    self.assertEqual(input_file, "OsCheckScript")
-    self.assertEqual(remote_file, "OsCheckScriptRemoteLocation")
+  @patch.object(Bootstrap, "getNeededFiles")
+  def test_getFilesArchive(self, getNeededFiles_mock):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      os.mkdir(os.path.join(tmp_dir, "ambari_commons"))
+      open(os.path.join(tmp_dir, "ambari_commons", "__init__.py"), "w").close()
+      open(os.path.join(tmp_dir, "setupAgent.py"), "w").close()
+      getNeededFiles_mock.return_value = [
+        (os.path.join(tmp_dir, "ambari_commons"), "/var/lib/ambari-agent/data/tmp/ambari_commons"),
+        (os.path.join(tmp_dir, "setupAgent.py"), "/var/lib/ambari-agent/data/tmp/setupAgent1.py")]
+      shared_state = SharedState("root", "sshkey_file", "scriptDir", tmp_dir,
+                                 "setupAgentFile", "ambariServer", "centos6",
+                                 None, "8440", "root")
+      archive = Bootstrap("hostname1", shared_state).getFilesArchive()
+      self.assertEqual(archive, os.path.join(tmp_dir, "bootstrap_files.tar.gz"))
+      tar = tarfile.open(archive)
+      try:
+        self.assertEqual(sorted(tar.getnames()),
+                         ["ambari_commons", "ambari_commons/__init__.py", "setupAgent1.py"])
+      finally:
+        tar.close()
+      # the archive is shared by the hosts
+      self.assertEqual(Bootstrap("hostname2", shared_state).getFilesArchive(), archive)
+      self.assertEqual(getNeededFiles_mock.call_count, 1)
+    finally:
+      shutil.rmtree(tmp_dir)
 
 
   @patch.object(Bootstrap, "getRemoteName")
@@ -406,9 +421,7 @@ class TestBootstrap(TestCase):
     self.assertEquals(rf, "sudo -S mv RemoteName target/ambari.repo < RemoteName")
 
 
-  @patch.object(Bootstrap, "getMoveRepoFileCommand")
-  @patch.object(Bootstrap, "getRepoDir")
-  @patch.object(Bootstrap, "getRepoFile")
+  @patch.object(Bootstrap, "getFilesArchive")
   @patch.object(Bootstrap, "getRemoteName")
   @patch.object(SCP, "__init__")
   @patch.object(SCP, "run")
@@ -417,48 +430,77 @@ class TestBootstrap(TestCase):
   @patch.object(HostLog, "write")
   def test_copyNeededFiles(self, write_mock, ssh_run_mock, ssh_init_mock,
                            scp_run_mock, scp_init_mock,
-                           getRemoteName_mock, getRepoFile_mock, getRepoDir,
-                           getMoveRepoFileCommand):
+                           getRemoteName_mock, getFilesArchive_mock):
     shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
                                "setupAgentFile", "ambariServer", "centos6",
                                None, "8440", "root")
     bootstrap_obj = Bootstrap("hostname", shared_state)
-    getMoveRepoFileCommand.return_value = "MoveRepoFileCommand"
-    getRepoDir.return_value  = "RepoDir"
+    getFilesArchive_mock.return_value = "bootdir/bootstrap_files.tar.gz"
     getRemoteName_mock.return_value = "RemoteName"
-    getRepoFile_mock.return_value = "RepoFile"
     expected1 = {"exitstatus": 42, "log": "log42", "errormsg": "errorMsg"}
     expected2 = {"exitstatus": 17, "log": "log17", "errormsg": "errorMsg"}
-    expected3 = {"exitstatus": 1, "log": "log1", "errormsg": "errorMsg"}
     scp_init_mock.return_value = None
     ssh_init_mock.return_value = None
     # Testing max retcode return
-    scp_run_mock.side_effect = [expected1, expected3]
+    scp_run_mock.side_effect = [expected1]
     ssh_run_mock.side_effect = [expected2]
     res = bootstrap_obj.copyNeededFiles()
     self.assertEquals(res, expected1["exitstatus"])
     input_file = str(scp_init_mock.call_args[0][3])
     remote_file = str(scp_init_mock.call_args[0][4])
-    self.assertEqual(input_file, "setupAgentFile")
+    self.assertEqual(input_file, "bootdir/bootstrap_files.tar.gz")
     self.assertEqual(remote_file, "RemoteName")
     command = str(ssh_init_mock.call_args[0][3])
-    self.assertEqual(command, "MoveRepoFileCommand")
+    self.assertEqual(command, "tar -xzf RemoteName -C /var/lib/ambari-agent/data/tmp ; "
+                              "retcode=$? ; rm -f RemoteName ; exit $retcode")
     # Another order
     expected1 = {"exitstatus": 0, "log": "log0", "errormsg": "errorMsg"}
-    expected2 = {"exitstatus": 17, "log": "log17", "errormsg": "errorMsg"}
-    expected3 = {"exitstatus": 1, "log": "log1", "errormsg": "errorMsg"}
-    scp_run_mock.side_effect = [expected1, expected3]
+    scp_run_mock.side_effect = [expected1]
     ssh_run_mock.side_effect = [expected2]
     res = bootstrap_obj.copyNeededFiles()
     self.assertEquals(res, expected2["exitstatus"])
-    # yet another order
-    expected1 = {"exitstatus": 33, "log": "log33", "errormsg": "errorMsg"}
-    expected2 = {"exitstatus": 17, "log": "log17", "errormsg": "errorMsg"}
-    expected3 = {"exitstatus": 42, "log": "log42", "errormsg": "errorMsg"}
-    scp_run_mock.side_effect = [expected1, expected3]
-    ssh_run_mock.side_effect = [expected2]
-    res = bootstrap_obj.copyNeededFiles()
-    self.assertEquals(res, expected3["exitstatus"])
+
+
+  @patch.object(Bootstrap, "is_ubuntu")
+  @patch.object(Bootstrap, "getMoveRepoFileCommand")
+  @patch.object(Bootstrap, "getRepoDir")
+  @patch.object(SSH, "__init__")
+  @patch.object(SSH, "run")
+  @patch.object(HostLog, "write")
+  def test_moveRepoFile(self, write_mock, run_mock, init_mock,
+                        getRepoDir_mock, getMoveRepoFileCommand_mock, is_ubuntu_mock):
+    shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
+                               "setupAgentFile", "ambariServer", "centos6",
+                               None, "8440", "root")
+    is_ubuntu_mock.return_value = False
+    bootstrap_obj = Bootstrap("hostname", shared_state)
+    getRepoDir_mock.return_value = "RepoDir"
+    getMoveRepoFileCommand_mock.return_value = "MoveRepoFileCommand"
+    init_mock.return_value = None
+    expected = {"exitstatus": 0, "log": "log0", "errormsg": "errorMsg"}
+    run_mock.return_value = expected
+    res = bootstrap_obj.moveRepoFile()
+    self.assertEquals(res, expected)
+    self.assertEqual(init_mock.call_count, 1)
+    getMoveRepoFileCommand_mock.assert_called_with("RepoDir")
+    self.assertEqual(str(init_mock.call_args[0][3]), "MoveRepoFileCommand")
+
+    # apt cache is updated on ubuntu
+    init_mock.reset_mock()
+    is_ubuntu_mock.return_value = True
+    failed = {"exitstatus": 1, "log": "log1", "errormsg": "errorMsg"}
+    run_mock.side_effect = [expected, failed]
+    res = bootstrap_obj.moveRepoFile()
+    self.assertEquals(res, failed)
+    self.assertEqual(init_mock.call_count, 2)
+    self.assertTrue(str(init_mock.call_args[0][3]).startswith("sudo apt-get update"))
+
+    # nothing to update when the repo file has not been moved
+    init_mock.reset_mock()
+    run_mock.side_effect = [failed]
+    res = bootstrap_obj.moveRepoFile()
+    self.assertEquals(res, failed)
+    self.assertEqual(init_mock.call_count, 1)
 
 
   @patch.object(Bootstrap, "getOsCheckScriptRemoteLocation")
@@ -698,7 +740,7 @@ class TestBootstrap(TestCase):
     hasPassword_mock.return_value = False
     try_to_execute_mock.return_value = {"exitstatus": 0, "log":"log0", "errormsg":"errormsg0"}
     bootstrap_obj.run()
-    self.assertEqual(try_to_execute_mock.call_count, 7) # <- Adjust if changed
+    self.assertEqual(try_to_execute_mock.call_count, 6) # <- Adjust if changed
     self.assertTrue(createDoneFile_mock.called)
     self.assertEqual(bootstrap_obj.getStatus()["return_code"], 0)
 
@@ -709,7 +751,7 @@ class TestBootstrap(TestCase):
     hasPassword_mock.return_value = True
     try_to_execute_mock.return_value = {"exitstatus": 0, "log":"log0", "errormsg":"errormsg0"}
     bootstrap_obj.run()
-    self.assertEqual(try_to_execute_mock.call_count, 10) # <- Adjust if changed
+    self.assertEqual(try_to_execute_mock.call_count, 9) # <- Adjust if changed
     self.assertTrue(createDoneFile_mock.called)
     self.assertEqual(bootstrap_obj.getStatus()["return_code"], 0)
 
@@ -724,7 +766,9 @@ class TestBootstrap(TestCase):
     bootstrap_obj.run()
     self.assertEqual(try_to_execute_mock.call_count, 2) # <- Adjust if changed
     self.assertTrue("ERROR" in error_mock.call_args[0][0])
-    self.assertTrue("ERROR" in write_mock.call_args[0][0])
+    self.assertTrue("ERROR" in write_mock.call_args_list[0][0][0])
+    # how long the actions have taken is written last
+    self.assertTrue("took" in write_mock.call_args[0][0])
     self.assertTrue(createDoneFile_mock.called)
     self.assertEqual(bootstrap_obj.getStatus()["return_code"], 1)
 
@@ -769,62 +813,86 @@ class TestBootstrap(TestCase):
     self.assertTrue(createDoneFile_mock.called)
 
 
-  @patch("time.sleep")
-  @patch("time.time")
+  @patch.object(subprocess, "call")
+  @patch.object(HostLog, "write")
+  def test_sharedConnection(self, write_mock, call_mock):
+    shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
+                               "setupAgentFile", "ambariServer", "centos6",
+                               None, "8440", "root")
+    # no control directory, the commands connect by themselves
+    bootstrap_obj = Bootstrap("hostname", shared_state)
+    bootstrap_obj.openSharedConnection()
+    self.assertFalse(call_mock.called)
+
+    tmp_dir = tempfile.mkdtemp()
+    # ssh output goes to the host log
+    shared_state.bootdir = tmp_dir
+    shared_state.control_dir = tmp_dir
+    try:
+      bootstrap_obj = Bootstrap("hostname", shared_state)
+      control_path = os.path.join(tmp_dir, "1")
+      self.assertEqual(bootstrap_obj.control_path, control_path)
+      self.assertEqual(Bootstrap("hostname2", shared_state).control_path, os.path.join(tmp_dir, "2"))
+
+      call_mock.return_value = 0
+      bootstrap_obj.openSharedConnection()
+      self.assertEqual(call_mock.call_args[0][0],
+                       ["ssh", "-o", "ConnectTimeOut=60", "-o", "StrictHostKeyChecking=no",
+                        "-o", "BatchMode=yes", "-i", "sshkey_file", "-o", "ControlPath=" + control_path,
+                        "-M", "-N", "-f", "root@hostname"])
+      self.assertEqual(bootstrap_obj.control_path, control_path)
+
+      # master connection is closed only if it is listening
+      call_mock.reset_mock()
+      bootstrap_obj.closeSharedConnection()
+      self.assertFalse(call_mock.called)
+      open(control_path, "w").close()
+      bootstrap_obj.closeSharedConnection()
+      self.assertEqual(call_mock.call_args[0][0][-3:], ["-O", "exit", "root@hostname"])
+
+      # authentication failed
+      call_mock.return_value = 255
+      bootstrap_obj.openSharedConnection()
+      self.assertEqual(bootstrap_obj.control_path, None)
+    finally:
+      shutil.rmtree(tmp_dir)
+
+
   @patch("logging.warn")
   @patch("logging.info")
-  @patch.object(Bootstrap, "start")
+  @patch.object(Bootstrap, "start", autospec=True)
   @patch.object(Bootstrap, "interruptBootstrap")
-  @patch.object(Bootstrap, "getStatus")
-  def test_PBootstrap(self, getStatus_mock, interruptBootstrap_mock, start_mock,
-                      info_mock, warn_mock, time_mock, sleep_mock):
+  def test_PBootstrap(self, interruptBootstrap_mock, start_mock,
+                      info_mock, warn_mock):
     shared_state = SharedState("root", "sshkey_file", "scriptDir", "bootdir",
                                "setupAgentFile", "ambariServer", "centos6",
                                None, "8440", "root")
     n = 180
-    time = 100500
-    time_mock.return_value = time
     hosts = []
     for i in range(0, n):
       hosts.append("host" + str(i))
     # Testing normal case
-    getStatus_mock.return_value = {"return_code": 0,
-                                   "start_time": time + 999}
     pbootstrap_obj = PBootstrap(hosts, shared_state)
+    def finish(bootstrap_obj):
+      bootstrap_obj.status["return_code"] = 0
+      pbootstrap_obj.finished_queue.put(bootstrap_obj)
+    start_mock.side_effect = finish
     pbootstrap_obj.run()
     self.assertEqual(start_mock.call_count, n)
     self.assertEqual(interruptBootstrap_mock.call_count, 0)
+    # the directory of ssh control sockets is removed
+    self.assertEqual(shared_state.control_dir, None)
 
     start_mock.reset_mock()
-    getStatus_mock.reset_mock()
     # Testing case of timeout
-    def fake_return_code_generator():
-      call_number = 0
-      while True:
-        call_number += 1
-        if call_number % 5 != 0:   # ~80% of hosts finish successfully
-          yield 0
-        else:
-          yield None
-
-    def fake_start_time_generator():
-      while True:
-        yield time - bootstrap.HOST_BOOTSTRAP_TIMEOUT - 1
-
-    return_code_generator = fake_return_code_generator()
-    start_time_generator = fake_start_time_generator()
-
-    def status_get_item_mock(item):
-      if item == "return_code":
-        return return_code_generator.next()
-      elif item == "start_time":
-        return start_time_generator.next()
-
-    dict_mock = MagicMock()
-    dict_mock.__getitem__.side_effect = status_get_item_mock
-    getStatus_mock.return_value = dict_mock
-
-    pbootstrap_obj.run()
+    started = []
+    def finish_or_hang(bootstrap_obj):
+      started.append(bootstrap_obj)
+      if len(started) % 5 != 0:   # ~80% of hosts finish successfully
+        finish(bootstrap_obj)
+    start_mock.side_effect = finish_or_hang
+
+    with patch.object(bootstrap, "HOST_BOOTSTRAP_TIMEOUT", new = -1):
+      pbootstrap_obj.run()
     self.assertEqual(start_mock.call_count, n)
     self.assertEqual(interruptBootstrap_mock.call_count, n / 5)
-
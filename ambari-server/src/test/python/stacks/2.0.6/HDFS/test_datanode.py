@@ -19,6 +19,7 @@ limitations under the License.
 '''
 from stacks.utils.RMFTestCase import *
 import json
+import urllib2
 from mock.mock import MagicMock, patch
 from resource_management.core import shell
 from resource_management.core.exceptions import Fail
@@ -27,6 +28,14 @@ class TestDatanode(RMFTestCase):
   COMMON_SERVICES_PACKAGE_DIR = "HDFS/2.1.0.2.0/package"
   STACK_VERSION = "2.0.6"
 
+  def setUp(self):
+    # JMX of the Namenode requires authentication, the CLI is used instead unless a test patches urlopen again
+    self.urlopen_patcher = patch("urllib2.urlopen", new=MagicMock(side_effect=urllib2.HTTPError("/jmx", 401, "Unauthorized", {}, None)))
+    self.urlopen_patcher.start()
+
+  def tearDown(self):
+    self.urlopen_patcher.stop()
+
   def test_configure_default(self):
     self.executeScript(self.COMMON_SERVICES_PACKAGE_DIR + "/scripts/datanode.py",
                        classname = "DataNode",
@@ -495,7 +504,9 @@ class TestDatanode(RMFTestCase):
       self.fail('Missing DataNode should have caused a failure')
     except Fail,fail:
       self.assertTrue(process_mock.called)
-      self.assertEqual(process_mock.call_count,12)
+      # checks are made after sleeping 1, 2, 4, 8 and then 10 seconds, up to 120 seconds
+      self.assertEqual(process_mock.call_count,16)
+      self.assertEqual(120, sum(args[0] for args, kwargs in time_mock.call_args_list))
 
 
   @patch('time.sleep')
@@ -514,7 +525,36 @@ class TestDatanode(RMFTestCase):
       self.fail('Invalid return code should cause a failure')
     except Fail,fail:
       self.assertTrue(process_mock.called)
-      self.assertEqual(process_mock.call_count,12)
+      self.assertEqual(process_mock.call_count,16)
+
+
+  @patch('time.sleep')
+  @patch.object(shell, "call")
+  @patch("urllib2.urlopen")
+  def test_post_rolling_restart_jmx(self, urlopen_mock, process_mock, time_mock):
+    live_nodes = {"c6402.ambari.apache.org:50010": {"lastContact": 1}}
+    response = MagicMock()
+    response.read.side_effect = lambda: json.dumps({"beans": [{"LiveNodes": json.dumps(live_nodes)}]})
+    urlopen_mock.return_value = response
+
+    def register_datanode(seconds):
+      live_nodes["c6401.ambari.apache.org:50010"] = {"lastContact": 0}
+    time_mock.side_effect = register_datanode
+
+    self.executeScript(self.COMMON_SERVICES_PACKAGE_DIR + "/scripts/datanode.py",
+                       classname = "DataNode",
+                       command = "post_rolling_restart",
+                       config_file = "default.json",
+                       hdp_stack_version = self.STACK_VERSION,
+                       target = RMFTestCase.TARGET_COMMON_SERVICES
+    )
+
+    # live Datanodes are read from JMX of the Namenode instead of "hdfs dfsadmin -report -live"
+    self.assertFalse(process_mock.called)
+    urlopen_mock.assert_called_with("http://c6401.ambari.apache.org:50070/jmx?qry=Hadoop:service=NameNode,name=NameNodeInfo",
+                                    timeout = 10)
+    self.assertEqual(2, urlopen_mock.call_count)
+    time_mock.assert_called_once_with(1)
 
   @patch("resource_management.libraries.functions.security_commons.build_expectations")
   @patch("resource_management.libraries.functions.security_commons.get_params_from_filesystem")